@@ -0,0 +1,131 @@
+"""
+Browser profile benchmark for the MCA flows.
+
+Launches each BROWSER_PROFILES entry, opens the DIN status and annual filing
+pages from the saved fixture pages (external requests blocked, so only the
+engine is measured, not the portal), and reports launch time, time until
+each flow's first selector is in the page, and the browser's RSS.
+
+    python benchmark_browsers.py                  # every profile, 3 runs
+    python benchmark_browsers.py --profiles firefox-lean chromium-lean --runs 5
+    python benchmark_browsers.py --record benchmarks/browsers.jsonl
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from mca_utils.config import BROWSER_PROFILES
+from mca_utils.browser import WarmBrowser, browser_profile, new_context
+from mca_utils.locators import locator
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Flow -> (fixture page, selector key that means the flow can start)
+FIXTURES = {
+    'din_status': ('debug_no_captcha_page.html', 'din.input'),
+    'annual_filing': ('debug_annual_page.html', 'annual.search_input')
+}
+
+
+def _local_only(route):
+    if route.request.url.startswith(('file:', 'data:', 'blob:')):
+        route.continue_()
+    else:
+        route.abort()
+
+
+def measure(name):
+    """
+    Launch one profile and load every fixture once.
+
+    Returns:
+        Dict with launch_ms, <flow>_ms per fixture and rss_mb (None if unknown)
+    """
+    warm = WarmBrowser(browser_profile(name=name))
+    start = time.perf_counter()
+    warm.start()
+    result = {'launch_ms': (time.perf_counter() - start) * 1000}
+    contexts = []
+    try:
+        for flow, (fixture, key) in FIXTURES.items():
+            context = new_context(warm.browser, browser_profile(flow, name))
+            contexts.append(context)
+            context.route('**/*', _local_only)
+            page = context.new_page()
+            url = 'file://' + os.path.join(REPO_ROOT, fixture)
+            start = time.perf_counter()
+            page.goto(url, wait_until='domcontentloaded')
+            locator(page, key).first.wait_for(state='attached', timeout=30000)
+            result[f'{flow}_ms'] = (time.perf_counter() - start) * 1000
+        # Measured with every fixture still open, as during a lookup
+        rss = warm.rss_bytes()
+        result['rss_mb'] = rss / (1024 * 1024) if rss is not None else None
+    finally:
+        for context in contexts:
+            context.close()
+        warm.close()
+    return result
+
+
+def run_benchmark(runs=3, profiles=None):
+    """
+    Benchmark launch profiles.
+
+    Args:
+        runs: Launches per profile (median is reported)
+        profiles: Names from BROWSER_PROFILES (default all)
+
+    Returns:
+        Dict of profile -> result dict (or {'error': ...} if it cannot launch)
+    """
+    results = {}
+    for name in profiles or BROWSER_PROFILES:
+        try:
+            samples = [measure(name) for _ in range(runs)]
+        except Exception as e:
+            # Usually an engine that `playwright install` has not downloaded
+            results[name] = {'error': str(e).strip().splitlines()[0]}
+            continue
+        profile = browser_profile(name=name)
+        results[name] = {'engine': profile['engine'], 'headless': profile['headless']}
+        for metric in samples[0]:
+            values = [s[metric] for s in samples if s[metric] is not None]
+            results[name][metric] = round(statistics.median(values), 1) if values else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Browser launch profile benchmark')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--profiles', nargs='+', choices=sorted(BROWSER_PROFILES), help='Profiles to run')
+    parser.add_argument('--record', default=None, help='Append results as a JSON line to this file')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs, args.profiles)
+
+    def cell(value, width):
+        return f"{'-' if value is None else value:>{width}}"
+
+    print(f"{'profile':<18}{'engine':<10}{'headless':>9}{'launch ms':>11}{'din ms':>9}{'annual ms':>11}{'rss MB':>9}")
+    for name, r in results.items():
+        if 'error' in r:
+            print(f"{name:<18}ERROR: {r['error']}")
+            continue
+        print(f"{name:<18}{r['engine']:<10}{str(r['headless']):>9}{cell(r['launch_ms'], 11)}"
+              f"{cell(r['din_status_ms'], 9)}{cell(r['annual_filing_ms'], 11)}{cell(r['rss_mb'], 9)}")
+
+    if args.record:
+        directory = os.path.dirname(args.record)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(args.record, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'ts': round(time.time()), 'runs': args.runs, 'results': results}) + '\n')
+    return 1 if any('error' in r for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
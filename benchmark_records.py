@@ -0,0 +1,108 @@
+"""
+Memory benchmark for filing rows: plain dicts vs FilingRecords.
+
+Builds N synthetic filing history rows the way a batch collects them (fresh
+strings per scraped cell, a handful of form names, repeating dates and
+fees) and reports the traced memory held by each representation.
+
+    python benchmark_records.py                  # 200,000 rows
+    python benchmark_records.py --rows 1000000 --record benchmarks/records.jsonl
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from mca_utils.records import FilingRecord
+
+FORMS = ['MGT-7', 'MGT-7A', 'AOC-4', 'AOC-4 XBRL', 'AOC-4 CFS', 'ADT-1', 'DIR-12', 'INC-22', 'PAS-3', 'CHG-1']
+FEES = ['200.00', '300.00', '400.00', '600.00', '1,200.00', '0.00']
+
+
+def scraped_rows(count, seed=1):
+    """
+    Yield row dicts as the scraper and challan parser produce them.
+
+    Every value is built anew (as parsing HTML/PDF text does), so equal
+    values are equal strings but not the same objects.
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.randint(2015, 2024)
+        srn = f"{'FGHRT'[i % 5]}{10000000 + i}"
+        yield {
+            'CIN': ''.join(['U72900KA', str(2000 + i % 20), 'PTC', str(100000 + i // 20)]),
+            'SRN': srn,
+            'Form Name': ''.join(rng.choice(FORMS)),
+            'Event Date': f"{day:02d}/{month:02d}/{year}",
+            'PDF Path': os.path.join('challan_pdfs', f"{srn}.pdf"),
+            'Date of Filing': f"{day:02d}/{month:02d}/{year}",
+            'Amount Paid': ''.join(rng.choice(FEES)),
+            'Late Fee': ''.join(rng.choice(FEES[-2:]))
+        }
+
+
+def measure(build, count):
+    """
+    Returns:
+        (traced bytes still held by the built rows, seconds to build them)
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = build(count)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return held, elapsed
+
+
+def run_benchmark(count=200000):
+    """
+    Returns:
+        Dict of representation -> {'bytes_per_row', 'build_s'}
+    """
+    builders = {
+        'dict': lambda n: list(scraped_rows(n)),
+        'FilingRecord': lambda n: [FilingRecord.from_dict(row) for row in scraped_rows(n)]
+    }
+    results = {}
+    for name, build in builders.items():
+        held, elapsed = measure(build, count)
+        results[name] = {'bytes_per_row': round(held / count, 1), 'build_s': round(elapsed, 2)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Filing row memory benchmark')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--record', default=None, help='Append results as a JSON line to this file')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows)
+
+    print(f"{'representation':<16}{'bytes/row':>11}{'build s':>10}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['bytes_per_row']:>11.1f}{r['build_s']:>10.2f}")
+    ratio = results['dict']['bytes_per_row'] / results['FilingRecord']['bytes_per_row']
+    print(f"FilingRecords hold {ratio:.1f}x less than dicts for {args.rows:,} rows")
+
+    if args.record:
+        directory = os.path.dirname(args.record)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(args.record, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'ts': round(time.time()), 'python': sys.version.split()[0],
+                                'rows': args.rows, 'results': results}) + '\n')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
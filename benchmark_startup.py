@@ -0,0 +1,124 @@
+"""
+Startup benchmark for the MCA entry points.
+
+Runs each entry point's imports in a fresh interpreter under
+`python -X importtime`, reports cold-start cost and the heaviest imports,
+and fails if a lightweight path pulls in the browser/CAPTCHA/PDF stacks.
+
+    python benchmark_startup.py              # 5 runs per entry point
+    python benchmark_startup.py --runs 10 --record benchmarks/startup.jsonl
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Entry point -> statement that loads it
+ENTRY_POINTS = {
+    'mca_utils': 'import mca_utils',
+    'cli': 'import mca_utils.cli',
+    'cache_hit': 'import mca_utils.cli, verify_din, check_annual_filing; from mca_utils.cache import get_cache',
+    'challan_parser': 'from mca_utils.challan_parser import parse_challan_text',
+    'verify_din': 'import verify_din',
+    'check_annual_filing': 'import check_annual_filing',
+    'extract_challan_details': 'import extract_challan_details'
+}
+
+# Packages only a real browser lookup, CAPTCHA solve or PDF parse needs
+HEAVY_MODULES = ('playwright', 'pandas', 'PIL', 'twocaptcha', 'pdfplumber', 'requests', 'pyarrow', 'tqdm')
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure(statement):
+    """
+    Import once in a fresh interpreter.
+
+    Returns:
+        (wall ms, total import ms, {module: cumulative us}) for the run
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    wall = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+        # Top-level imports (no indentation) add up to the whole import cost
+        if not name[1:].startswith(' '):
+            total_us += int(cumulative)
+    return wall, total_us / 1000, modules
+
+
+def run_benchmark(runs=5, entry_points=None):
+    """
+    Benchmark the entry points.
+
+    Args:
+        runs: Fresh interpreters per entry point (median is reported)
+        entry_points: Names from ENTRY_POINTS (default all)
+
+    Returns:
+        Dict of entry point -> result dict
+    """
+    bare = [measure('pass') for _ in range(runs)]
+    baseline = statistics.median(s[0] for s in bare)
+    # Modules every interpreter loads anyway (site, encodings...) are not ranked
+    startup_modules = set(bare[-1][2])
+    results = {}
+    for name in entry_points or ENTRY_POINTS:
+        samples = [measure(ENTRY_POINTS[name]) for _ in range(runs)]
+        modules = samples[-1][2]
+        top_level = {m: us for m, us in modules.items() if '.' not in m and m not in startup_modules}
+        results[name] = {
+            'wall_ms': round(statistics.median(s[0] for s in samples), 1),
+            'over_bare_python_ms': round(statistics.median(s[0] for s in samples) - baseline, 1),
+            'import_ms': round(statistics.median(s[1] for s in samples), 1),
+            'heaviest': sorted(top_level, key=top_level.get, reverse=True)[:5],
+            'heavy_loaded': sorted(m for m in HEAVY_MODULES if m in modules)
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start import benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=sorted(ENTRY_POINTS), help='Entry points to run')
+    parser.add_argument('--record', default=None, help='Append results as a JSON line to this file')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs, args.only)
+
+    print(f"{'entry point':<26}{'wall ms':>10}{'+python':>10}{'imports ms':>12}  heaviest")
+    for name, r in results.items():
+        print(f"{name:<26}{r['wall_ms']:>10.1f}{r['over_bare_python_ms']:>10.1f}{r['import_ms']:>12.1f}  {', '.join(r['heaviest'])}")
+
+    if args.record:
+        directory = os.path.dirname(args.record)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(args.record, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'ts': round(time.time()), 'python': sys.version.split()[0], 'results': results}) + '\n')
+
+    # Importing an entry point must never load the heavy stacks by itself
+    regressions = {name: r['heavy_loaded'] for name, r in results.items() if r['heavy_loaded']}
+    for name, modules in regressions.items():
+        print(f"REGRESSION: {name} imports {', '.join(modules)} at startup")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,441 +1,467 @@
 import sys
 import time
+import logging
 import os
-import requests
-import pdfplumber
-from playwright.sync_api import sync_playwright
-import pandas as pd
+from functools import partial
 
 # Import shared modules from mca_utils package
-from mca_utils.config import MCA_URLS, BROWSER_CONFIG, DEFAULT_CIN, SCREENSHOTS_DIR, MAX_VERIFICATION_ATTEMPTS
+from mca_utils.config import MCA_URLS, DEFAULT_CIN, SCREENSHOTS_DIR, OUTPUT_FORMATS
 from mca_utils.captcha_solver import solve_captcha
-from mca_utils.utils import get_robust_locator, type_slowly
+from mca_utils.utils import type_slowly, navigate
+from mca_utils.retry import SOLVER_ERROR, WRONG_CAPTCHA, PORTAL_TIMEOUT
+from mca_utils.steps import Step, StepEngine, StepFailed
+from mca_utils.export import write_parquet
+from mca_utils.records import FilingRecord, records_frame
+from mca_utils.cache import cached_lookup
+from mca_utils.scheduler import get_scheduler
+from mca_utils.challan_parser import parse_challan_pdf
+from mca_utils.tracing import entity_context, span, start_span
+from mca_utils import metrics
+from mca_utils.artifacts import capture
+from mca_utils.flight_recorder import FlightRecorder
+from mca_utils.browser import browser_session
+from mca_utils.extract import extract, snapshot
+from mca_utils.locators import find, locator
+from mca_utils.profiling import enable_profiling, profiled
+from mca_utils.log import get_logger
 
+logger = get_logger('check_annual_filing')
 
+COLUMN_ORDER = ['SRN', 'Form Name', 'Event Date', 'Date of Filing', 'Amount Paid', 'Late Fee']
 
-def run():
-    print(f" Python Executable: {sys.executable}")
-    
-    # CIN to check
-    CIN_NUMBER = DEFAULT_CIN
-    
+
+class AnnualFilingFlow:
+    """
+    The annual filing browser flow for one CIN as resumable steps on one page:
+    navigate, search, captcha_1, company_select, captcha_2, history_wait,
+    history_extract and challan_fetch. A failed step (a rejected CAPTCHA, a
+    slow modal, a download timeout) is retried where it failed, so a wrong
+    second CAPTCHA is re-solved without repeating the search and the first
+    CAPTCHA.
+    """
+
+    def __init__(self, page, cin, journal=None):
+        self.page = page
+        self.frame = page
+        self.cin = cin
+        self.journal = journal
+        self.scheduler = get_scheduler()
+        self.engine = StepEngine(on_checkpoint=self.checkpoint)
+        self.history_rows = None
+        self.table = None
+        self._entries = []
+
+        # Built once per lookup from the selector registry (SELECTORS['annual'])
+        self.captcha_modal = locator(page, 'annual.captcha_modal')
+        self.error_text = locator(page, 'annual.captcha_error')
+        self.company_link = locator(page, 'annual.company_link', cin=cin)
+        # The HTML dump showed id="screenone" hidden until the history loads
+        self.success_indicator = locator(page, 'annual.history')
+
+    def checkpoint(self, stage, key=None, **data):
+        if self.journal:
+            self.journal.record(self.cin, stage, key, **data)
+
+    def steps(self):
+        return [
+            # navigate() already retries page loads behind the portal breaker
+            Step('navigate', self.open_search, max_attempts=1),
+            Step('search', self.search, checkpoint='searched'),
+            Step('captcha_1', self.solve_first_captcha, recover=self.refresh_captcha,
+                 failure=WRONG_CAPTCHA, checkpoint='captcha_1_passed'),
+            Step('company_select', self.select_company, checkpoint='company_opened'),
+            Step('captcha_2', self.solve_second_captcha, recover=self.refresh_captcha, failure=WRONG_CAPTCHA),
+            Step('history_wait', self.wait_for_history, failure=PORTAL_TIMEOUT, max_attempts=2),
+            Step('history_extract', self.extract_history),
+            Step('challan_fetch', self.fetch_challans, max_attempts=1)
+        ]
+
+    def run(self):
+        """
+        Returns:
+            List of FilingRecords, or None if a step gave up
+        """
+        if not self.engine.run(self.steps()):
+            logger.warning(f"Annual filing flow failed at step '{self.engine.failed_step}'.")
+            # Dump HTML for debugging the page structure the step could not handle
+            capture(self.page, f"debug_annual_{self.engine.failed_step}", failure=True, html=True)
+            return None
+        return self.history_rows
+
+    @staticmethod
+    def _visible(target):
+        return target.count() > 0 and target.first.is_visible()
+
+    def open_search(self):
+        url = MCA_URLS['check_annual_filing']
+        logger.info(f"Navigating to {url}...")
+        with span('navigate'):
+            navigate(self.page, url)
+            self.page.wait_for_timeout(3000)
+
+    def search(self):
+        logger.info("Looking for CIN field (#masterdata-search-box)...")
+        with span('locate_input'):
+            cin_input = find(self.frame, 'annual.search_input')
+        if not cin_input:
+            raise StepFailed("CIN input not found.")
+
+        # Type CIN slowly
+        type_slowly(cin_input, self.cin)
+        logger.info(f"Typed CIN: {self.cin}")
+
+        logger.info("Clicking Search Icon (#searchicon)...")
+        search_icon = find(self.frame, 'annual.search_icon')
+        self.scheduler.acquire('form_submit')
+        with span('submit', step='search'):
+            if search_icon:
+                search_icon.click()
+            else:
+                cin_input.press("Enter")
+        self.page.wait_for_timeout(2000)
+
+        logger.info("Waiting for CAPTCHA modal (#captchaModal)...")
+        self.captcha_modal.wait_for(state="visible", timeout=10000)
+        logger.info("CAPTCHA Modal appeared.")
+
+    def refresh_captcha(self):
+        """Ask the open modal for a new CAPTCHA image and let it render."""
+        refresh_btn = find(self.captcha_modal.first, 'annual.captcha_refresh', timeout=1000)
+        if refresh_btn:
+            refresh_btn.click()
+        self.page.wait_for_timeout(3000)
+
+    def _submit_captcha(self, container, text, step):
+        captcha_input = find(container, 'annual.captcha_input')
+        if not captcha_input:
+            raise StepFailed("CAPTCHA input not found.")
+        captcha_input.clear()
+        captcha_input.fill(text)
+        logger.info(f"Filled CAPTCHA with: {text}")
+        self.scheduler.acquire('form_submit')
+        with span('submit', step=step):
+            locator(container, 'annual.captcha_submit').first.click()
+        logger.info("Clicked Submit.")
+
+    def _wait_for_result(self, success, step, timeout=10):
+        """
+        Poll until the portal shows the success element or a CAPTCHA error.
+
+        Returns:
+            'success', 'error' or 'unknown' (neither within the timeout)
+        """
+        logger.info("Checking validation result (Polling)...")
+        result_span = start_span('result_wait', step=step, attempt=self.engine.attempts.get(step, 1) - 1)
+        status = "unknown"
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            # Check for Error first
+            if self._visible(self.error_text):
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Error found! Text: %s", self.error_text.first.inner_text())
+                status = "error"
+                break
+            if self._visible(success):
+                status = "success"
+                break
+            self.page.wait_for_timeout(500)
+        result_span.end(status)
+
+        if status == "error":
+            self.scheduler.report('form_submit', False)
+            capture(self.page, f"failed_annual_{step}_attempt_{self.engine.attempts.get(step, 1)}", failure=True)
+            raise StepFailed("Incorrect CAPTCHA.", WRONG_CAPTCHA)
+        if status == "success":
+            self.scheduler.report('form_submit', True)
+        return status
+
+    def solve_first_captcha(self):
+        captcha_canvas = find(self.frame, 'annual.captcha_canvas', timeout=3000)
+        if not captcha_canvas:
+            raise StepFailed("Canvas not found.", retryable=False)
+        logger.info("Found CAPTCHA Canvas. Waiting for render...")
+        self.page.wait_for_timeout(1000)
+
+        text = solve_captcha(self.frame, captcha_canvas, 'annual')
+        if not text:
+            raise StepFailed("Failed to solve CAPTCHA.", SOLVER_ERROR)
+        time.sleep(2)
+        self._submit_captcha(self.frame, text, 'captcha_1')
+
+        # A passed CAPTCHA lands on the search results (company list)
+        logger.info("Checking for Search Results (Company Selection)...")
+        if self._wait_for_result(self.company_link, 'captcha_1') != "success":
+            raise StepFailed("Status unclear after the first CAPTCHA.", retryable=False)
+
+    def select_company(self):
+        company_link = find(self.frame, 'annual.company_link', cin=self.cin)
+        if not company_link:
+            raise StepFailed(f"Company link for {self.cin} not found.", retryable=False)
+        logger.info(f"Found Company Link for {self.cin}. Clicking...")
+        company_link.click()
+
+        # Now we expect a SECOND Captcha or the result page
+        logger.info("Waiting for Second CAPTCHA Modal or Result Page...")
+        self.page.wait_for_timeout(2000)
+        # Make sure we aren't seeing the old modal
+        try:
+            self.captcha_modal.wait_for(state="hidden", timeout=3000)
+        except Exception:
+            pass  # It might already be visible or not present, proceed
+        self.captcha_modal.or_(self.success_indicator).first.wait_for(state="visible", timeout=10000)
+
+        # Wait for the captcha image/canvas to actually update/repaint
+        self.page.wait_for_timeout(3000)
+
+    def solve_second_captcha(self):
+        if self._visible(self.success_indicator):
+            logger.info("No second CAPTCHA; history page already shown.")
+            return
+
+        # SCOPE THE LOCATOR: Only look for canvas INSIDE the visible modal
+        active_modal = self.captcha_modal.first
+        captcha_canvas = find(active_modal, 'annual.captcha_canvas', timeout=3000)
+        if not captcha_canvas:
+            logger.warning("Canvas not found in second modal; checking the history page.")
+            return
+
+        attempt = self.engine.attempts.get('captcha_2', 1) - 1
+        logger.info("Found 2nd CAPTCHA Canvas. Solving...")
+        text = solve_captcha(self.frame, captcha_canvas, f'annual_2nd_{attempt}')
+        # FILTERING: the portal's CAPTCHAs are 6 characters, reject anything else unsubmitted
+        if not text or len(text) != 6:
+            raise StepFailed(f"Solved text '{text}' is invalid length.", WRONG_CAPTCHA)
+        self._submit_captcha(active_modal, text, 'captcha_2')
+
+        if self._wait_for_result(self.success_indicator, 'captcha_2') == "success":
+            logger.info("SUCCESS: 2nd Captcha passed!")
+            self.checkpoint('captcha_2_passed')
+        else:
+            logger.warning("Timeout waiting for validation result; checking the history page.")
+
+    def wait_for_history(self):
+        with span('history_wait'):
+            self.success_indicator.wait_for(state="visible", timeout=60000)
+        logger.info("SUCCESS: Annual Filing History Page loaded!")
+        # Screenshot + HTML of the history table (kept per ARTIFACT_CONFIG)
+        capture(self.page, "debug_history_page", html=True)
+
+    def extract_history(self):
+        logger.info("Ready to extract Filing History...")
+        with span('table_extract') as table_span:
+            # The table class seen in debug HTML is 'tab-table' inside 'enquireFees tableComponent'
+            self.table = find(self.frame, 'annual.history_table', timeout=10000)
+            if not self.table:
+                raise StepFailed("History table not found.")
+            self.table.locator("tr").first.wait_for(state="visible", timeout=10000)
+
+            # One snapshot of the table instead of a locator call per cell
+            html = snapshot(self.frame, "table.tab-table")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("History table HTML: %s", html)
+            entries = extract(html, 'annual_history')
+            for index, record in entries:
+                logger.info(f"Row {index}: SRN={record['SRN']}, Form={record['Form Name']}, Date={record['Event Date']}")
+            table_span.attrs['rows'] = len(entries)
+        self._entries = entries
+
+    def _download_challan(self, srn, row_index, pdf_path):
+        challan_cell = self.table.locator("tr").nth(row_index).locator("td").nth(3)
+        download_btn = find(challan_cell, 'annual.challan_button')
+        if not download_btn:
+            raise StepFailed(f"Download button for {srn} not found.", retryable=False)
+        self.scheduler.acquire('challan_download')
+        try:
+            with span('challan_download', srn=srn):
+                with self.page.expect_download(timeout=30000) as download_info:
+                    download_btn.click()
+                download = download_info.value
+                if not os.path.exists("challan_pdfs"):
+                    os.makedirs("challan_pdfs")
+                download.save_as(pdf_path)
+                metrics.inc('mca_challan_download_bytes_total', os.path.getsize(pdf_path))
+        except Exception:
+            self.scheduler.report('challan_download', False)
+            raise
+        logger.info(f"Downloaded Challan to: {pdf_path}")
+        self.scheduler.report('challan_download', True)
+        self.checkpoint('challan_downloaded', srn, path=pdf_path)
+
+    def fetch_challans(self):
+        history_rows = []
+        for index, record in self._entries:
+            srn = record["SRN"]
+            pdf_path = os.path.join("challan_pdfs", f"{srn}.pdf")
+
+            if self.journal and self.journal.has(self.cin, 'challan_downloaded', srn) and os.path.exists(pdf_path):
+                logger.info(f"Challan for {srn} already downloaded, skipping.")
+                challan_saved = True
+            elif record["Challan"]:
+                logger.info(f"Found Download Button for {srn}. Clicking...")
+                # Each download is its own step: a timeout retries just this click
+                challan_saved, _ = self.engine.run_step(Step(
+                    'challan_download', partial(self._download_challan, srn, index, pdf_path),
+                    failure=PORTAL_TIMEOUT, max_attempts=2, required=False
+                ))
+            else:
+                logger.info("No download button found.")
+                challan_saved = False
+
+            history_rows.append(FilingRecord(srn, record["Form Name"], record["Event Date"],
+                                             pdf_path if challan_saved else None))
+
+        logger.info(f"Scraped {len(history_rows)} rows.")
+        self.history_rows = history_rows
+        self.checkpoint('table_scraped', rows=[row.to_dict() for row in history_rows])
+
+        # Save intermediate data WITH Challan URLs for standalone script
+        if history_rows:
+            records_frame(history_rows).to_excel("annual_filing_with_urls.xlsx", index=False)
+            logger.info("Saved intermediate data with Challan URLs to annual_filing_with_urls.xlsx")
+
+
+def scrape_filing_history(cin, journal=None):
+    """
+    Run the annual filing browser flow for a CIN and scrape the history table,
+    downloading each Challan PDF.
+
+    Args:
+        cin: CIN to check
+        journal: Optional JobJournal to record stage checkpoints in
+
+    Returns:
+        List of FilingRecords, or None if the lookup failed
+    """
     # Ensure screenshots directory exists
     if not os.path.exists(SCREENSHOTS_DIR):
         os.makedirs(SCREENSHOTS_DIR)
 
-    with sync_playwright() as p:
-        print(" Launching Firefox...")
-        browser = p.firefox.launch(headless=BROWSER_CONFIG['headless'])
-        context = browser.new_context(viewport=BROWSER_CONFIG['viewport'])
-        page = context.new_page()
+    # The recorder exits first, while the browser context is still open
+    with browser_session('annual_filing') as context, FlightRecorder() as recorder:
+        recorder.attach(context)
+        history_rows = AnnualFilingFlow(context.new_page(), cin, journal).run()
+        if history_rows is not None:
+            recorder.mark_success()
+        return history_rows
 
-        url = MCA_URLS['check_annual_filing']
-        print(f" Navigating to {url}...")
-        page.goto(url, wait_until='networkidle')
-        page.wait_for_timeout(3000)
 
-        target_frame = page
+def extract_payment_details(history_rows, cin=None, journal=None):
+    """
+    Phase 2: fill in payment details for each row from its LOCAL Challan PDF.
+
+    Args:
+        history_rows: FilingRecords from scrape_filing_history (updated in place)
+        cin: CIN the rows belong to (journal key)
+        journal: Optional JobJournal; already-parsed challans are reused
+
+    Returns:
+        The updated history_rows
+    """
+    logger.info("Phase 2: Extracting payment details from downloaded PDFs...")
+    
+    for i, row in enumerate(history_rows):
+        pdf_path = row.pdf_path
+        srn = row.srn
         
-        print(" Looking for CIN field (#masterdata-search-box)...")
-        cin_input = get_robust_locator(target_frame, '#masterdata-search-box')
+        # Missing until a challan says otherwise
+        row.clear_payment()
         
-        if cin_input:
-            print(" Found CIN Input!")
+        parsed = journal.data(cin, 'challan_parsed', srn) if journal else None
+        if parsed:
+            row.set_payment(parsed)
+            logger.info(f"[{i+1}/{len(history_rows)}] SRN {srn} already parsed (journal).")
+        elif pdf_path and os.path.exists(pdf_path):
+            logger.info(f"[{i+1}/{len(history_rows)}] Processing PDF for SRN {srn}...")
+            
             try:
-                # Type CIN slowly
-                type_slowly(cin_input, CIN_NUMBER)
-                print(f" Typed CIN: {CIN_NUMBER}")
-                
-                # Click Search Icon
-                print(" Clicking Search Icon (#searchicon)...")
-                search_icon = get_robust_locator(target_frame, '#searchicon')
-                if search_icon:
-                    search_icon.click()
-                else:
-                    cin_input.press("Enter")
+                with span('challan_parse', srn=srn):
+                    details = parse_challan_pdf(pdf_path)
+                row.set_payment(details)
+                if journal:
+                    journal.record(cin, 'challan_parsed', srn, **details)
+                logger.info(f"Date: {row.filing_date}, Amount: {row.amount_paid}, Late Fee: {row.late_fee}")
                 
-                page.wait_for_timeout(2000)
-
-                # Wait for CAPTCHA Modal
-                print(" Waiting for CAPTCHA modal (#captchaModal)...")
-                captcha_modal = target_frame.locator('#captchaModal')
-                
-                error_text_locator = target_frame.locator(".errormsg").or_(
-                     target_frame.locator(".alert-danger")
-                ).or_(
-                     target_frame.locator("text='Incorrect Captcha'")
-                ).or_(
-                     target_frame.locator("text='Enter valid text'")
-                ).or_(
-                     target_frame.locator("text='Captcha match failed'")
-                ).or_(
-                     target_frame.locator("*:has-text('The captcha entered is incorrect')")
-                )
-
-                try:
-                    captcha_modal.wait_for(state="visible", timeout=10000)
-                    print(" CAPTCHA Modal appeared.")
-                    
-                    # Verification loop
-                    for verify_attempt in range(MAX_VERIFICATION_ATTEMPTS):
-                         print(f"--- Verification Attempt {verify_attempt+1}/{MAX_VERIFICATION_ATTEMPTS} ---")
-                         
-                         captcha_canvas = target_frame.locator('#captchaCanvas, canvas').first
-                         if captcha_canvas.count() > 0:
-                             print(" Found CAPTCHA Canvas. Waiting for render...")
-                             page.wait_for_timeout(1000)
-                             
-                             # Solve CAPTCHA using shared module
-                             text = solve_captcha(target_frame, '#captchaCanvas, canvas', 'annual')
-                             time.sleep(2)
-                             
-                             if text:
-                                 captcha_input = target_frame.locator('#customCaptchaInput')
-                                 captcha_input.fill(text)
-                                 print(f" Filled CAPTCHA with: {text}")
-                                 
-                                 # Submit
-                                 submit_btn = target_frame.locator('#check')
-                                 submit_btn.click()
-                                 print(" Clicked Submit.")
-                                 
-                                 page.wait_for_timeout(5000)
-                                 
-                                 # Check if we are at the Search Results stage (Company list)
-                                 # The previous run showed we land here after the first captcha (or sometimes no captcha if session active?)
-                                 # We need to find the CIN link and click it.
-                                 
-                                 print(" Checking for Search Results (Company Selection)...")
-                                 # User provided specific locator strategy
-                                 company_link = target_frame.locator(f"//a[normalize-space()='{CIN_NUMBER}']").or_(
-                                     target_frame.locator(f"text={CIN_NUMBER}")
-                                 ).first
-                                 
-                                 if company_link.count() > 0:
-                                     print(f" Found Company Link for {CIN_NUMBER}. Clicking...")
-                                     company_link.click()
-                                     
-                                     # Now we expect a SECOND Captcha or the result page
-                                     print(" Waiting for Second CAPTCHA Modal or Result Page...")
-                                     page.wait_for_timeout(2000)
-                                     
-                                     # Reuse logic to handle potential second captcha
-                                     # We can wrap the captcha solving in a loop or function if we want to be cleaner, 
-                                     # but for now, let's look for the modal again.
-                                     
-                                     # Explicitly wait for the NEW modal to attach and be visible
-                                     print(" Waiting for Second CAPTCHA Modal...")
-                                     # Use a specific wait to ensure we aren't seeing the old one
-                                     try:
-                                         target_frame.locator('#captchaModal').wait_for(state="hidden", timeout=3000) 
-                                     except: 
-                                         pass # It might already be visible or not present, proceed
-                                         
-                                     captcha_modal.wait_for(state="visible", timeout=10000)
-
-                                     # CRITICAL FIX: Wait for the captcha image/canvas to actually update/repaint
-                                     page.wait_for_timeout(3000) 
-
-                                     # Verification Loop 2
-                                     for verify_attempt_2 in range(MAX_VERIFICATION_ATTEMPTS):
-                                         print(f"--- 2nd Verification Attempt {verify_attempt_2+1}/{MAX_VERIFICATION_ATTEMPTS} ---")
-                                         
-                                         # SCOPE THE LOCATOR: Only look for canvas INSIDE the visible modal
-                                         active_modal = target_frame.locator('#captchaModal').first
-                                         captcha_canvas = active_modal.locator('#captchaCanvas, canvas').first
-                                         
-                                         if captcha_canvas.count() > 0 and captcha_canvas.is_visible():
-                                             print(" Found 2nd CAPTCHA Canvas. Solving...")
-                                             
-                                             text_2 = solve_captcha(target_frame, '#captchaCanvas, canvas', f'annual_2nd_{verify_attempt_2}')
-                                             
-                                             # FILTERING: If solver returns < 6 chars, reject immediately
-                                             if not text_2 or len(text_2) != 6:
-                                                  print(f" Solved text '{text_2}' is invalid length. Retrying...")
-                                                  refresh_btn = active_modal.locator('#captchaRefresh').first
-                                                  if refresh_btn.is_visible(): refresh_btn.click()
-                                                  page.wait_for_timeout(2000)
-                                                  continue
-
-                                             print(f" Filling 2nd CAPTCHA with: {text_2}")
-                                             
-                                             captcha_input = active_modal.locator('#customCaptchaInput')
-                                             captcha_input.clear()
-                                             # Type naturally
-                                             captcha_input.fill(text_2) 
-                                             
-                                             submit_btn = active_modal.locator('#check')
-                                             submit_btn.click()
-                                             print(" Clicked Submit (2nd time).")
-                                             
-                                             # Define success indicator early
-                                             success_indicator = target_frame.locator("#screenone").or_(
-                                                 target_frame.locator(".annual_filing_table")
-                                             ).or_(
-                                                 target_frame.locator("#annualFilingTable")
-                                             )
-
-                                             # Polling Loop for Result (Error or Success) - Up to 10 seconds
-                                             print(" Checking validation result (Polling)...")
-                                             validation_start_time = time.time()
-                                             validation_status = "unknown"
-                                             
-                                             while time.time() - validation_start_time < 10:
-                                                 # Debug visibility
-                                                 err_count = error_text_locator.count()
-                                                 succ_count = success_indicator.count()
-                                                 
-                                                 # Check for Error first
-                                                 if err_count > 0:
-                                                     is_vis = error_text_locator.first.is_visible()
-                                                     if is_vis:
-                                                         print(f" DEBUG: Error found! Text: {error_text_locator.first.inner_text()}")
-                                                         print(" FAILURE: Incorrect 2nd Captcha.")
-                                                         validation_status = "error"
-                                                         # Refresh logic
-                                                         active_modal.locator('#captchaRefresh').click()
-                                                         page.wait_for_timeout(3000) 
-                                                         break # Break polling, continue outer retry loop
-                                                 
-                                                 # Check for Success
-                                                 if succ_count > 0:
-                                                     is_vis = success_indicator.first.is_visible()
-                                                     # print(f" DEBUG: Success indicator count={succ_count}, visible={is_vis}") # Too noisy?
-                                                     if is_vis:
-                                                         print(" SUCCESS: 2nd Captcha passed!")
-                                                         validation_status = "success"
-                                                         break # Break polling, break outer retry loop
-                                                 
-                                                 page.wait_for_timeout(500)
-                                             
-                                             if validation_status == "error":
-                                                 continue # Retry next attempt
-                                             elif validation_status == "success":
-                                                 break # Exit retry loop
-                                             else:
-                                                 print(" Timeout waiting for validation result. Assuming check failed or stuck.")
-                                                 # If we timed out without error or success, we might want to retry or just continue to final check
-                                                 # Let's try to scrape anyway or break if we think it failed.
-                                                 # For robustness, let's treat as 'unknown' and break to check final page.
-                                                 break
-                                             
-                                         else:
-                                             print(" Canvas not found in second modal.")
-                                             break
-
-                                 # Now checks for the Final Result Table (#screenone or .annual_filing_table)
-                                 # The HTML dump showed id="screenone" hidden initially, so it should be visible now
-                                 success_indicator = target_frame.locator("#screenone").or_(
-                                     target_frame.locator(".annual_filing_table")
-                                 ).or_(
-                                     target_frame.locator("#annualFilingTable")
-                                 )
-                                 
-                                 success_indicator.wait_for(state="visible", timeout=60000)
-                                 
-                                 if success_indicator.count() > 0 and success_indicator.first.is_visible():
-                                     print(" SUCCESS: Annual Filing History Page loaded!")
-                                     page.screenshot(path=f"{SCREENSHOTS_DIR}/annual_filing_history.png")
-                                     
-                                     # Dump HTML to verify table structure for extraction
-                                     try:
-                                         with open(f"{SCREENSHOTS_DIR}/debug_history_page.html", "w", encoding="utf-8") as f:
-                                             f.write(target_frame.content())
-                                     except: pass
-                                     
-                                     # PROCEED TO EXTRACTION
-                                     print(" Ready to extract Filing History...")
-                                     
-                                     # Scrape the main table
-                                     try:
-                                         history_rows = []
-                                         # The table class seen in debug HTML is 'tab-table' inside 'enquireFees tableComponent'
-                                         # But let's use the robust headers we found
-                                         table = target_frame.locator("table.tab-table").first
-                                         
-                                         # Wait for rows
-                                         table.locator("tr").first.wait_for(state="visible", timeout=10000)
-                                         
-                                         rows = table.locator("tr").all()
-                                         print(f" Found {len(rows)} rows in table.")
-                                         
-                                         # Skip header row (usually index 0)
-                                         # We'll take the first data row to probe Challan
-                                         for i, row in enumerate(rows):
-                                             if i == 0: continue # Header
-                                             
-                                             cells = row.locator("td").all()
-                                             if len(cells) >= 4:
-                                                 srn = cells[0].inner_text()
-                                                 form_name = cells[1].inner_text()
-                                                 event_date = cells[2].inner_text()
-                                                 
-                                                 print(f" Row {i}: SRN={srn}, Form={form_name}, Date={event_date}")
-                                                
-                                                 # DEBUG: Print exact HTML of the Challan cell
-                                                 try:
-                                                     print(f" DEBUG: Cell[3] HTML: {cells[3].inner_html()}")
-                                                 except:
-                                                     print(" DEBUG: Could not print cell HTML")
-
-                                                 # Handle Direct Download
-                                                 challan_saved = False
-                                                 pdf_filename = f"{srn}.pdf"
-                                                 pdf_path = os.path.join("challan_pdfs", pdf_filename)
-                                                 
-                                                 download_btn = cells[3].locator(".downloadDoc, img").first
-                                                 if download_btn.count() > 0:
-                                                     print(f" Found Download Button for {srn}. Clicking...")
-                                                     try:
-                                                         # Setup download handler
-                                                         with page.expect_download(timeout=30000) as download_info:
-                                                             download_btn.click()
-                                                         
-                                                         download = download_info.value
-                                                         # Save to specific path
-                                                         if not os.path.exists("challan_pdfs"): os.makedirs("challan_pdfs")
-                                                         download.save_as(pdf_path)
-                                                         print(f" Downloaded Challan to: {pdf_path}")
-                                                         challan_saved = True
-                                                     except Exception as e:
-                                                         print(f" Download failed for {srn}: {e}")
-                                                         challan_saved = False
-                                                 else:
-                                                     print(" No download button found.")
-                                                  
-                                                 item = {
-                                                     "SRN": srn,
-                                                     "Form Name": form_name,
-                                                     "Event Date": event_date,
-                                                     "PDF Path": pdf_path if challan_saved else "N/A"
-                                                 }
-                                                 
-                                                 history_rows.append(item)
-                                         
-                                         
-                                         print(f" Scraped {len(history_rows)} rows.")
-                                         
-                                         # Save intermediate data WITH Challan URLs for standalone script
-                                         if history_rows:
-                                             df_temp = pd.DataFrame(history_rows)
-                                             df_temp.to_excel("annual_filing_with_urls.xlsx", index=False)
-                                             print(f" Saved intermediate data with Challan URLs to annual_filing_with_urls.xlsx")
-                                         
-                                         # Phase 2: Extract payment details from LOCAL PDFs
-                                         print("\n Phase 2: Extracting payment details from downloaded PDFs...")
-                                         
-                                         for i, row in enumerate(history_rows):
-                                             pdf_path = row.get('PDF Path', 'N/A')
-                                             srn = row['SRN']
-                                             
-                                             # Initialize with N/A defaults
-                                             row['Date of Filing'] = "N/A"
-                                             row['Amount Paid'] = "N/A"
-                                             row['Late Fee'] = "N/A"
-                                             
-                                             if pdf_path != "N/A" and os.path.exists(pdf_path):
-                                                 print(f" [{i+1}/{len(history_rows)}] Processing PDF for SRN {srn}...")
-                                                 
-                                                 try:
-                                                     # Extract text from PDF
-                                                     with pdfplumber.open(pdf_path) as pdf:
-                                                         text = ""
-                                                         for page_pdf in pdf.pages:
-                                                             text += page_pdf.extract_text() or ""
-                                                     
-                                                     # Parse text to find payment details
-                                                     lines = text.split('\n')
-                                                     
-                                                     for line in lines:
-                                                         # Find Service Request Date
-                                                         if 'Service Request Date' in line and ':' in line:
-                                                             parts = line.split(':', 1)
-                                                             if len(parts) == 2:
-                                                                 date_of_filing = parts[1].strip()
-                                                                 row['Date of Filing'] = date_of_filing
-                                                         
-                                                         # Find Total amount
-                                                         if 'Total' in line:
-                                                             # Extract numeric value from line
-                                                             parts = line.split()
-                                                             for part in reversed(parts):
-                                                                 if part.replace('.', '', 1).replace(',', '').isdigit():
-                                                                     row['Amount Paid'] = part
-                                                                     break
-                                                         
-                                                         # Find Additional (Late Fee)
-                                                         if 'Additional' in line:
-                                                             parts = line.split()
-                                                             for part in reversed(parts):
-                                                                 if part.replace('.', '', 1).replace(',', '').isdigit():
-                                                                     row['Late Fee'] = part
-                                                                     break
-                                                     
-                                                     # If no Additional fee found, set to 0.00
-                                                     if row['Late Fee'] == "N/A":
-                                                         row['Late Fee'] = "0.00"
-                                                     
-                                                     print(f"   Date: {row['Date of Filing']}, Amount: {row['Amount Paid']}, Late Fee: {row['Late Fee']}")
-                                                     
-                                                 except Exception as e:
-                                                     print(f"   Error parsing PDF {pdf_path}: {e}")
-                                             else:
-                                                 print(f"   Skipping {srn} (No PDF found)")
-                                         
-                                         # Save all rows with payment details
-                                         if history_rows:
-                                             df = pd.DataFrame(history_rows)
-                                             # Reorder columns (exclude Challan URL) - done AFTER Phase 2
-                                             column_order = ['SRN', 'Form Name', 'Event Date', 'Date of Filing', 'Amount Paid', 'Late Fee']
-                                             df = df[column_order]
-                                             df.to_excel("annual_filing_details.xlsx", index=False)
-                                             print(f"\n Saved {len(history_rows)} records with payment details to annual_filing_details.xlsx")
-                                             
-                                     except Exception as extract_e:
-                                         print(f" Extraction Error: {extract_e}")
-                                         
-                                     return
-
-                                 
-                                 # Check for Errors (locator defined above)
-                                 
-                                 if error_text_locator.count() > 0 and error_text_locator.first.is_visible():
-                                      print(" FAILURE: Incorrect Captcha detected.")
-                                      page.screenshot(path=f"{SCREENSHOTS_DIR}/failed_annual_attempt_{verify_attempt}.png")
-                                      # Refresh
-                                      refresh_btn = target_frame.locator('#captchaRefresh, .captcha-refresh')
-                                      if refresh_btn.count() > 0:
-                                          refresh_btn.click()
-                                          page.wait_for_timeout(2000)
-                                      continue
-                                 
-                                 print(" Status unclear, taking final screenshot.")
-                                 page.screenshot(path=f"{SCREENSHOTS_DIR}/annual_filing_final.png")
-                                 
-                                 # Dump HTML for debugging structure even if success not detected
-                                 try:
-                                     with open(f"{SCREENSHOTS_DIR}/debug_annual_final.html", "w", encoding="utf-8") as f:
-                                         f.write(target_frame.content())
-                                     print(" Saved debug HTML to screenshots/debug_annual_final.html")
-                                 except Exception as e:
-                                     print(f" Failed to save debug HTML: {e}")
-                                     
-                                 return
-                             else:
-                                 print(" Failed to solve CAPTCHA.")
-                         else:
-                             print(" Canvas not found.")
-                             break
-                    
-                    print(" Failed verification after retries.")
-                except Exception as e:
-                    print(f" Verification flow error: {e}")
-            
             except Exception as e:
-                print(f" Error: {e}")
-                page.screenshot(path=f"{SCREENSHOTS_DIR}/debug_annual_error.png")
+                logger.error(f"Error parsing PDF {pdf_path}: {e}")
+        else:
+            logger.info(f"Skipping {srn} (No PDF found)")
+    
+    return history_rows
+
+
+def lookup_annual_filing(cin, journal=None):
+    """
+    Look up a CIN's filing history including Challan payment details.
+
+    With a journal, a CIN whose table was already scraped resumes at Phase 2
+    without opening a browser, and finished CINs return their recorded rows.
+
+    Args:
+        cin: CIN to check
+        journal: Optional JobJournal for checkpointing/resuming
+
+    Returns:
+        List of filing history row dicts, or None if the lookup failed
+    """
+    if journal and journal.is_finished(cin):
+        logger.info(f"{cin} already finished (journal), skipping.")
+        return journal.data(cin, 'done')['rows']
+    
+    with entity_context('annual_filing', cin), profiled(), span('lookup'), metrics.timer('mca_lookup_seconds', flow='annual_filing'):
+        scraped = journal.data(cin, 'table_scraped') if journal else None
+        if scraped:
+            logger.info(f"Resuming {cin} from scraped table (journal).")
+            history_rows = [FilingRecord.from_dict(row) for row in scraped['rows']]
         else:
-             print(" CIN input not found.")
+            with metrics.in_flight('mca_browser_pages_open'):
+                history_rows = scrape_filing_history(cin, journal)
+        
+        if history_rows is None:
+            metrics.inc('mca_lookups_total', flow='annual_filing', outcome='failed')
+            if journal:
+                journal.record(cin, 'failed')
+            return None
+        
+        # Plain dicts from here on: the journal, cache and callers store them as JSON
+        history_rows = [row.to_dict() for row in extract_payment_details(history_rows, cin, journal)]
+    metrics.inc('mca_lookups_total', flow='annual_filing', outcome='ok')
+    if journal:
+        journal.record(cin, 'done', rows=history_rows)
+    return history_rows
+
+
+def run(cin=None, force_refresh=False):
+    """
+    Look up a CIN's filing history (cached) and save it to Excel/Parquet.
+
+    Args:
+        cin: CIN to check, defaults to DEFAULT_CIN
+        force_refresh: Bypass the lookup cache
+
+    Returns:
+        List of filing history row dicts, or None if the lookup failed
+    """
+    logger.info(f"Python Executable: {sys.executable}")
+    
+    cin = cin or DEFAULT_CIN
+    history_rows = cached_lookup('annual_filing', cin, lambda: lookup_annual_filing(cin), force_refresh=force_refresh)
+    
+    # Save all rows with payment details
+    if history_rows:
+        df = records_frame([FilingRecord.from_dict(row) for row in history_rows])
+        # Reorder columns (exclude Challan URL) - done AFTER Phase 2
+        df = df[COLUMN_ORDER]
+        df.to_excel("annual_filing_details.xlsx", index=False)
+        logger.info(f"Saved {len(history_rows)} records with payment details to annual_filing_details.xlsx")
+
+        if 'parquet' in OUTPUT_FORMATS:
+            write_parquet(df, "annual_filing_details.parquet", cin=cin)
+            logger.info("Saved typed Parquet output to annual_filing_details.parquet")
+    
+    return history_rows
+
 
 if __name__ == "__main__":
-    run()
+    if '--profile' in sys.argv:
+        enable_profiling()
+    run(force_refresh='--refresh' in sys.argv)
@@ -0,0 +1,176 @@
+"""
+Director Companies Lookup for MCA Automation
+Resolves the companies/LLPs a director (DIN) is associated with from the
+portal's master data search, which uses the same search box and CAPTCHA
+modals as the annual filing page:
+
+    python director_companies.py 08560072
+
+Feeds the DIN -> annual filing audit (see mca_utils.pipeline).
+"""
+
+import os
+import re
+import sys
+
+from mca_utils.config import MCA_URLS, DEFAULT_DIN, SCREENSHOTS_DIR
+from mca_utils.utils import navigate
+from mca_utils.retry import WRONG_CAPTCHA, PORTAL_TIMEOUT
+from mca_utils.steps import Step, StepFailed
+from mca_utils.cache import cached_lookup
+from mca_utils.tracing import entity_context, span
+from mca_utils import metrics
+from mca_utils.artifacts import capture
+from mca_utils.flight_recorder import FlightRecorder
+from mca_utils.browser import browser_session
+from mca_utils.extract import get_parser, snapshot
+from mca_utils.locators import locator
+from mca_utils.profiling import enable_profiling, profiled
+from mca_utils.log import get_logger
+from check_annual_filing import AnnualFilingFlow
+
+logger = get_logger('director_companies')
+
+# CIN (21 characters) or LLPIN (AAA-1234)
+COMPANY_ID_PATTERN = re.compile(r'^(?:[LUF]\d{5}[A-Z]{2}\d{4}[A-Z]{3}\d{6}|[A-Z]{3}-\d{4})$')
+
+
+def companies_from_html(html):
+    """
+    Read associated companies from a snapshot of the director's master data.
+
+    Rows are recognised by a cell holding a CIN/LLPIN rather than by column
+    position, with the company name taken from the cell after it.
+
+    Args:
+        html: HTML snapshot of the companies table (or the whole page)
+
+    Returns:
+        List of {'CIN', 'Company Name'} dicts, each company once
+    """
+    parser = get_parser()
+    document = parser.parse(html)
+    companies = {}
+    for row in parser.select(document, 'tr'):
+        texts = [' '.join(parser.text(cell).split()) for cell in parser.select(row, 'td')]
+        for i, text in enumerate(texts):
+            if COMPANY_ID_PATTERN.match(text):
+                name = texts[i + 1] if i + 1 < len(texts) else "N/A"
+                companies.setdefault(text, {'CIN': text, 'Company Name': name or "N/A"})
+                break
+    return list(companies.values())
+
+
+class DirectorCompaniesFlow(AnnualFilingFlow):
+    """
+    The annual filing flow's search and CAPTCHA steps, searching for a DIN
+    and opening the director's master data instead of a company's filings.
+    """
+
+    def __init__(self, page, din, journal=None):
+        # The search result link is matched by the DIN the same way as a CIN
+        super().__init__(page, din, journal)
+        self.din = din
+        self.companies = None
+        self.success_indicator = locator(page, 'director.companies')
+        self.empty_indicator = locator(page, 'director.no_companies')
+
+    def steps(self):
+        return [
+            Step('navigate', self.open_search, max_attempts=1),
+            Step('search', self.search, checkpoint='searched'),
+            Step('captcha_1', self.solve_first_captcha, recover=self.refresh_captcha,
+                 failure=WRONG_CAPTCHA, checkpoint='captcha_1_passed'),
+            Step('director_select', self.select_company, checkpoint='director_opened'),
+            Step('captcha_2', self.solve_second_captcha, recover=self.refresh_captcha, failure=WRONG_CAPTCHA),
+            Step('companies_wait', self.wait_for_companies, failure=PORTAL_TIMEOUT, max_attempts=2),
+            Step('companies_extract', self.extract_companies)
+        ]
+
+    def run(self):
+        """
+        Returns:
+            List of {'CIN', 'Company Name'} dicts, or None if a step gave up
+        """
+        if not self.engine.run(self.steps()):
+            logger.warning(f"Director companies flow failed at step '{self.engine.failed_step}'.")
+            capture(self.page, f"debug_director_{self.engine.failed_step}", failure=True, html=True)
+            return None
+        return self.companies
+
+    def open_search(self):
+        url = MCA_URLS['director_master_data']
+        logger.info(f"Navigating to {url}...")
+        with span('navigate'):
+            navigate(self.page, url)
+            self.page.wait_for_timeout(3000)
+
+    def wait_for_companies(self):
+        with span('companies_wait'):
+            self.success_indicator.or_(self.empty_indicator).first.wait_for(state="visible", timeout=60000)
+        logger.info("Director master data loaded.")
+        capture(self.page, "debug_director_page", html=True)
+
+    def extract_companies(self):
+        if not self._visible(self.success_indicator):
+            logger.info(f"No companies associated with {self.din}.")
+            self.companies = []
+            return
+        with span('table_extract') as table_span:
+            self.companies = companies_from_html(snapshot(self.frame, self.success_indicator.first))
+            table_span.attrs['companies'] = len(self.companies)
+        if not self.companies:
+            raise StepFailed("Companies table has no CIN/LLPIN rows.", retryable=False)
+        logger.info(f"{self.din}: {len(self.companies)} associated company(ies).")
+
+
+def lookup_director_companies(din):
+    """
+    Look up the companies a director is associated with in a fresh browser session.
+
+    Args:
+        din: Director's DIN
+
+    Returns:
+        List of {'CIN', 'Company Name'} dicts (empty if none), or None if the lookup failed
+    """
+    if not os.path.exists(SCREENSHOTS_DIR):
+        os.makedirs(SCREENSHOTS_DIR)
+
+    with entity_context('director_companies', din), profiled(), span('lookup'), \
+            metrics.timer('mca_lookup_seconds', flow='director_companies'):
+        with metrics.in_flight('mca_browser_pages_open'):
+            # The recorder exits first, while the browser context is still open
+            with browser_session('director_companies') as context, FlightRecorder() as recorder:
+                recorder.attach(context)
+                companies = DirectorCompaniesFlow(context.new_page(), din).run()
+                if companies is not None:
+                    recorder.mark_success()
+    metrics.inc('mca_lookups_total', flow='director_companies', outcome='failed' if companies is None else 'ok')
+    return companies
+
+
+def run(din=None, force_refresh=False):
+    """
+    Look up a director's companies (cached) and print them.
+
+    Args:
+        din: DIN to look up, defaults to DEFAULT_DIN
+        force_refresh: Bypass the lookup cache
+    """
+    din = din or DEFAULT_DIN
+    companies = cached_lookup('director_companies', din, lambda: lookup_director_companies(din),
+                              force_refresh=force_refresh)
+    if companies is None:
+        logger.error(f"Could not resolve the companies of {din}.")
+        return None
+    for company in companies:
+        print(f"{company['CIN']}\t{company['Company Name']}")
+    return companies
+
+
+if __name__ == "__main__":
+    if '--profile' in sys.argv:
+        enable_profiling()
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    run(args[0] if args else None, force_refresh='--refresh' in sys.argv)
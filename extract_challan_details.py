@@ -9,18 +9,30 @@ Run this after check_annual_filing.py has extracted the basic table.
 """
 
 import os
-import requests
-import pdfplumber
-import pandas as pd
-from tqdm import tqdm  # For progress bar
+from concurrent.futures import ThreadPoolExecutor
+from mca_utils.config import OUTPUT_FORMATS
+from mca_utils.export import write_parquet
+from mca_utils.scheduler import get_scheduler
+from mca_utils.challan_parser import parse_challan_pdf
+from mca_utils.tracing import span
+from mca_utils import metrics
+from mca_utils.profiling import enable_profiling, profiled
+from mca_utils.log import get_logger
+
+logger = get_logger('extract_challan_details')
 
 # Configuration
 INPUT_FILE = "annual_filing_with_urls.xlsx"  # File with Challan URLs
 OUTPUT_FILE = "annual_filing_details_complete.xlsx"
+PARQUET_OUTPUT = "annual_filing_details_complete.parquet"
 PDF_DIR = "challan_pdfs"
 
+PAYMENT_COLUMNS = ['Date of Filing', 'Amount Paid', 'Late Fee']
+OUTPUT_COLUMNS = ['SRN', 'Form Name', 'Event Date'] + PAYMENT_COLUMNS
+
 def download_and_extract_challan(url, srn):
     """Download a Challan PDF and extract payment details."""
+    import requests
     
     date_of_filing = "N/A"
     amount_paid = "N/A"
@@ -29,114 +41,119 @@ def download_and_extract_challan(url, srn):
     try:
         # Download PDF
         pdf_path = f"{PDF_DIR}/{srn}.pdf"
-        response = requests.get(url, timeout=30)
+        scheduler = get_scheduler()
+        scheduler.acquire('challan_download')
+        try:
+            with span('challan_download', srn=srn):
+                response = requests.get(url, timeout=30)
+        except requests.RequestException:
+            scheduler.report('challan_download', False)
+            raise
+        scheduler.report('challan_download', response.ok)
+        metrics.inc('mca_challan_download_bytes_total', len(response.content))
         
         with open(pdf_path, 'wb') as f:
             f.write(response.content)
         
-        # Extract text from PDF
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ""
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-        
-        # Parse text to find payment details
-        lines = text.split('\n')
-        
-        for line in lines:
-            # Find Service Request Date
-            if 'Service Request Date' in line and ':' in line:
-                parts = line.split(':', 1)
-                if len(parts) == 2:
-                    date_of_filing = parts[1].strip()
-            
-            # Find Total amount
-            if 'Total' in line:
-                parts = line.split()
-                for part in reversed(parts):
-                    # Check if it's a number (allows . and ,)
-                    if part.replace('.', '', 1).replace(',', '').isdigit():
-                        amount_paid = part
-                        break
-            
-            # Find Additional (Late Fee)
-            if 'Additional' in line:
-                parts = line.split()
-                for part in reversed(parts):
-                    if part.replace('.', '', 1).replace(',', '').isdigit():
-                        late_fee = part
-                        break
-        
-        # If no Additional fee found, set to 0.00
-        if late_fee == "N/A":
-            late_fee = "0.00"
+        # Extract and parse payment details
+        with span('challan_parse', srn=srn), profiled(f"challan_{srn}"):
+            details = parse_challan_pdf(pdf_path)
+        date_of_filing = details['Date of Filing']
+        amount_paid = details['Amount Paid']
+        late_fee = details['Late Fee']
             
     except Exception as e:
-        print(f"Error processing {srn}: {e}")
+        logger.error(f"Error processing {srn}: {e}")
     
     return date_of_filing, amount_paid, late_fee
 
 
-def main():
-    print(f"Reading input file: {INPUT_FILE}")
+def main(input_file=None, output_file=None, workers=1):
+    """
+    Download and parse every Challan in the input workbook.
+
+    Args:
+        input_file: Excel file with SRN and Challan URL columns (default INPUT_FILE)
+        output_file: Excel file to write (default OUTPUT_FILE)
+        workers: Number of concurrent downloads
+    """
+    import pandas as pd
+    from tqdm import tqdm  # For progress bar
+
+    input_file = input_file or INPUT_FILE
+    output_file = output_file or OUTPUT_FILE
+    logger.info(f"Reading input file: {input_file}")
     
     # Read the Excel file
-    df = pd.read_excel(INPUT_FILE)
+    df = pd.read_excel(input_file)
     
-    print(f"Found {len(df)} rows")
-    print(f"Columns: {list(df.columns)}")
+    logger.info(f"Found {len(df)} rows")
+    logger.info(f"Columns: {list(df.columns)}")
     
     # Check if Challan URL column exists
     if 'Challan URL' not in df.columns:
-        print("\nERROR: 'Challan URL' column not found!")
-        print("This script needs the Challan URLs from the initial scraping.")
-        print("Please run check_annual_filing.py first to get the basic data.")
+        logger.error("'Challan URL' column not found!")
+        logger.info("This script needs the Challan URLs from the initial scraping.")
+        logger.info("Please run check_annual_filing.py first to get the basic data.")
         return
     
     # Create PDF directory
     if not os.path.exists(PDF_DIR):
         os.makedirs(PDF_DIR)
-        print(f"Created directory: {PDF_DIR}")
+        logger.info(f"Created directory: {PDF_DIR}")
     
     # Initialize payment detail columns if they don't exist
-    if 'Date of Filing' not in df.columns:
-        df['Date of Filing'] = "N/A"
-    if 'Amount Paid' not in df.columns:
-        df['Amount Paid'] = "N/A"
-    if 'Late Fee' not in df.columns:
-        df['Late Fee'] = "N/A"
+    for col in PAYMENT_COLUMNS:
+        if col not in df.columns:
+            df[col] = "N/A"
+    
+    # Only rows with an http(s) Challan URL are processed
+    urls = df['Challan URL']
+    valid = urls.notna() & urls.astype(str).str.startswith('http')
+    
+    # Duplicate (SRN, URL) pairs share a single download
+    jobs = df.loc[valid, ['SRN', 'Challan URL']].drop_duplicates()
     
     # Process each Challan
-    print(f"\nProcessing {len(df)} Challan PDFs...")
+    logger.info(f"Processing {len(jobs)} Challan PDFs ({int((~valid).sum())} rows without a valid URL skipped)...")
     
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Downloading PDFs"):
-        challan_url = row.get('Challan URL', 'N/A')
-        srn = row['SRN']
-        
-        if pd.notna(challan_url) and str(challan_url).startswith('http'):
-            date, amount, fee = download_and_extract_challan(challan_url, srn)
-            
-            df.at[idx, 'Date of Filing'] = date
-            df.at[idx, 'Amount Paid'] = amount
-            df.at[idx, 'Late Fee'] = fee
-            
-            print(f"  {srn}: Date={date}, Amount={amount}, Fee={fee}")
-        else:
-            print(f"  {srn}: No valid URL, skipping")
+    records = []
+    pairs = list(zip(jobs['SRN'], jobs['Challan URL']))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        outcomes = pool.map(lambda job: download_and_extract_challan(job[1], job[0]), pairs)
+        for (srn, challan_url), (date, amount, fee) in tqdm(zip(pairs, outcomes), total=len(pairs), desc="Downloading PDFs"):
+            records.append((srn, challan_url, date, amount, fee))
+            logger.info(f"{srn}: Date={date}, Amount={amount}, Fee={fee}")
+    
+    # Join the results back onto the input rows by SRN
+    results = pd.DataFrame(records, columns=['SRN', 'Challan URL'] + PAYMENT_COLUMNS)
+    merged = df[['SRN', 'Challan URL']].merge(results, on=['SRN', 'Challan URL'], how='left')
+    merged.index = df.index
+    df.loc[valid, PAYMENT_COLUMNS] = merged.loc[valid, PAYMENT_COLUMNS]
     
     # Save the complete data
     # Remove Challan URL column from final output
-    output_columns = ['SRN', 'Form Name', 'Event Date', 'Date of Filing', 'Amount Paid', 'Late Fee']
-    df_output = df[output_columns]
+    df_output = df[OUTPUT_COLUMNS]
+    
+    df_output.to_excel(output_file, index=False)
+    logger.info(f"Saved complete data to: {output_file}")
     
-    df_output.to_excel(OUTPUT_FILE, index=False)
-    print(f"\nSaved complete data to: {OUTPUT_FILE}")
-    print(f"Total rows: {len(df_output)}")
+    if 'parquet' in OUTPUT_FORMATS:
+        parquet_output = PARQUET_OUTPUT if output_file == OUTPUT_FILE else os.path.splitext(output_file)[0] + ".parquet"
+        write_parquet(df_output, parquet_output)
+        logger.info(f"Saved typed Parquet output to: {parquet_output}")
+    
+    logger.info(f"Total rows: {len(df_output)}")
     
     # Show summary
-    filled_count = len(df_output[df_output['Date of Filing'] != 'N/A'])
-    print(f"Rows with payment details: {filled_count}/{len(df_output)}")
+    filled_count = int((df_output['Date of Filing'] != 'N/A').sum())
+    logger.info(f"Rows with payment details: {filled_count}/{len(df_output)}")
+    
+    return df_output
 
 
 if __name__ == "__main__":
+    import sys
+    if '--profile' in sys.argv:
+        enable_profiling()
     main()
@@ -1,17 +1,25 @@
 """
 MCA Automation Utilities Package
 Shared modules for MCA portal automation scripts
+
+Submodules and the helpers below are imported on first use, so
+`import mca_utils` stays cheap for tools that never open a browser or
+solve a CAPTCHA.
 """
 
+import importlib
+
 from .config import *
-from .captcha_solver import solve_captcha
-from .utils import (
-    get_robust_locator,
-    type_slowly,
-    wait_for_result_panel,
-    get_value_by_id,
-    get_value_by_label
-)
+
+# Public name -> submodule that defines it
+_LAZY_ATTRS = {
+    'solve_captcha': 'captcha_solver',
+    'get_robust_locator': 'utils',
+    'type_slowly': 'utils',
+    'wait_for_result_panel': 'utils',
+    'get_value_by_id': 'utils',
+    'get_value_by_label': 'utils',
+}
 
 __all__ = [
     'solve_captcha',
@@ -21,3 +29,16 @@ __all__ = [
     'get_value_by_id',
     'get_value_by_label'
 ]
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'mca_utils' has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
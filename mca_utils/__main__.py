@@ -0,0 +1,9 @@
+"""
+Entry point for `python -m mca_utils`
+"""
+
+import sys
+from .cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
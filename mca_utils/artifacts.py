@@ -0,0 +1,202 @@
+"""
+Debug Artifact Module for MCA Automation
+Decides which screenshots and HTML dumps to keep (ARTIFACT_CONFIG policy)
+and writes them from a background thread, gzip-compressed, within a disk
+quota that rotates out the oldest files
+"""
+
+import atexit
+import gzip
+import os
+import queue
+import random
+import re
+import shutil
+import threading
+import time
+from .config import ARTIFACT_CONFIG
+from .tracing import current_entity
+from .log import get_logger
+
+logger = get_logger('artifacts')
+
+
+POLICIES = ('off', 'on-failure', 'sampled', 'always')
+
+
+def should_capture(failure=False):
+    """
+    Apply the artifact policy to one capture.
+
+    Args:
+        failure: True for captures taken on an error/failure path
+
+    Returns:
+        True if the artifact should be kept
+    """
+    policy = ARTIFACT_CONFIG['policy']
+    if policy == 'always':
+        return True
+    if policy == 'off':
+        return False
+    if failure:
+        return True
+    return policy == 'sampled' and random.random() < ARTIFACT_CONFIG['sample_rate']
+
+
+class ArtifactWriter:
+    """
+    Background writer for artifact bytes and files, with a size quota.
+    """
+
+    def __init__(self, directory=None, quota_mb=None, compress=None, queue_size=None):
+        self.directory = directory or ARTIFACT_CONFIG['dir']
+        quota_mb = ARTIFACT_CONFIG['quota_mb'] if quota_mb is None else quota_mb
+        self.quota = int(quota_mb * 1024 * 1024)
+        self.compress = ARTIFACT_CONFIG['compress'] if compress is None else compress
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size or ARTIFACT_CONFIG['queue_size'])
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        # Existing artifacts count towards the quota, oldest rotated out first
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(path):
+                entries.append((os.path.getmtime(path), path, os.path.getsize(path)))
+        entries.sort()
+        self._files = [(path, size) for _, path, size in entries]
+        self._used = sum(size for _, size in self._files)
+
+        self._thread = threading.Thread(target=self._run, name='artifact-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, name, data=None, source=None):
+        """
+        Queue an artifact without blocking; dropped if the queue is full.
+
+        Args:
+            name: File name inside the artifact directory
+            data: bytes or str content
+            source: Existing file to move in instead of data
+        """
+        try:
+            self._queue.put_nowait((name, data, source))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if source and os.path.exists(source):
+                os.remove(source)
+            if self.dropped == 1:
+                logger.warning("Artifact writer is behind; dropping debug artifacts.")
+            return False
+
+    def flush(self):
+        """Block until every queued artifact is on disk."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            name, data, source = self._queue.get()
+            try:
+                self._write(name, data, source)
+            except Exception as e:
+                logger.warning(f"Failed to write artifact {name}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, name, data, source):
+        path = os.path.join(self.directory, name)
+        if source:
+            shutil.move(source, path)
+        else:
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            if self.compress and not name.endswith('.png'):
+                path += '.gz'
+                with gzip.open(path, 'wb', compresslevel=6) as f:
+                    f.write(data)
+            else:
+                with open(path, 'wb') as f:
+                    f.write(data)
+
+        self._files = [(p, s) for p, s in self._files if p != path]
+        size = os.path.getsize(path)
+        self._files.append((path, size))
+        self._used = sum(s for _, s in self._files)
+        while self._used > self.quota and len(self._files) > 1:
+            old_path, old_size = self._files.pop(0)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+            self._used -= old_size
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the process-wide ArtifactWriter (started on first use)."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ArtifactWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
+
+def _artifact_name(name, suffix):
+    # Prefix with the current entity so concurrent lookups don't overwrite each other
+    context = current_entity()
+    prefix = re.sub(r'[^\w.-]', '_', str(context[1])) + '_' if context else ''
+    return f"{prefix}{name}_{time.strftime('%Y%m%d-%H%M%S')}{suffix}"
+
+
+def capture(page, name, failure=False, screenshot=True, html=False):
+    """
+    Capture a page's screenshot and/or HTML if the policy allows it.
+
+    Grabbing the bytes from the browser happens here; compression and disk
+    writes happen on the background writer.
+
+    Args:
+        page: Playwright page (or frame, for HTML only)
+        name: Artifact base name, e.g. 'failed_attempt_1'
+        failure: True on error/failure paths
+        screenshot: Capture a full-page PNG
+        html: Capture the page HTML
+
+    Returns:
+        True if anything was queued
+    """
+    if not should_capture(failure):
+        return False
+    writer = get_writer()
+    queued = False
+    try:
+        if screenshot:
+            queued |= writer.submit(_artifact_name(name, '.png'), page.screenshot())
+        if html:
+            queued |= writer.submit(_artifact_name(name, '.html'), page.content())
+    except Exception as e:
+        logger.warning(f"Could not capture {name}: {e}")
+    return queued
+
+
+def keep_file(path, name, failure=False):
+    """
+    Move an already-written file (e.g. a solved CAPTCHA image) into the
+    artifact store if the policy allows it, otherwise delete it.
+
+    Returns:
+        True if the file was kept
+    """
+    if should_capture(failure):
+        # Rename now (cheap) so the caller can reuse its path before the move
+        staged = f"{path}.{threading.get_ident()}.pending"
+        os.replace(path, staged)
+        return get_writer().submit(_artifact_name(name, os.path.splitext(path)[1]), source=staged)
+    if os.path.exists(path):
+        os.remove(path)
+    return False
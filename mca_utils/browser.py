@@ -0,0 +1,306 @@
+"""
+Browser Session Module for MCA Automation
+Hands the flows a fresh browser context per lookup, either from a warm
+browser kept open by a long-running thread (daemon mode) or by launching a
+browser for just this lookup. Which engine and launch/context options are
+used is a named profile in BROWSER_PROFILES, chosen per flow. Warm browsers
+are recycled between lookups once they have served too many contexts/pages
+or grown too large (see BROWSER_RECYCLE_CONFIG).
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from .config import BROWSER_CONFIG, BROWSER_PROFILES, BROWSER_RECYCLE_CONFIG
+from .tracing import span
+from . import metrics
+from .log import get_logger
+
+logger = get_logger('browser')
+
+# Playwright's sync API is bound to the thread that started it, so warm
+# browsers are per thread
+_local = threading.local()
+# Serialises driver start-up so each warm browser can tell which new child
+# process is its own Playwright driver
+_start_lock = threading.Lock()
+
+
+def _process_table():
+    """pid -> (parent pid, RSS bytes) for every process, from /proc."""
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    table = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+            with open(f'/proc/{entry}/statm') as f:
+                rss = int(f.read().split()[1]) * page_size
+            # The command name may contain spaces and parentheses
+            ppid = int(stat[stat.rindex(')') + 2:].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        table[int(entry)] = (ppid, rss)
+    return table
+
+
+def _child_pids(pid):
+    try:
+        import psutil
+        return {child.pid for child in psutil.Process(pid).children()}
+    except ImportError:
+        pass
+    try:
+        return {child for child, (ppid, _) in _process_table().items() if ppid == pid}
+    except OSError:
+        return set()
+
+
+def process_tree_rss(pid):
+    """
+    RSS of a process and all its descendants (psutil if installed, else /proc).
+
+    Args:
+        pid: Root process id
+
+    Returns:
+        Bytes, or None if it cannot be measured on this platform
+    """
+    try:
+        import psutil
+        try:
+            root = psutil.Process(pid)
+            total = 0
+            for process in [root] + root.children(recursive=True):
+                try:
+                    total += process.memory_info().rss
+                except psutil.NoSuchProcess:
+                    pass
+            return total
+        except psutil.NoSuchProcess:
+            return None
+    except ImportError:
+        pass
+    try:
+        table = _process_table()
+    except OSError:
+        return None
+    if pid not in table:
+        return None
+    children = {}
+    for child, (ppid, _) in table.items():
+        children.setdefault(ppid, []).append(child)
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        total += table[current][1]
+        pending.extend(children.get(current, ()))
+    return total
+
+
+def browser_profile(flow=None, name=None):
+    """
+    Resolve a launch profile.
+
+    Args:
+        flow: Flow name, looked up in BROWSER_CONFIG['flow_profiles']
+        name: Explicit BROWSER_PROFILES entry (overrides the flow's)
+
+    Returns:
+        Dict with name, engine, headless, viewport, locale, reduced_motion,
+        args and firefox_prefs
+    """
+    name = name or BROWSER_CONFIG['flow_profiles'].get(flow) or BROWSER_CONFIG['profile']
+    if name not in BROWSER_PROFILES:
+        raise ValueError(f"Unknown browser profile {name!r} (see BROWSER_PROFILES)")
+    profile = BROWSER_PROFILES[name]
+    return {
+        'name': name,
+        'engine': profile.get('engine', 'firefox'),
+        'headless': BROWSER_CONFIG['headless'] or bool(profile.get('headless')),
+        'viewport': profile.get('viewport', BROWSER_CONFIG['viewport']),
+        'locale': profile.get('locale'),
+        'reduced_motion': profile.get('reduced_motion'),
+        'args': list(profile.get('args', [])),
+        'firefox_prefs': dict(profile.get('firefox_prefs', {}))
+    }
+
+
+def _launch_key(profile):
+    # Profiles that only differ in context options can share a browser
+    return (profile['engine'], profile['headless'], tuple(profile['args']),
+            tuple(sorted(profile['firefox_prefs'].items())))
+
+
+def launch(playwright, profile):
+    """Launch the profile's engine from a started Playwright instance."""
+    options = {'headless': profile['headless']}
+    if profile['args']:
+        options['args'] = profile['args']
+    if profile['firefox_prefs'] and profile['engine'] == 'firefox':
+        options['firefox_user_prefs'] = profile['firefox_prefs']
+    return getattr(playwright, profile['engine']).launch(**options)
+
+
+def new_context(browser, profile):
+    """Open a browser context with the profile's viewport, locale and motion settings."""
+    options = {'viewport': profile['viewport']}
+    if profile['locale']:
+        options['locale'] = profile['locale']
+    if profile['reduced_motion']:
+        options['reduced_motion'] = profile['reduced_motion']
+    return browser.new_context(**options)
+
+
+class WarmBrowser:
+    """
+    A browser kept open across lookups by the thread that owns it.
+
+    Args:
+        profile: Resolved launch profile (default the BROWSER_CONFIG profile)
+    """
+
+    def __init__(self, profile=None):
+        self.profile = profile or browser_profile()
+        self._playwright = None
+        self.browser = None
+        self.driver_pid = None
+        self.lookups = 0
+        self.pages = 0
+        self.recycles = 0
+
+    def start(self):
+        from playwright.sync_api import sync_playwright
+
+        logger.info(f"Launching warm {self.profile['engine']} (profile '{self.profile['name']}')...")
+        with _start_lock:
+            before = _child_pids(os.getpid())
+            self._playwright = sync_playwright().start()
+            started = _child_pids(os.getpid()) - before
+        # The browser runs under the driver, so the driver's process tree is its footprint
+        self.driver_pid = started.pop() if len(started) == 1 else None
+        self.browser = launch(self._playwright, self.profile)
+        self.lookups = 0
+        self.pages = 0
+
+    def count_page(self, page=None):
+        self.pages += 1
+
+    def rss_bytes(self):
+        """RSS of the driver, the browser and its content processes, or None if unknown."""
+        return process_tree_rss(self.driver_pid) if self.driver_pid else None
+
+    def recycle_reason(self):
+        """
+        Returns:
+            'lookups', 'pages' or 'rss' if a BROWSER_RECYCLE_CONFIG limit is crossed, else None
+        """
+        limits = BROWSER_RECYCLE_CONFIG
+        if limits['max_lookups'] and self.lookups >= limits['max_lookups']:
+            return 'lookups'
+        if limits['max_pages'] and self.pages >= limits['max_pages']:
+            return 'pages'
+        if limits['max_rss_mb'] and self.lookups % max(1, limits['rss_check_every']) == 0:
+            rss = self.rss_bytes()
+            if rss is not None:
+                metrics.gauge_set('mca_browser_rss_bytes', rss, worker=threading.current_thread().name)
+                if rss > limits['max_rss_mb'] * 1024 * 1024:
+                    return 'rss'
+        return None
+
+    def maybe_recycle(self):
+        """
+        Close the browser if it is due for recycling. Called between lookups,
+        when this thread has no context open, so no work in progress is lost;
+        ensure() relaunches it for the next lookup.
+        """
+        reason = self.recycle_reason()
+        if reason is None:
+            return False
+        logger.info(f"Recycling warm {self.profile['engine']} after {self.lookups} lookup(s), {self.pages} page(s) ({reason}).")
+        metrics.inc('mca_browser_recycles_total', reason=reason)
+        self.recycles += 1
+        self.close()
+        return True
+
+    def ensure(self):
+        """(Re)launch the browser if it is not running."""
+        if self.browser is None or not self.browser.is_connected():
+            self.close()
+            self.start()
+
+    def close(self):
+        for closer in (getattr(self.browser, 'close', None), getattr(self._playwright, 'stop', None)):
+            if closer is None:
+                continue
+            try:
+                closer()
+            except Exception as e:
+                logger.debug("Error closing warm browser: %s", e)
+        self.browser = None
+        self._playwright = None
+        self.driver_pid = None
+
+
+@contextmanager
+def warm_browser(profile=None):
+    """
+    Keep one browser open for every browser_session() in this thread.
+
+    Args:
+        profile: BROWSER_PROFILES entry to launch (default BROWSER_CONFIG['profile'])
+    """
+    warm = WarmBrowser(browser_profile(name=profile))
+    warm.start()
+    _local.warm = warm
+    try:
+        yield warm
+    finally:
+        _local.warm = None
+        warm.close()
+
+
+@contextmanager
+def browser_session(flow=None):
+    """
+    Yield a new browser context for one lookup and close it afterwards.
+
+    Uses the thread's warm browser if there is one launched the way the
+    flow's profile needs, otherwise launches (and afterwards shuts down) a
+    browser for this lookup alone.
+
+    Args:
+        flow: Flow name selecting the profile (see BROWSER_CONFIG['flow_profiles'])
+    """
+    profile = browser_profile(flow)
+    warm = getattr(_local, 'warm', None)
+    if warm is not None and _launch_key(warm.profile) != _launch_key(profile):
+        logger.debug("Profile '%s' cannot use the warm '%s' browser; launching one.", profile['name'], warm.profile['name'])
+        warm = None
+    if warm is not None:
+        with span('launch', warm=True, profile=profile['name']):
+            warm.ensure()
+            context = new_context(warm.browser, profile)
+        context.on('page', warm.count_page)
+        warm.lookups += 1
+        try:
+            yield context
+        finally:
+            try:
+                context.close()
+            except Exception as e:
+                logger.debug("Error closing browser context: %s", e)
+            # The lookup is drained and its context closed, so recycling loses nothing
+            warm.maybe_recycle()
+        return
+
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        logger.info(f"Launching {profile['engine']} (profile '{profile['name']}')...")
+        with span('launch', profile=profile['name']):
+            browser = launch(p, profile)
+            context = new_context(browser, profile)
+        yield context
@@ -0,0 +1,219 @@
+"""
+Lookup Cache Module for MCA Automation
+TTL result cache for repeated DIN/CIN lookups, with an in-memory LRU
+in front of a persistent SQLite store
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from .config import CACHE_CONFIG
+from .log import get_logger
+
+logger = get_logger('cache')
+
+
+class LookupCache:
+    """
+    Cache of flow results keyed by (flow, identifier).
+
+    Entries expire after the TTL configured for their flow. Reads check a
+    size-bounded in-memory LRU first and fall back to the SQLite store, so
+    hits never need a browser session.
+    """
+
+    def __init__(self, path=None, ttls=None, memory_size=None):
+        """
+        Args:
+            path: SQLite file for persistent storage (None for memory only)
+            ttls: Dict of flow name -> TTL in seconds
+            memory_size: Max entries held in the in-memory LRU (0 disables it)
+        """
+        self.path = path if path is not None else CACHE_CONFIG['path']
+        self.ttls = ttls if ttls is not None else CACHE_CONFIG['ttl']
+        self.memory_size = memory_size if memory_size is not None else CACHE_CONFIG['memory_size']
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            # The timeout lets sharded worker processes share one store
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS lookups ("
+                " flow TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, PRIMARY KEY (flow, key))"
+            )
+            self._conn.commit()
+
+    def _ttl(self, flow):
+        return self.ttls.get(flow, CACHE_CONFIG['default_ttl'])
+
+    def _remember(self, flow, key, value, stored_at):
+        if self.memory_size <= 0:
+            return
+        self._memory[(flow, key)] = (value, stored_at)
+        self._memory.move_to_end((flow, key))
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, flow, key):
+        """
+        Return the cached value for (flow, key), or None if missing/expired.
+        """
+        now = time.time()
+        ttl = self._ttl(flow)
+        with self._lock:
+            entry = self._memory.get((flow, key))
+            if entry is not None:
+                value, stored_at = entry
+                if now - stored_at < ttl:
+                    self._memory.move_to_end((flow, key))
+                    return value
+                del self._memory[(flow, key)]
+
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM lookups WHERE flow = ? AND key = ?",
+                (flow, key)
+            ).fetchone()
+            if row is None or now - row[1] >= ttl:
+                return None
+            value = json.loads(row[0])
+            self._remember(flow, key, value, row[1])
+            return value
+
+    def set(self, flow, key, value):
+        """
+        Store a JSON-serialisable value for (flow, key).
+        """
+        stored_at = time.time()
+        with self._lock:
+            self._remember(flow, key, value, stored_at)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO lookups (flow, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                    (flow, key, json.dumps(value), stored_at)
+                )
+                self._conn.commit()
+
+    def invalidate(self, flow, key):
+        """
+        Remove a single entry from both tiers.
+        """
+        with self._lock:
+            self._memory.pop((flow, key), None)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM lookups WHERE flow = ? AND key = ?", (flow, key))
+                self._conn.commit()
+
+    def purge_expired(self):
+        """
+        Delete expired rows from the persistent store.
+
+        Returns:
+            Number of rows deleted
+        """
+        if self._conn is None:
+            return 0
+        now = time.time()
+        deleted = 0
+        with self._lock:
+            flows = [r[0] for r in self._conn.execute("SELECT DISTINCT flow FROM lookups")]
+            for flow in flows:
+                cur = self._conn.execute(
+                    "DELETE FROM lookups WHERE flow = ? AND stored_at <= ?",
+                    (flow, now - self._ttl(flow))
+                )
+                deleted += cur.rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+_default_cache = None
+
+
+def get_cache():
+    """
+    Return the process-wide cache built from CACHE_CONFIG.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LookupCache()
+    return _default_cache
+
+
+def cached_lookup(flow, key, fetch, force_refresh=False):
+    """
+    Return a cached result for (flow, key), calling fetch() on a miss.
+
+    Args:
+        flow: Flow name, e.g. 'din_status' or 'annual_filing'
+        key: Identifier (DIN or CIN)
+        fetch: Zero-argument callable performing the real lookup
+        force_refresh: Skip the cache read and always call fetch()
+
+    Returns:
+        The cached or freshly fetched value. None results are not cached.
+    """
+    if not CACHE_CONFIG['enabled']:
+        return fetch()
+
+    cache = get_cache()
+    if not force_refresh:
+        value = cache.get(flow, key)
+        if value is not None:
+            logger.info(f"Cache hit for {flow}:{key}")
+            return value
+
+    value = fetch()
+    if value is not None:
+        cache.set(flow, key, value)
+    return value
+
+
+def cached_lookups(flow, keys, fetch_many, force_refresh=False):
+    """
+    cached_lookup() for several keys, fetching all the misses in one call.
+
+    Args:
+        flow: Flow name, e.g. 'din_status'
+        keys: Identifiers
+        fetch_many: Callable taking the list of missed keys and returning a
+            dict of key -> value (None for failures)
+        force_refresh: Skip the cache read and fetch every key
+
+    Returns:
+        Dict of key -> cached or freshly fetched value (None results are not cached)
+    """
+    if not CACHE_CONFIG['enabled']:
+        return fetch_many(list(keys))
+
+    cache = get_cache()
+    results = {}
+    missing = []
+    for key in keys:
+        value = None if force_refresh else cache.get(flow, key)
+        if value is not None:
+            logger.info(f"Cache hit for {flow}:{key}")
+            results[key] = value
+        elif key not in missing:
+            missing.append(key)
+
+    if missing:
+        for key, value in fetch_many(missing).items():
+            results[key] = value
+            if value is not None:
+                cache.set(flow, key, value)
+    return results
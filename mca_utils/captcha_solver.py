@@ -3,13 +3,30 @@ CAPTCHA Solver Module for MCA Automation
 Handles 2Captcha integration with retry logic
 """
 
-import time
-import os
-from PIL import Image
-from twocaptcha import TwoCaptcha
-from .config import CAPTCHA_CONFIG, CAPTCHA_PARAMS, MAX_CAPTCHA_RETRIES, SCREENSHOTS_DIR
+from .config import CAPTCHA_CONFIG, CAPTCHA_PARAMS, SCREENSHOTS_DIR
 from .utils import get_robust_locator
+from .scheduler import get_scheduler
+from .retry import SOLVER_ERROR, get_breaker, get_retry_policy
+from .tracing import span
+from . import metrics
+from .artifacts import capture, keep_file
+from .log import get_logger
 
+logger = get_logger('captcha_solver')
+
+_solver = None
+
+
+def get_solver():
+    """
+    Return the process-wide 2Captcha client, created on first use and
+    shared by every CAPTCHA instead of being rebuilt per attempt.
+    """
+    global _solver
+    if _solver is None:
+        from twocaptcha import TwoCaptcha
+        _solver = TwoCaptcha(**CAPTCHA_CONFIG)
+    return _solver
 
 
 def solve_captcha(frame, canvas_selector='#new-captcha-canvas, canvas', filename_prefix='captcha', custom_params=None):
@@ -18,34 +35,48 @@ def solve_captcha(frame, canvas_selector='#new-captcha-canvas, canvas', filename
     
     Args:
         frame: Playwright frame object containing the CAPTCHA
-        canvas_selector: CSS selector for the CAPTCHA canvas element
+        canvas_selector: CSS selector for the CAPTCHA canvas element, or an already resolved Locator
         filename_prefix: Prefix for screenshot filenames
         custom_params: Optional dict to override default CAPTCHA_PARAMS
         
     Returns:
         Solved CAPTCHA text or empty string if failed
     """
-    print(" Keying in on CAPTCHA image for 2Captcha...")
+    # Imported on first use: PIL and twocaptcha (with its HTTP stack) are
+    # only needed once a CAPTCHA actually has to be solved
+    from PIL import Image
+
+    logger.info("Keying in on CAPTCHA image for 2Captcha...")
+    metrics.gauge_add('mca_captcha_in_flight', 1)
     try:
         # Locate the CAPTCHA canvas
-        captcha_element = get_robust_locator(frame, canvas_selector)
+        if isinstance(canvas_selector, str):
+            captcha_element = get_robust_locator(frame, canvas_selector)
+        else:
+            captcha_element = canvas_selector
         
         if not captcha_element:
-            print(" Could not find CAPTCHA element.")
-            frame.screenshot(path=f"{SCREENSHOTS_DIR}/debug_no_captcha_found.png")
+            logger.warning("Could not find CAPTCHA element.")
+            capture(frame, "debug_no_captcha_found", failure=True)
             return ""
 
         # Define file paths
         raw_filename = f"{SCREENSHOTS_DIR}/{filename_prefix}_original.png"
         
         # Screenshot the CAPTCHA
-        captcha_element.screenshot(path=raw_filename)
-        print(f" Saved raw CAPTCHA to {raw_filename}")
+        with span('captcha_screenshot'):
+            captcha_element.screenshot(path=raw_filename)
+        logger.info(f"Saved raw CAPTCHA to {raw_filename}")
         
         # Retry loop for 2Captcha API
-        for attempt in range(MAX_CAPTCHA_RETRIES):
+        policy = get_retry_policy()
+        breaker = get_breaker('captcha_service')
+        max_attempts = policy.max_attempts(SOLVER_ERROR)
+        for attempt in range(max_attempts):
+            # Pauses here while 2Captcha is failing for every worker
+            breaker.wait()
             try:
-                print(f" Attempt {attempt+1}/{MAX_CAPTCHA_RETRIES}: Sending CAPTCHA to 2Captcha...")
+                logger.info(f"Attempt {attempt+1}/{max_attempts}: Sending CAPTCHA to 2Captcha...")
                 
                 # Convert to JPG to avoid PNG alpha issues
                 jpg_filename = raw_filename.replace(".png", ".jpg")
@@ -54,8 +85,7 @@ def solve_captcha(frame, canvas_selector='#new-captcha-canvas, canvas', filename
                     img = img.convert('RGB')
                 img.save(jpg_filename, "JPEG", quality=90)
 
-                # Initialize solver with config
-                solver = TwoCaptcha(**CAPTCHA_CONFIG)
+                solver = get_solver()
 
                 # Determine params to use
                 solve_params = CAPTCHA_PARAMS.copy()
@@ -63,31 +93,43 @@ def solve_captcha(frame, canvas_selector='#new-captcha-canvas, canvas', filename
                     solve_params.update(custom_params)
 
                 # Attempt to solve with strict parameters
-                print(f" DEBUG: calling solver with params: {solve_params}")
-                result = solver.normal(jpg_filename, **solve_params)
-                print(f" DEBUG: Raw 2Captcha Response: {result}")
+                logger.debug("calling solver with params: %s", solve_params)
+                get_scheduler().acquire('captcha_submit')
+                with span('captcha_solve', attempt=attempt), metrics.timer('mca_captcha_solve_seconds'):
+                    result = solver.normal(jpg_filename, **solve_params)
+                logger.debug("Raw 2Captcha Response: %s", result)
                 
                 if 'code' in result:
+                    metrics.inc('mca_captcha_solves_total', outcome='solved')
+                    get_scheduler().report('captcha_submit', True)
+                    breaker.record_success()
                     solved_text = result['code']
-                    print(f" CAPTCHA Solved: {solved_text}")
+                    logger.info(f"CAPTCHA Solved: {solved_text}")
                     
-                    # Save solved CAPTCHA for debugging
-                    final_log_path = f"{SCREENSHOTS_DIR}/solved_{filename_prefix}_{solved_text}.png"
-                    if os.path.exists(final_log_path):
-                        os.remove(final_log_path)
-                    os.rename(raw_filename, final_log_path)
-                    print(f" Saved debug image to: {final_log_path}")
+                    # Keep the solved CAPTCHA for debugging if the artifact policy allows
+                    keep_file(raw_filename, f"solved_{filename_prefix}_{solved_text}")
                     return solved_text
                 else:
-                    print(f" No code received: {result}")
+                    metrics.inc('mca_captcha_solves_total', outcome='no_code')
+                    get_scheduler().report('captcha_submit', False)
+                    breaker.record_failure()
+                    logger.info(f"No code received: {result}")
             
             except Exception as loop_e:
-                print(f" Attempt {attempt+1} failed: {loop_e}")
-                time.sleep(5)  # Wait before retry
+                metrics.inc('mca_captcha_solves_total', outcome='error')
+                get_scheduler().report('captcha_submit', False)
+                breaker.record_failure()
+                logger.warning(f"Attempt {attempt+1} failed: {loop_e}")
+            
+            # Back off (with jitter) before retrying
+            if policy.should_retry(SOLVER_ERROR, attempt):
+                policy.sleep(SOLVER_ERROR, attempt)
         
-        print(" All retry attempts failed.")
+        logger.warning("All retry attempts failed.")
         raise Exception("Failed to solve CAPTCHA after retries")
 
     except Exception as e:
-        print(f" 2Captcha Helper Error: {e}")
+        logger.error(f"2Captcha Helper Error: {e}")
         return ""
+    finally:
+        metrics.gauge_add('mca_captcha_in_flight', -1)
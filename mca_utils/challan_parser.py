@@ -0,0 +1,104 @@
+"""
+Challan Parser Module for MCA Automation
+Extracts payment details (filing date, amount paid, late fee) from
+downloaded Challan PDFs
+"""
+
+from . import metrics
+
+
+def _is_amount(part):
+    # Allows one decimal point and thousands separators, e.g. "1,200.00"
+    return part.replace('.', '', 1).replace(',', '').isdigit()
+
+
+def _last_amount(line):
+    for part in reversed(line.split()):
+        if _is_amount(part):
+            return part
+    return None
+
+
+def extract_pdf_text(pdf_path):
+    """
+    Extract the text of every page of a PDF.
+
+    Args:
+        pdf_path: Path to the PDF file
+
+    Returns:
+        Concatenated page text
+    """
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        text = ""
+        for page in pdf.pages:
+            text += page.extract_text() or ""
+    return text
+
+
+def parse_challan_text(text):
+    """
+    Parse payment details out of Challan text.
+
+    Args:
+        text: Text extracted from a Challan PDF
+
+    Returns:
+        Dict with 'Date of Filing', 'Amount Paid' and 'Late Fee'
+        ("N/A" where not found; late fee defaults to "0.00")
+    """
+    details = {
+        'Date of Filing': "N/A",
+        'Amount Paid': "N/A",
+        'Late Fee': "N/A"
+    }
+
+    for line in text.split('\n'):
+        # Find Service Request Date
+        if 'Service Request Date' in line and ':' in line:
+            parts = line.split(':', 1)
+            if len(parts) == 2:
+                details['Date of Filing'] = parts[1].strip()
+
+        # Find Total amount
+        if 'Total' in line:
+            amount = _last_amount(line)
+            if amount:
+                details['Amount Paid'] = amount
+
+        # Find Additional (Late Fee)
+        if 'Additional' in line:
+            amount = _last_amount(line)
+            if amount:
+                details['Late Fee'] = amount
+
+    # If no Additional fee found, set to 0.00
+    if details['Late Fee'] == "N/A":
+        details['Late Fee'] = "0.00"
+
+    return details
+
+
+def parse_challan_pdf(pdf_path):
+    """
+    Extract payment details from a Challan PDF on disk.
+
+    Args:
+        pdf_path: Path to the PDF file
+
+    Returns:
+        Dict with 'Date of Filing', 'Amount Paid' and 'Late Fee'
+
+    Raises:
+        Exception: If the PDF cannot be opened or read
+    """
+    try:
+        with metrics.timer('mca_challan_parse_seconds'):
+            details = parse_challan_text(extract_pdf_text(pdf_path))
+    except Exception:
+        metrics.inc('mca_challan_parsed_total', outcome='error')
+        raise
+    metrics.inc('mca_challan_parsed_total', outcome='ok' if details['Amount Paid'] != "N/A" else 'incomplete')
+    return details
@@ -0,0 +1,495 @@
+"""
+Batch Command Line Interface for MCA Automation
+Runs the DIN status, annual filing and challan extraction flows over many
+identifiers:
+
+    python -m mca_utils din ids.csv --workers 4 --output din.xlsx
+    python -m mca_utils annual-filing cins.xlsx --rate 0.2 --headless
+    cat cins.txt | python -m mca_utils annual-filing - --output filings.parquet
+    python -m mca_utils challan annual_filing_with_urls.xlsx --workers 8
+
+Distributed sweeps go through a job queue (see QUEUE_CONFIG):
+
+    python -m mca_utils enqueue annual-filing cins.xlsx --queue redis://host:6379/0
+    python -m mca_utils worker --queue redis://host:6379/0 --workers 2 --headless
+    python -m mca_utils collect annual-filing --queue redis://host:6379/0 --output filings.xlsx
+
+Other services can use a long-running daemon instead (see mca_utils.daemon):
+
+    python -m mca_utils serve --workers 2 --headless
+
+A director audit checks the annual filings of every company each DIN is
+associated with (see mca_utils.pipeline):
+
+    python -m mca_utils audit dins.csv --workers 3 --headless --output audit.jsonl
+
+Saved pages can be re-extracted without a browser (see mca_utils.extract):
+
+    python -m mca_utils extract annual_history debug_annual_page.html
+
+Run from the repository root so the flow scripts are importable.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .config import AUDIT_CONFIG, BROWSER_CONFIG, BROWSER_PROFILES, DIN_FLOW_CONFIG, EXTRACTION_SPECS
+from .scheduler import get_scheduler
+from .log import get_logger, setup_logging
+
+logger = get_logger('cli')
+
+
+# Column names tried (in order) when reading identifiers from a file
+ID_COLUMNS = {
+    'din': ['DIN', 'din', 'DIN/DPIN'],
+    'annual-filing': ['CIN', 'cin']
+}
+
+
+def read_identifiers(sources, command):
+    """
+    Collect identifiers from command-line values, files and stdin.
+
+    Each source may be '-' (one identifier per stdin line), a .csv/.xlsx
+    file (the DIN/CIN column, or the first column), a .txt file (one per
+    line) or a literal identifier.
+
+    Args:
+        sources: List of source strings from the command line
+        command: Subcommand name, used to pick the identifier column
+
+    Returns:
+        List of unique identifiers in input order
+    """
+    ids = []
+    for source in sources:
+        if source == '-':
+            ids.extend(line.strip() for line in sys.stdin)
+        elif source.lower().endswith('.csv') and os.path.exists(source):
+            with open(source, newline='', encoding='utf-8-sig') as f:
+                rows = list(csv.reader(f))
+            if rows:
+                header = rows[0]
+                col = next((header.index(c) for c in ID_COLUMNS[command] if c in header), None)
+                if col is None:
+                    col = 0
+                else:
+                    rows = rows[1:]
+                ids.extend(row[col].strip() for row in rows if len(row) > col)
+        elif source.lower().endswith(('.xlsx', '.xls')) and os.path.exists(source):
+            import pandas as pd
+            df = pd.read_excel(source, dtype=str)
+            col = next((c for c in ID_COLUMNS[command] if c in df.columns), df.columns[0])
+            ids.extend(df[col].dropna().str.strip())
+        elif source.lower().endswith('.txt') and os.path.exists(source):
+            with open(source, encoding='utf-8') as f:
+                ids.extend(line.strip() for line in f)
+        else:
+            ids.append(source.strip())
+
+    # Drop blanks and duplicates, keep order
+    return list(dict.fromkeys(i for i in ids if i))
+
+
+def write_results(rows, path):
+    """
+    Write flat result rows (dicts or FilingRecords) to .xlsx, .csv, .parquet or .jsonl based on extension.
+    """
+    from .records import FilingRecord, records_frame
+
+    records = bool(rows) and isinstance(rows[0], FilingRecord)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.jsonl':
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row.to_dict() if records else row) + '\n')
+        return path
+
+    import pandas as pd
+    df = records_frame(rows) if records else pd.DataFrame(rows)
+    if ext == '.csv':
+        df.to_csv(path, index=False)
+    elif ext == '.parquet':
+        from .export import write_parquet
+        write_parquet(df, path, partition_by='')
+    else:
+        df.to_excel(path, index=False)
+    return path
+
+
+def lookup_rows(command, identifier, force_refresh=False, journal=None):
+    """Run one cached lookup and return a list of flat result rows."""
+    from .cache import cached_lookup
+
+    if command == 'din':
+        from verify_din import lookup_din
+        row = cached_lookup('din_status', identifier, lambda: lookup_din(identifier, journal), force_refresh=force_refresh)
+        return [row] if row else None
+
+    if command == 'director-companies':
+        from director_companies import lookup_director_companies
+        return cached_lookup('director_companies', identifier, lambda: lookup_director_companies(identifier),
+                             force_refresh=force_refresh)
+
+    from check_annual_filing import lookup_annual_filing
+    history = cached_lookup('annual_filing', identifier, lambda: lookup_annual_filing(identifier, journal), force_refresh=force_refresh)
+    if history is None:
+        return None
+    return [dict({'CIN': identifier}, **item) for item in history]
+
+
+def lookup_din_rows(dins, force_refresh=False, journal=None):
+    """Run cached DIN lookups on one page; returns a dict of DIN -> list of rows (None if failed)."""
+    from .cache import cached_lookups
+    from verify_din import lookup_dins
+
+    found = cached_lookups('din_status', dins, lambda missing: lookup_dins(missing, journal), force_refresh=force_refresh)
+    return {din: [found[din]] if found.get(din) else None for din in dins}
+
+
+def run_batch(command, identifiers, workers=1, rate=None, force_refresh=False, on_result=None, journal=None,
+              dins_per_page=None):
+    """
+    Look up many identifiers concurrently.
+
+    Args:
+        command: 'din' or 'annual-filing'
+        identifiers: List of DINs or CINs
+        workers: Number of concurrent browser sessions
+        rate: Max portal page loads per second (None keeps RATE_LIMITS)
+        force_refresh: Bypass the lookup cache
+        on_result: Optional callback(identifier, rows, error, elapsed) per item
+        journal: Optional JobJournal; finished identifiers are not looked up again
+        dins_per_page: DINs looked up on one loaded page (default DIN_FLOW_CONFIG)
+
+    Returns:
+        Tuple of (result rows, list of failed identifiers); filing rows are
+        FilingRecords, so large batches stay compact until written
+    """
+    from .records import compact_rows
+
+    if rate:
+        get_scheduler().configure('page_load', rate)
+    results = []
+    failed = []
+
+    def task(identifier):
+        start = time.time()
+        try:
+            return [(identifier, lookup_rows(command, identifier, force_refresh, journal), None, time.time() - start)]
+        except Exception as e:
+            return [(identifier, None, e, time.time() - start)]
+
+    def din_task(dins):
+        # One loaded page for the whole chunk (see verify_din.DinStatusFlow)
+        start = time.time()
+        try:
+            found, error = lookup_din_rows(dins, force_refresh, journal), None
+        except Exception as e:
+            found, error = {}, e
+        elapsed = (time.time() - start) / len(dins)
+        return [(din, found.get(din), error, elapsed) for din in dins]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        per_page = dins_per_page or DIN_FLOW_CONFIG['dins_per_page']
+        if command == 'din' and per_page > 1:
+            # Small enough chunks that every worker gets one
+            size = max(1, min(per_page, -(-len(identifiers) // max(1, workers))))
+            futures = [pool.submit(din_task, identifiers[i:i + size]) for i in range(0, len(identifiers), size)]
+        else:
+            futures = [pool.submit(task, identifier) for identifier in identifiers]
+        done = 0
+        for future in as_completed(futures):
+            for identifier, rows, error, elapsed in future.result():
+                done += 1
+                if rows:
+                    results.extend(compact_rows(rows))
+                    status = f"OK    {len(rows)} row(s)"
+                else:
+                    failed.append(identifier)
+                    status = f"FAIL  {error}" if error else "FAIL  no result"
+                logger.info(f"[{done}/{len(identifiers)}] {identifier}: {status} ({elapsed:.1f}s)")
+                if on_result:
+                    on_result(identifier, rows, error, elapsed)
+
+    return results, failed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m mca_utils', description='Batch MCA portal lookups')
+    parser.add_argument('--log-level', default=None, help='DEBUG, INFO, WARNING... (default LOGGING_CONFIG)')
+    parser.add_argument('--log-json', action='store_true', help='Log one JSON object per line')
+    parser.add_argument('--log-file', default=None, help='Also write the log to this file')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('din', 'DIN status lookups'), ('annual-filing', 'Annual filing history lookups')):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('inputs', nargs='+', help="Identifiers, .csv/.xlsx/.txt files, or '-' for stdin")
+        p.add_argument('--workers', type=int, default=1, help='Concurrent browser sessions (per process)')
+        p.add_argument('--processes', type=int, default=1, help='Worker processes to shard identifiers across')
+        p.add_argument('--rate', type=float, default=None, help='Max portal page loads per second')
+        p.add_argument('--headless', action='store_true', help='Run browsers without a window')
+        p.add_argument('--browser-profile', choices=sorted(BROWSER_PROFILES), default=None,
+                       help='BROWSER_PROFILES entry for every flow (default BROWSER_CONFIG)')
+        p.add_argument('--refresh', action='store_true', help='Bypass the lookup cache')
+        p.add_argument('--output', default=None, help='Results file (.xlsx, .csv, .parquet, .jsonl)')
+        p.add_argument('--journal', default=None, help='Job journal file; rerun with the same file to resume')
+        p.add_argument('--metrics-port', type=int, default=None,
+                       help='Serve Prometheus metrics on this port (shards use the following ports)')
+        p.add_argument('--profile', action='store_true', help='Profile lookups into profiles/ (see PROFILE_CONFIG)')
+        p.add_argument('--profile-every', type=int, default=None, help='With --profile, only every Nth lookup')
+        if name == 'din':
+            p.add_argument('--dins-per-page', type=int, default=None,
+                           help='DINs looked up on one loaded page before a fresh one (default DIN_FLOW_CONFIG)')
+
+    p = sub.add_parser('audit', help="Annual filings of every company each DIN's director is associated with")
+    p.add_argument('inputs', nargs='+', help="DINs, .csv/.xlsx/.txt files, or '-' for stdin")
+    p.add_argument('--workers', type=int, default=None,
+                   help=f"Concurrent annual filing lookups (default {AUDIT_CONFIG['check_workers']})")
+    p.add_argument('--resolve-workers', type=int, default=None,
+                   help=f"Concurrent director lookups (default {AUDIT_CONFIG['resolve_workers']})")
+    p.add_argument('--rate', type=float, default=None, help='Max portal page loads per second')
+    p.add_argument('--headless', action='store_true', help='Run browsers without a window')
+    p.add_argument('--browser-profile', choices=sorted(BROWSER_PROFILES), default=None,
+                   help='BROWSER_PROFILES entry for every flow (default BROWSER_CONFIG)')
+    p.add_argument('--refresh', action='store_true', help='Bypass the lookup cache')
+    p.add_argument('--output', default=None,
+                   help='Results file (.xlsx, .csv, .parquet, or .jsonl for one report per DIN as each completes)')
+    p.add_argument('--metrics-port', type=int, default=None, help='Serve Prometheus metrics on this port')
+
+    p = sub.add_parser('enqueue', help='Add lookups to a job queue')
+    p.add_argument('flow', choices=['din', 'annual-filing'])
+    p.add_argument('inputs', nargs='+', help="Identifiers, .csv/.xlsx/.txt files, or '-' for stdin")
+    p.add_argument('--queue', default=None, help='Queue URL (default QUEUE_CONFIG)')
+
+    p = sub.add_parser('worker', help='Process lookups from a job queue')
+    p.add_argument('--queue', default=None, help='Queue URL (default QUEUE_CONFIG)')
+    p.add_argument('--workers', type=int, default=1, help='Concurrent browser sessions')
+    p.add_argument('--headless', action='store_true', help='Run browsers without a window')
+    p.add_argument('--browser-profile', choices=sorted(BROWSER_PROFILES), default=None,
+                   help='BROWSER_PROFILES entry for every flow (default BROWSER_CONFIG)')
+    p.add_argument('--refresh', action='store_true', help='Bypass the lookup cache')
+    p.add_argument('--exit-when-empty', action='store_true', help='Stop when no jobs are left')
+    p.add_argument('--metrics-port', type=int, default=None, help='Serve Prometheus metrics on this port')
+
+    p = sub.add_parser('collect', help='Write finished results from a job queue')
+    p.add_argument('flow', choices=['din', 'annual-filing'])
+    p.add_argument('--queue', default=None, help='Queue URL (default QUEUE_CONFIG)')
+    p.add_argument('--output', default=None, help='Results file (.xlsx, .csv, .parquet, .jsonl)')
+
+    p = sub.add_parser('serve', help='Run the lookup daemon (HTTP/JSON API with warm browsers)')
+    p.add_argument('--host', default=None, help='Bind address (default DAEMON_CONFIG)')
+    p.add_argument('--port', type=int, default=None, help='Port (default DAEMON_CONFIG)')
+    p.add_argument('--workers', type=int, default=None, help='Warm browser workers')
+    p.add_argument('--headless', action='store_true', help='Run browsers without a window')
+    p.add_argument('--browser-profile', choices=sorted(BROWSER_PROFILES), default=None,
+                   help='BROWSER_PROFILES entry for every flow (default BROWSER_CONFIG)')
+    p.add_argument('--metrics-port', type=int, default=None, help='Serve Prometheus metrics on this port')
+
+    p = sub.add_parser('trace-summary', help='Per-stage p50/p95 timings from a span file')
+    p.add_argument('path', nargs='?', default=None, help='Span file (default TRACING_CONFIG path)')
+
+    p = sub.add_parser('selector-stats', help='Which selector alternatives matched, and how fast')
+
+    p = sub.add_parser('extract', help='Run an extraction spec over saved HTML pages (offline)')
+    p.add_argument('spec', choices=sorted(EXTRACTION_SPECS), help='EXTRACTION_SPECS entry')
+    p.add_argument('paths', nargs='+', help='Saved pages (.html or .html.gz)')
+    p.add_argument('--repeat', type=int, default=1, help='Parse each page N times and report the mean time')
+
+    p = sub.add_parser('challan', help='Download and parse challan PDFs')
+    p.add_argument('input', help='Excel file with SRN and Challan URL columns')
+    p.add_argument('--workers', type=int, default=4, help='Concurrent downloads')
+    p.add_argument('--output', default=None, help='Excel file to write')
+    p.add_argument('--profile', action='store_true', help='Profile challan parsing into profiles/')
+    p.add_argument('--profile-every', type=int, default=None, help='With --profile, only every Nth challan')
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging(args.log_level, args.log_json or None, args.log_file)
+    if getattr(args, 'profile', False):
+        from .profiling import enable_profiling
+        enable_profiling(args.profile_every)
+    if getattr(args, 'browser_profile', None):
+        BROWSER_CONFIG['profile'] = args.browser_profile
+        BROWSER_CONFIG['flow_profiles'] = {}
+
+    if args.command == 'challan':
+        from extract_challan_details import main as extract_main
+        result = extract_main(args.input, args.output, workers=args.workers)
+        return 0 if result is not None else 1
+
+    if args.command == 'trace-summary':
+        from .tracing import print_summary
+        print_summary(args.path)
+        return 0
+
+    if args.command == 'selector-stats':
+        from .locators import print_stats
+        print_stats()
+        return 0
+
+    if args.command == 'extract':
+        return _extract_command(args)
+
+    if getattr(args, 'metrics_port', None):
+        from .metrics import start_server
+        start_server(args.metrics_port)
+
+    if args.command in ('enqueue', 'worker', 'collect'):
+        return _queue_command(args)
+
+    if args.command == 'audit':
+        return _audit_command(args)
+
+    if args.command == 'serve':
+        from .daemon import serve
+        if args.headless:
+            BROWSER_CONFIG['headless'] = True
+        serve(args.host, args.port, args.workers)
+        return 0
+
+    if args.headless:
+        BROWSER_CONFIG['headless'] = True
+
+    identifiers = read_identifiers(args.inputs, args.command)
+    logger.info(f"Running {args.command} for {len(identifiers)} identifier(s) with {args.workers} worker(s)")
+
+    if args.processes > 1:
+        from .runner import run_sharded
+        results, failed = run_sharded(
+            args.command, identifiers,
+            processes=args.processes, workers=args.workers, rate=args.rate,
+            headless=args.headless, force_refresh=args.refresh, journal_path=args.journal,
+            metrics_port=args.metrics_port, log_options=(args.log_level, args.log_json or None, args.log_file),
+            profile_every=(args.profile_every or 1) if args.profile else None,
+            dins_per_page=getattr(args, 'dins_per_page', None), browser_profile=args.browser_profile
+        )
+        return _finish(args, identifiers, results, failed)
+
+    journal = None
+    if args.journal:
+        from .journal import JobJournal
+        journal = JobJournal(args.journal)
+        finished = len(identifiers) - len(journal.pending(identifiers))
+        if finished:
+            logger.info(f"Resuming: {finished} identifier(s) already finished in {args.journal}")
+
+    results, failed = run_batch(
+        args.command, identifiers,
+        workers=args.workers, rate=args.rate, force_refresh=args.refresh, journal=journal,
+        dins_per_page=getattr(args, 'dins_per_page', None)
+    )
+    if journal:
+        journal.close()
+
+    return _finish(args, identifiers, results, failed)
+
+
+def _extract_command(args):
+    from .extract import extract, get_parser, read_snapshot
+
+    for path in args.paths:
+        html = read_snapshot(path)
+        start = time.perf_counter()
+        for _ in range(max(1, args.repeat)):
+            result = extract(html, args.spec)
+        elapsed = (time.perf_counter() - start) / max(1, args.repeat)
+        if 'rows' in EXTRACTION_SPECS[args.spec]:
+            result = [dict(record, row=index) for index, record in result]
+        print(json.dumps({'path': path, 'parser': get_parser().name, 'ms': round(elapsed * 1000, 2), 'result': result},
+                         ensure_ascii=False))
+    return 0
+
+
+def _audit_command(args):
+    from .pipeline import run_audit
+
+    if args.headless:
+        BROWSER_CONFIG['headless'] = True
+    dins = read_identifiers(args.inputs, 'din')
+    output = args.output or 'director_audit_results.xlsx'
+    logger.info(f"Auditing {len(dins)} DIN(s)")
+
+    stream = None
+    if output.lower().endswith('.jsonl'):
+        # Grouped by DIN, written as each one completes
+        stream = open(output, 'w', encoding='utf-8')
+
+    def on_report(report):
+        stream.write(json.dumps(report, ensure_ascii=False) + '\n')
+        stream.flush()
+
+    try:
+        results, failed = run_audit(
+            dins, force_refresh=args.refresh, resolve_workers=args.resolve_workers,
+            check_workers=args.workers, rate=args.rate, on_report=on_report if stream else None
+        )
+    finally:
+        if stream:
+            stream.close()
+    if stream:
+        logger.info(f"Saved {len(dins)} report(s) to {output}")
+    elif results:
+        write_results(results, output)
+        logger.info(f"Saved {len(results)} row(s) to {output}")
+    logger.info(f"Done: {len(dins) - len(failed)} DIN(s) fully checked, {len(failed)} with failures")
+    if failed:
+        logger.warning(f"Failed: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+def _queue_command(args):
+    """Handle the enqueue/worker/collect subcommands."""
+    from .job_queue import open_queue
+    job_queue = open_queue(args.queue)
+
+    if args.command == 'enqueue':
+        identifiers = read_identifiers(args.inputs, args.flow)
+        for identifier in identifiers:
+            job_queue.put(args.flow, identifier)
+        logger.info(f"Enqueued {len(identifiers)} {args.flow} job(s). Queue: {job_queue.stats()}")
+        return 0
+
+    if args.command == 'worker':
+        from .worker import run_worker
+        if args.headless:
+            BROWSER_CONFIG['headless'] = True
+        done, failed = run_worker(
+            job_queue, workers=args.workers,
+            force_refresh=args.refresh, exit_when_empty=args.exit_when_empty
+        )
+        logger.info(f"Worker finished: {done} done, {failed} failed. Queue: {job_queue.stats()}")
+        return 0
+
+    from .records import compact_rows
+
+    results = []
+    failed = []
+    finished = job_queue.results(args.flow)
+    for _, identifier, status, rows, error in finished:
+        if status == 'done' and rows:
+            results.extend(compact_rows(rows))
+        else:
+            failed.append(identifier)
+    args.command = args.flow
+    return _finish(args, [identifier for _, identifier, _, _, _ in finished], results, failed)
+
+
+def _finish(args, identifiers, results, failed):
+    """Write batch results and print the summary; returns the exit code."""
+    output = args.output or ('din_batch_results.xlsx' if args.command == 'din' else 'annual_filing_batch_results.xlsx')
+    if results:
+        write_results(results, output)
+        logger.info(f"Saved {len(results)} row(s) to {output}")
+    logger.info(f"Done: {len(identifiers) - len(failed)} succeeded, {len(failed)} failed")
+    if failed:
+        logger.warning(f"Failed: {', '.join(failed)}")
+    return 1 if failed else 0
@@ -25,6 +25,42 @@ CAPTCHA_PARAMS = {
 MAX_CAPTCHA_RETRIES = 5
 MAX_VERIFICATION_ATTEMPTS = 3
 
+# Rate Limits (tokens per second, shared by all workers in a process)
+# 'rate': None disables limiting for that kind of call
+RATE_LIMITS = {
+    'page_load': {'rate': 0.5, 'burst': 2},
+    'form_submit': {'rate': 1.0, 'burst': 2},
+    'challan_download': {'rate': 2.0, 'burst': 4},
+    'captcha_submit': {'rate': 0.5, 'burst': 3}
+}
+
+# Adaptive rate control: back off when errors/refreshes spike
+ADAPTIVE_RATE_CONFIG = {
+    'window': 20,              # Recent outcomes considered
+    'min_samples': 5,          # Outcomes needed before adapting
+    'error_threshold': 0.3,    # Error ratio that triggers a slowdown
+    'decrease_factor': 0.5,    # Multiply rate by this on a spike
+    'min_rate_fraction': 0.1,  # Never go below this fraction of the configured rate
+    'recovery_step': 0.05      # Fraction of configured rate regained per success
+}
+
+# Retry Policy per failure class (exponential backoff with full jitter, seconds)
+RETRY_POLICY = {
+    'solver_error': {'max_attempts': MAX_CAPTCHA_RETRIES, 'base_delay': 2, 'max_delay': 30},
+    'wrong_captcha': {'max_attempts': MAX_VERIFICATION_ATTEMPTS, 'base_delay': 1, 'max_delay': 5},
+    'portal_timeout': {'max_attempts': 3, 'base_delay': 5, 'max_delay': 60},
+    'missing_element': {'max_attempts': 2, 'base_delay': 2, 'max_delay': 10},
+    'default': {'max_attempts': 2, 'base_delay': 2, 'max_delay': 10}
+}
+
+# Circuit Breakers ('portal', 'captcha_service'): pause all workers on broad failure
+CIRCUIT_BREAKER_CONFIG = {
+    'window': 20,              # Recent calls considered
+    'min_calls': 5,            # Calls needed before the breaker can trip
+    'failure_threshold': 0.5,  # Failure ratio that opens the breaker
+    'cooldown': 60             # Seconds to stay open before probing again
+}
+
 # Screenshot Directory
 SCREENSHOTS_DIR = "screenshots"
 
@@ -32,13 +68,251 @@ SCREENSHOTS_DIR = "screenshots"
 MCA_URLS = {
     'enquire_din_status': 'https://www.mca.gov.in/content/mca/global/en/mca/fo-llp-services/enquire-din-status.html',
     'check_annual_filing': 'https://www.mca.gov.in/content/mca/global/en/mca/fo-llp-services/check-annual-filing-status.html',
-    'verify_din': 'https://www.mca.gov.in/content/mca/global/en/mca/fo-llp-services/verify-din-pan-details.html'
+    'verify_din': 'https://www.mca.gov.in/content/mca/global/en/mca/fo-llp-services/verify-din-pan-details.html',
+    'director_master_data': 'https://www.mca.gov.in/content/mca/global/en/mca/master-data/MDS.html'
+}
+
+# Portal Selectors, by page and purpose ('din.input' etc.). Alternatives are
+# Playwright selectors tried best-first; '{cin}'-style fields are filled in
+# by the caller (see mca_utils.locators)
+SELECTORS = {
+    'din': {
+        'input': ["input[placeholder='Enter Here']", "#din", "xpath=//label[contains(text(),'DIN')]/following::input[1]"],
+        'submit': ["button:has-text('Submit')", "#submitdin", "input[value='Submit']",
+                   "xpath=//button[normalize-space()='Submit']"],
+        'captcha_modal': ['#newCaptchaModal'],
+        'captcha_canvas': ['#new-captcha-canvas'],
+        'captcha_input': ['#captcha-input'],
+        'captcha_validate': ['#validate-captcha'],
+        'captcha_refresh': ['#captcha-refresh-img'],
+        'captcha_error': [".errormsg", ".alert-danger", "text='Incorrect Captcha'", "text='Enter valid text'",
+                          "text='Captcha match failed'"],
+        'result_heading': ["text=DIN Details"],
+        'result_din': ['#DIN'],
+        'result_panel': ['#resultPanel']
+    },
+    'annual': {
+        'search_input': ['#masterdata-search-box'],
+        'search_icon': ['#searchicon'],
+        'captcha_modal': ['#captchaModal'],
+        'captcha_canvas': ['#captchaCanvas', 'canvas'],
+        'captcha_input': ['#customCaptchaInput'],
+        'captcha_submit': ['#check'],
+        'captcha_refresh': ['#captchaRefresh', '.captcha-refresh'],
+        'captcha_error': [".errormsg", ".alert-danger", "text='Incorrect Captcha'", "text='Enter valid text'",
+                          "text='Captcha match failed'", "*:has-text('The captcha entered is incorrect')"],
+        'company_link': ["xpath=//a[normalize-space()='{cin}']", "text={cin}"],
+        'history': ['#screenone', '.annual_filing_table', '#annualFilingTable'],
+        'history_table': ['table.tab-table'],
+        'challan_button': ['.downloadDoc', 'img']
+    },
+    # Director master data (search and CAPTCHA keys are shared with 'annual').
+    # The companies table is found by its CIN/LLPIN cells, not by an id
+    'director': {
+        'companies': ["table:has(td:text-matches('^([LUF][0-9]{{5}}[A-Z]{{2}}[0-9]{{4}}[A-Z]{{3}}[0-9]{{6}}|[A-Z]{{3}}-[0-9]{{4}})$'))"],
+        'no_companies': ["text=/no (records|data|company|companies) (found|available)/i"]
+    }
+}
+
+# Selector Telemetry: which alternative matched, persisted so the usual
+# winner is tried first in later runs
+SELECTOR_CONFIG = {
+    'adaptive': True,                        # Try historically winning alternatives first
+    'stats_path': 'cache/selector_stats.json',
+    'save_every': 25                         # Resolutions between writes of the stats file
 }
 
 # Browser Configuration
+# 'profile' is the BROWSER_PROFILES entry used by every flow not named in
+# 'flow_profiles' ('din_status', 'annual_filing', 'director_companies')
 BROWSER_CONFIG = {
-    'headless': False,
-    'viewport': {'width': 1366, 'height': 768}
+    'headless': False,   # True (--headless) makes every profile headless
+    'viewport': {'width': 1366, 'height': 768},
+    'profile': 'firefox',
+    'flow_profiles': {}
+}
+
+# Browser Launch Profiles (compare them with `python benchmark_browsers.py`).
+# Keys left out fall back to BROWSER_CONFIG; 'args' are engine command-line
+# switches, 'firefox_prefs' about:config values
+BROWSER_PROFILES = {
+    'firefox': {'engine': 'firefox'},   # Visible window unless --headless
+    'firefox-lean': {
+        'engine': 'firefox',
+        'headless': True,
+        'reduced_motion': 'reduce',
+        'locale': 'en-IN',
+        'firefox_prefs': {
+            'layers.acceleration.disabled': True,
+            'gfx.webrender.software': True,
+            'toolkit.cosmeticAnimations.enabled': False,
+            'browser.cache.disk.enable': False
+        }
+    },
+    'chromium-lean': {
+        'engine': 'chromium',
+        'headless': True,
+        'reduced_motion': 'reduce',
+        'locale': 'en-IN',
+        'args': ['--disable-gpu', '--disable-gpu-compositing', '--disable-extensions',
+                 '--disable-background-networking', '--disable-dev-shm-usage',
+                 '--disable-features=Translate,MediaRouter,OptimizationHints']
+    },
+    'webkit-lean': {
+        'engine': 'webkit',
+        'headless': True,
+        'reduced_motion': 'reduce',
+        'locale': 'en-IN'
+    }
+}
+
+# DIN Flow: batches look up this many DINs on one loaded enquiry page,
+# resetting the form in place between them (1 = a fresh page per DIN)
+DIN_FLOW_CONFIG = {
+    'dins_per_page': 20
+}
+
+# Director Audit (`python -m mca_utils audit`): DINs are resolved to their
+# companies, and each company in the batch gets one annual filing lookup
+AUDIT_CONFIG = {
+    'resolve_workers': 1,   # Concurrent director (DIN -> companies) lookups
+    'check_workers': 2      # Concurrent annual filing lookups
+}
+
+# Warm Browser Recycling (daemon workers): a warm browser is closed between
+# lookups once any limit is crossed and relaunched for the next one
+BROWSER_RECYCLE_CONFIG = {
+    'max_lookups': 200,      # Contexts (lookups) served by one browser; 0 = no limit
+    'max_pages': 400,        # Pages opened across those contexts; 0 = no limit
+    'max_rss_mb': 1500,      # RSS of the browser's process tree; 0 = no limit
+    'rss_check_every': 5     # Lookups between RSS samples
+}
+
+# Output Configuration
+# Formats written by the scrapers: any of 'xlsx', 'parquet'
+OUTPUT_FORMATS = ['xlsx']
+
+# Parquet Settings (requires pyarrow)
+PARQUET_CONFIG = {
+    'partition_by': 'Filing Year',  # 'CIN', 'Filing Year' or None for a single file
+    'compression': 'snappy',
+    'amount_precision': 14
+}
+
+# Lookup Cache Configuration
+CACHE_CONFIG = {
+    'enabled': True,
+    'path': 'cache/lookups.sqlite3',  # Persistent store (None for memory only)
+    'memory_size': 1024,              # In-memory LRU entries (0 disables)
+    'default_ttl': 24 * 3600,
+    'ttl': {
+        'din_status': 24 * 3600,        # 24 hours
+        'annual_filing': 7 * 24 * 3600,      # 7 days
+        'director_companies': 7 * 24 * 3600  # 7 days
+    }
+}
+
+# Batch Job Journal (resumable runs)
+JOURNAL_CONFIG = {
+    'path': 'journal/batch_journal.jsonl',
+    'fsync': True  # Force each stage record to disk before continuing
+}
+
+# Distributed Job Queue
+QUEUE_CONFIG = {
+    'url': 'sqlite:///queue/jobs.sqlite3',  # or 'redis://host:6379/0'
+    'redis_prefix': 'mca',
+    'visibility_timeout': 600,  # Seconds before an unacknowledged job is redelivered
+    'max_attempts': 3,
+    'poll_interval': 5          # Seconds between polls of an empty queue
+}
+
+# Stage Tracing (JSON-lines spans; summarise with `python -m mca_utils trace-summary`)
+TRACING_CONFIG = {
+    'enabled': True,
+    'path': 'traces/spans.jsonl'
+}
+
+# Debug Artifacts (screenshots / HTML dumps)
+# policy: 'off', 'on-failure', 'sampled' (failures plus a fraction of the rest) or 'always'
+ARTIFACT_CONFIG = {
+    'policy': 'on-failure',
+    'sample_rate': 0.05,                 # Share of non-failure captures kept when 'sampled'
+    'dir': 'screenshots/artifacts',
+    'compress': True,                    # gzip HTML dumps (PNGs are already compressed)
+    'quota_mb': 500,                     # Oldest artifacts are deleted beyond this
+    'queue_size': 64                     # Pending writes; captures are dropped when full
+}
+
+# Playwright Flight Recorder (trace kept only when a lookup fails)
+PLAYWRIGHT_TRACE_CONFIG = {
+    'enabled': True,
+    'dir': 'traces/playwright',
+    'stages_per_chunk': 3,   # Trace chunk is restarted after this many stages
+    'snapshots': True,       # DOM snapshots per action (the useful part)
+    'screenshots': False     # Screencast frames; much larger and slower
+}
+
+# Profiling (enabled by --profile)
+PROFILE_CONFIG = {
+    'enabled': False,
+    'dir': 'profiles',
+    'every': 1,          # Profile every Nth entity (e.g. 50 for low-overhead batch runs)
+    'engine': 'auto'     # 'auto' (pyinstrument if installed, else cProfile), 'cprofile' or 'pyinstrument'
+}
+
+# Lookup Daemon (`python -m mca_utils serve`)
+DAEMON_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8765,
+    'workers': 2,          # Browser threads, each keeping one browser warm
+    'sync_timeout': 300,   # Seconds a waiting request blocks before getting a job id (202)
+    'job_ttl': 3600        # Seconds finished jobs stay queryable
+}
+
+# Metrics Exporter (Prometheus text format; enabled by --metrics-port)
+METRICS_CONFIG = {
+    'enabled': False,
+    'host': '127.0.0.1',
+    'port': 9108,
+    'buckets': [0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]  # Histogram upper bounds (seconds)
+}
+
+# Logging (records go through a queue to one writer thread)
+LOGGING_CONFIG = {
+    'level': 'INFO',   # DEBUG adds per-row HTML and raw 2Captcha responses
+    'json': False,     # One JSON object per line instead of plain text
+    'path': None       # Also append to this file (UTF-8)
+}
+
+# HTML Snapshot Extraction (mca_utils.extract)
+EXTRACTION_CONFIG = {
+    'parser': 'auto',   # 'auto' (selectolax, else lxml, else html.parser), 'selectolax', 'lxml' or 'stdlib'
+    'workers': 2        # Threads parsing snapshots off the browser thread
+}
+
+# Declarative extraction specs. Field selectors are CSS, with '@attr' to
+# read an attribute instead of the text; specs must stay within the subset
+# the stdlib parser supports (tag, #id, .class, descendants and ',')
+EXTRACTION_SPECS = {
+    'din_result': {
+        'root': '#resultPanel',
+        'fields': {
+            'DIN': '#DIN@value',
+            'Director Name': '#directorName@value',
+            'DIN Status': '#DINstatus@value',
+            'Non-compliant status': '#DINactive@value',
+            'Date of Approval': '#approvalDate@value'
+        }
+    },
+    'annual_history': {
+        'root': 'table.tab-table',
+        'rows': 'tr',
+        'cells': 'td',
+        'min_cells': 4,
+        'columns': {'SRN': 0, 'Form Name': 1, 'Event Date': 2},
+        'markers': {'Challan': (3, '.downloadDoc, img')}   # True if the cell has a match
+    }
 }
 
 # Default Test Data
@@ -0,0 +1,232 @@
+"""
+Lookup Daemon Module for MCA Automation
+Long-running process with warm browsers and a local HTTP/JSON API, so other
+services get warm-path lookups instead of starting a script per call:
+
+    python -m mca_utils serve --workers 2 --headless
+    curl -X POST localhost:8765/din/08560072
+    curl -X POST localhost:8765/cin/U72900KA2020PTC139426/annual-filing
+    curl localhost:8765/jobs/<job_id>
+
+Concurrent requests for the same identifier share one lookup.
+"""
+
+import json
+import queue
+import re
+import threading
+import time
+import uuid
+from urllib.parse import urlparse, parse_qs
+from .config import DAEMON_CONFIG
+from .log import get_logger
+
+logger = get_logger('daemon')
+
+DIN_PATTERN = re.compile(r'^\d{8}$')
+CIN_PATTERN = re.compile(r'^[A-Z0-9]{21}$')
+
+
+class Job:
+    """One lookup, shared by every request that asked for it while it ran."""
+
+    __slots__ = ('id', 'command', 'identifier', 'refresh', 'status', 'result', 'error',
+                 'created', 'finished', 'done')
+
+    def __init__(self, command, identifier, refresh=False):
+        self.id = uuid.uuid4().hex
+        self.command = command
+        self.identifier = identifier
+        self.refresh = refresh
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self, coalesced=False):
+        return {
+            'job_id': self.id,
+            'command': self.command,
+            'identifier': self.identifier,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'coalesced': coalesced
+        }
+
+
+class LookupDaemon:
+    """
+    Job table, request coalescing and the browser worker threads.
+    """
+
+    def __init__(self, workers=None, job_ttl=None):
+        self.workers = workers or DAEMON_CONFIG['workers']
+        self.job_ttl = job_ttl or DAEMON_CONFIG['job_ttl']
+        self._jobs = {}
+        self._inflight = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for index in range(max(1, self.workers)):
+            thread = threading.Thread(target=self._work, name=f"lookup-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, command, identifier, refresh=False):
+        """
+        Queue a lookup, or join the one already queued/running for it.
+
+        Returns:
+            Tuple of (Job, coalesced)
+        """
+        key = (command, identifier)
+        with self._lock:
+            self._prune()
+            job = self._inflight.get(key)
+            if job is not None:
+                return job, True
+            job = Job(command, identifier, refresh)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+        self._queue.put(job)
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {'workers': len(self._threads), 'jobs': counts}
+
+    def _prune(self):
+        cutoff = time.time() - self.job_ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        from .browser import warm_browser
+
+        try:
+            with warm_browser():
+                self._loop()
+        except Exception as e:
+            # _run() never raises, so this is the browser failing to start
+            logger.error(f"Could not start a warm browser ({e}); launching one per lookup instead.")
+            self._loop()
+
+    def _loop(self):
+        while True:
+            self._run(self._queue.get())
+
+    def _run(self, job):
+        from .cli import lookup_rows
+
+        job.status = 'running'
+        start = time.time()
+        try:
+            rows = lookup_rows(job.command, job.identifier, force_refresh=job.refresh)
+            if rows:
+                job.result = rows[0] if job.command == 'din' else rows
+                job.status = 'done'
+            else:
+                job.status, job.error = 'failed', 'no result'
+        except Exception as e:
+            job.status, job.error = 'failed', repr(e)
+        job.finished = time.time()
+        logger.info(f"{job.command} {job.identifier}: {job.status} ({job.finished - start:.1f}s)")
+        with self._lock:
+            self._inflight.pop((job.command, job.identifier), None)
+        job.done.set()
+
+
+def _make_handler(daemon):
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = urlparse(self.path).path.strip('/').split('/')
+            if parts == ['health']:
+                self._send(200, daemon.stats())
+            elif len(parts) == 2 and parts[0] == 'jobs':
+                job = daemon.get(parts[1])
+                if job is None:
+                    self._send(404, {'error': 'unknown job'})
+                else:
+                    self._send(200, job.to_dict())
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            params = parse_qs(url.query)
+
+            def flag(name, default):
+                values = params.get(name)
+                return default if not values else values[0].lower() not in ('0', 'false', 'no')
+
+            if len(parts) == 2 and parts[0] == 'din':
+                command, identifier, pattern, wait = 'din', parts[1], DIN_PATTERN, flag('wait', True)
+            elif len(parts) == 3 and parts[0] == 'cin' and parts[2] == 'annual-filing':
+                # Filings take minutes, so they are asynchronous unless ?wait=1
+                command, identifier, pattern, wait = 'annual-filing', parts[1].upper(), CIN_PATTERN, flag('wait', False)
+            else:
+                self._send(404, {'error': 'not found'})
+                return
+            if not pattern.match(identifier):
+                self._send(400, {'error': f"invalid identifier {identifier!r}"})
+                return
+
+            job, coalesced = daemon.submit(command, identifier, refresh=flag('refresh', False))
+            if wait:
+                job.done.wait(DAEMON_CONFIG['sync_timeout'])
+            if job.done.is_set():
+                self._send(200 if job.status == 'done' else 502, job.to_dict(coalesced))
+            else:
+                self._send(202, job.to_dict(coalesced))
+
+        def log_message(self, format, *args):
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+    return Handler
+
+
+def serve(host=None, port=None, workers=None):
+    """
+    Run the lookup daemon until interrupted.
+
+    Args:
+        host: Bind address (default DAEMON_CONFIG['host'])
+        port: TCP port (default DAEMON_CONFIG['port'])
+        workers: Browser worker threads, each with its own warm browser
+    """
+    from http.server import ThreadingHTTPServer
+
+    daemon = LookupDaemon(workers)
+    daemon.start()
+    server = ThreadingHTTPServer((host or DAEMON_CONFIG['host'], port or DAEMON_CONFIG['port']), _make_handler(daemon))
+    logger.info(f"Lookup daemon listening on http://{server.server_address[0]}:{server.server_address[1]} "
+                f"with {daemon.workers} browser worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Daemon stopped.")
+    finally:
+        server.server_close()
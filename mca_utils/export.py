@@ -0,0 +1,174 @@
+"""
+Typed Export Module for MCA Automation
+Converts scraped filing and payment rows into typed, columnar Parquet datasets
+"""
+
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from .config import PARQUET_CONFIG
+
+
+# Values the scrapers use to mark a missing cell
+MISSING_VALUES = {'', 'N/A', 'NA', 'NAN', 'NONE', 'NAT'}
+
+# Dates on the portal and in the challans are dd/mm/yyyy, sometimes embedded
+# in a longer string ("F14539951 Service Request Date : 08/07/2022")
+DATE_PATTERN = re.compile(r'(\d{1,2}/\d{1,2}/\d{4})')
+
+AMOUNT_COLUMNS = ['Amount Paid', 'Late Fee']
+DATE_COLUMNS = ['Event Date', 'Date of Filing']
+CATEGORY_COLUMNS = ['Form Name']
+
+
+def parse_amount(value):
+    """
+    Parse a scraped amount such as "1,200.00" into a Decimal.
+
+    Args:
+        value: Raw cell value (string, number or None)
+
+    Returns:
+        Decimal rounded to 2 places, or None for missing/unparseable values
+    """
+    if value is None:
+        return None
+    text = str(value).replace(',', '').strip()
+    if text.upper() in MISSING_VALUES:
+        return None
+    try:
+        return Decimal(text).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def parse_date(value):
+    """
+    Parse a scraped dd/mm/yyyy date, ignoring any surrounding text.
+
+    Args:
+        value: Raw cell value
+
+    Returns:
+        datetime.date or None for missing/unparseable values
+    """
+    if value is None:
+        return None
+    match = DATE_PATTERN.search(str(value))
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(1), '%d/%m/%Y').date()
+    except ValueError:
+        return None
+
+
+def to_typed_frame(df, cin=None):
+    """
+    Convert a scraped filing DataFrame into typed columns.
+
+    Amount columns become Decimal, date columns become datetime.date,
+    form names become categoricals (already typed columns, as built by
+    records.records_frame(), are kept) and a 'Filing Year' column is derived
+    from the event date for partitioning.
+
+    Args:
+        df: pandas DataFrame with the standard filing columns
+        cin: Optional CIN to add as a column (used for partitioning)
+
+    Returns:
+        New DataFrame with typed columns
+    """
+    import pandas as pd
+
+    typed = df.copy()
+    if cin is not None:
+        typed.insert(0, 'CIN', cin)
+
+    for col in AMOUNT_COLUMNS:
+        if col in typed.columns:
+            typed[col] = typed[col].map(parse_amount)
+
+    event_dates = None
+    for col in DATE_COLUMNS:
+        if col in typed.columns:
+            # Columns from records_frame() already hold dates
+            raw = typed[col].map(lambda v: v.strftime('%d/%m/%Y') if isinstance(v, date) else v)
+            raw = raw.astype('string').str.extract(DATE_PATTERN, expand=False)
+            parsed = pd.to_datetime(raw, format='%d/%m/%Y', errors='coerce')
+            typed[col] = parsed.dt.date.astype(object).where(parsed.notna(), None)
+            if col == 'Event Date':
+                event_dates = parsed
+
+    for col in CATEGORY_COLUMNS:
+        if col in typed.columns:
+            typed[col] = typed[col].astype('category')
+
+    if event_dates is not None:
+        typed['Filing Year'] = event_dates.dt.year.astype('Int16')
+
+    return typed
+
+
+def _arrow_schema(typed, pa):
+    """Build the explicit Arrow schema for a typed filing frame."""
+    amount_type = pa.decimal128(PARQUET_CONFIG['amount_precision'], 2)
+    fields = []
+    for col in typed.columns:
+        if col in AMOUNT_COLUMNS:
+            fields.append(pa.field(col, amount_type))
+        elif col in DATE_COLUMNS:
+            fields.append(pa.field(col, pa.date32()))
+        elif col in CATEGORY_COLUMNS:
+            fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+        elif col == 'Filing Year':
+            fields.append(pa.field(col, pa.int16()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def write_parquet(df, path, cin=None, partition_by=None):
+    """
+    Write filing/payment rows as a typed Parquet file or dataset.
+
+    Args:
+        df: pandas DataFrame with the standard filing columns (raw strings
+            or records.records_frame() output)
+        path: Output file path, or dataset root directory when partitioned
+        cin: Optional CIN to store alongside each row
+        partition_by: Column to partition on ('CIN' or 'Filing Year');
+            defaults to PARQUET_CONFIG['partition_by']. Pass '' to write
+            a single file instead of a partitioned dataset.
+
+    Returns:
+        Path written to
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+
+    if partition_by is None:
+        partition_by = PARQUET_CONFIG['partition_by']
+
+    typed = to_typed_frame(df, cin=cin)
+    # Keep identifiers and unknown columns as plain strings
+    for col in typed.columns:
+        if col not in AMOUNT_COLUMNS + DATE_COLUMNS + CATEGORY_COLUMNS + ['Filing Year']:
+            typed[col] = typed[col].astype('string')
+
+    table = pa.Table.from_pandas(typed, schema=_arrow_schema(typed, pa), preserve_index=False)
+
+    if partition_by and partition_by in typed.columns:
+        pq.write_to_dataset(
+            table,
+            root_path=path,
+            partition_cols=[partition_by],
+            compression=PARQUET_CONFIG['compression']
+        )
+    else:
+        pq.write_table(table, path, compression=PARQUET_CONFIG['compression'])
+
+    return path
@@ -0,0 +1,359 @@
+"""
+HTML Snapshot Extraction Module for MCA Automation
+Extracts result fields and tables from one HTML snapshot of the page instead
+of a live-DOM locator call per value. Snapshots are parsed with selectolax or
+lxml when installed (html.parser otherwise), optionally on a worker thread
+so the browser is free as soon as the snapshot is taken. What to extract is
+declared in EXTRACTION_SPECS, so saved pages work offline too:
+
+    python -m mca_utils extract annual_history debug_annual_page.html
+"""
+
+import contextvars
+import gzip
+import re
+import threading
+from html.parser import HTMLParser
+from .config import EXTRACTION_CONFIG, EXTRACTION_SPECS
+from .tracing import start_span
+from .log import get_logger
+
+logger = get_logger('extract')
+
+# Copies live input values into their value attributes (which is all that
+# outerHTML serialises) and returns the element's HTML in one round trip
+_SNAPSHOT_JS = """el => {
+    for (const field of el.querySelectorAll('input, select, textarea')) {
+        field.setAttribute('value', field.value);
+    }
+    return el.outerHTML;
+}"""
+
+_parser = None
+_executor = None
+_lock = threading.Lock()
+
+
+class _SelectolaxParser:
+    name = 'selectolax'
+
+    def __init__(self):
+        from selectolax.parser import HTMLParser as Document
+        self._document = Document
+
+    def parse(self, html):
+        return self._document(html)
+
+    def select(self, node, css):
+        return node.css(css)
+
+    def text(self, node):
+        return node.text(separator=' ')
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+
+class _LxmlParser:
+    name = 'lxml'
+
+    def __init__(self):
+        import lxml.html
+        from lxml.cssselect import CSSSelector  # needs the cssselect package
+        self._html = lxml.html
+        self._selector = CSSSelector
+        self._compiled = {}
+
+    def parse(self, html):
+        return self._html.document_fromstring(html)
+
+    def select(self, node, css):
+        selector = self._compiled.get(css)
+        if selector is None:
+            selector = self._compiled[css] = self._selector(css)
+        return selector(node)
+
+    def text(self, node):
+        return node.text_content()
+
+    def attr(self, node, name):
+        return node.get(name)
+
+
+class _Node:
+    __slots__ = ('tag', 'attrs', 'parent', 'children')
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.children = []
+
+
+class _TreeBuilder(HTMLParser):
+    VOID = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node('#document', {}, None)
+        self._stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = _Node(tag, {k: v or '' for k, v in attrs}, self._stack[-1])
+        self._stack[-1].children.append(node)
+        if tag not in self.VOID:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self._stack[-1].children.append(_Node(tag, {k: v or '' for k, v in attrs}, self._stack[-1]))
+
+    def handle_endtag(self, tag):
+        # Close up to the matching open tag; stray end tags are ignored
+        for i in range(len(self._stack) - 1, 0, -1):
+            if self._stack[i].tag == tag:
+                del self._stack[i:]
+                return
+
+    def handle_data(self, data):
+        self._stack[-1].children.append(data)
+
+
+class _StdlibParser:
+    """
+    Fallback when neither selectolax nor lxml is installed. Supports the
+    selector subset used by EXTRACTION_SPECS: tag, #id and .class compounds,
+    descendant combinators and ',' groups.
+    """
+
+    name = 'stdlib'
+    _COMPOUND = re.compile(r'^(\*|[a-zA-Z][\w-]*)?((?:[#.][\w-]+)*)$')
+
+    def __init__(self):
+        self._compiled = {}
+
+    def parse(self, html):
+        builder = _TreeBuilder()
+        builder.feed(html)
+        builder.close()
+        return builder.root
+
+    def _compile(self, css):
+        groups = self._compiled.get(css)
+        if groups is not None:
+            return groups
+        groups = []
+        for group in css.split(','):
+            compounds = []
+            for part in group.split():
+                match = self._COMPOUND.match(part)
+                if not match:
+                    raise ValueError(f"Selector {css!r} is not supported by the stdlib parser")
+                tag, rest = match.groups()
+                ids = [t[1:] for t in re.findall(r'[#.][\w-]+', rest) if t[0] == '#']
+                classes = [t[1:] for t in re.findall(r'[#.][\w-]+', rest) if t[0] == '.']
+                compounds.append((None if tag in (None, '*') else tag.lower(), ids, classes))
+            groups.append(compounds)
+        self._compiled[css] = groups
+        return groups
+
+    @staticmethod
+    def _matches(node, compound):
+        tag, ids, classes = compound
+        if tag and node.tag != tag:
+            return False
+        if ids and any(node.attrs.get('id') != i for i in ids):
+            return False
+        if classes:
+            have = node.attrs.get('class', '').split()
+            return all(c in have for c in classes)
+        return True
+
+    def _matches_chain(self, node, compounds):
+        if not self._matches(node, compounds[-1]):
+            return False
+        ancestor = node.parent
+        for compound in reversed(compounds[:-1]):
+            while ancestor is not None and not (ancestor.tag != '#document' and self._matches(ancestor, compound)):
+                ancestor = ancestor.parent
+            if ancestor is None:
+                return False
+            ancestor = ancestor.parent
+        return True
+
+    def select(self, node, css):
+        groups = self._compile(css)
+        found = []
+        pending = [c for c in reversed(node.children) if isinstance(c, _Node)]
+        while pending:
+            current = pending.pop()
+            if any(self._matches_chain(current, compounds) for compounds in groups):
+                found.append(current)
+            pending.extend(c for c in reversed(current.children) if isinstance(c, _Node))
+        return found
+
+    def text(self, node):
+        parts = []
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            if isinstance(current, str):
+                parts.append(current)
+            elif current.tag not in ('script', 'style'):
+                pending.extend(reversed(current.children))
+        return ' '.join(parts)
+
+    def attr(self, node, name):
+        return node.attrs.get(name)
+
+
+_PARSERS = {'selectolax': _SelectolaxParser, 'lxml': _LxmlParser, 'stdlib': _StdlibParser}
+
+
+def get_parser():
+    """
+    Returns:
+        The process-wide parser backend chosen by EXTRACTION_CONFIG['parser']
+    """
+    global _parser
+    if _parser is None:
+        with _lock:
+            if _parser is None:
+                choice = EXTRACTION_CONFIG['parser']
+                names = ('selectolax', 'lxml', 'stdlib') if choice == 'auto' else (choice, 'stdlib')
+                for name in names:
+                    try:
+                        _parser = _PARSERS[name]()
+                        break
+                    except ImportError:
+                        if choice != 'auto':
+                            logger.warning(f"{name} is not installed; falling back to html.parser.")
+                logger.debug("HTML extraction parser: %s", _parser.name)
+    return _parser
+
+
+def _resolve_spec(spec):
+    return EXTRACTION_SPECS[spec] if isinstance(spec, str) else spec
+
+
+def _clean(value):
+    return ' '.join(value.split()) if value else ''
+
+
+def _scope(parser, document, spec):
+    # Snapshots of the root element and whole saved pages both work
+    root = spec.get('root')
+    matches = parser.select(document, root) if root else []
+    return matches[0] if matches else document
+
+
+def extract_fields(html, spec):
+    """
+    Extract named values from a snapshot.
+
+    Args:
+        html: HTML snapshot
+        spec: EXTRACTION_SPECS name or a spec dict with 'fields'
+
+    Returns:
+        Dict of field name -> value ("N/A" when missing or empty)
+    """
+    spec = _resolve_spec(spec)
+    parser = get_parser()
+    scope = _scope(parser, parser.parse(html), spec)
+    row = {}
+    for name, selector in spec['fields'].items():
+        css, _, attr = selector.partition('@')
+        found = parser.select(scope, css)
+        value = (parser.attr(found[0], attr) if attr else parser.text(found[0])) if found else None
+        row[name] = _clean(value) or "N/A"
+    return row
+
+
+def extract_table(html, spec):
+    """
+    Extract table rows from a snapshot.
+
+    Args:
+        html: HTML snapshot
+        spec: EXTRACTION_SPECS name or a spec dict with 'rows' and 'columns'
+
+    Returns:
+        List of (row index, record) tuples; the index counts every row the
+        'rows' selector matched, so it also addresses the row in the live page
+    """
+    spec = _resolve_spec(spec)
+    parser = get_parser()
+    table = _scope(parser, parser.parse(html), spec)
+    markers = spec.get('markers', {})
+    results = []
+    for index, row in enumerate(parser.select(table, spec['rows'])):
+        cells = parser.select(row, spec['cells'])
+        if len(cells) < spec.get('min_cells', 1):
+            continue
+        record = {name: _clean(parser.text(cells[i])) for name, i in spec['columns'].items()}
+        for name, (i, css) in markers.items():
+            record[name] = bool(parser.select(cells[i], css))
+        results.append((index, record))
+    return results
+
+
+def extract(html, spec):
+    """
+    Run a fields or table spec over a snapshot (see extract_fields / extract_table).
+    """
+    name = spec if isinstance(spec, str) else 'custom'
+    spec = _resolve_spec(spec)
+    # start_span, not span(): this may run on a worker thread, which must not
+    # drive the browser thread's stage hook (flight recorder)
+    extract_span = start_span('html_extract', spec=name, parser=get_parser().name, bytes=len(html or ''))
+    if not html:
+        result = {} if 'fields' in spec else []
+    elif 'fields' in spec:
+        result = extract_fields(html, spec)
+    else:
+        result = extract_table(html, spec)
+    extract_span.end()
+    return result
+
+
+def extract_async(html, spec):
+    """
+    Parse a snapshot on the extraction thread pool.
+
+    Returns:
+        concurrent.futures.Future resolving to extract(html, spec)
+    """
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _executor = ThreadPoolExecutor(max_workers=EXTRACTION_CONFIG['workers'], thread_name_prefix='extract')
+    # Carry the entity context over so spans and log lines keep their DIN/CIN
+    return _executor.submit(contextvars.copy_context().run, extract, html, spec)
+
+
+def snapshot(frame, selector=None):
+    """
+    Take an HTML snapshot of an element (or the whole page) in one round trip.
+
+    Unlike frame.content(), values typed or set by script into inputs are
+    included, as their value attributes.
+
+    Args:
+        frame: Playwright page or frame
+        selector: CSS selector of the element, or an already resolved
+            Locator (default the whole document)
+
+    Returns:
+        outerHTML string
+    """
+    target = frame.locator(selector or 'html').first if selector is None or isinstance(selector, str) else selector
+    return target.evaluate(_SNAPSHOT_JS)
+
+
+def read_snapshot(path):
+    """Read a saved page (plain or gzip-compressed, as artifacts are)."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        return f.read()
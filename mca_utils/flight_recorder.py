@@ -0,0 +1,122 @@
+"""
+Flight Recorder Module for MCA Automation
+Runs Playwright tracing in chunks that are discarded as the flow moves
+through its stages, and saves the current chunk only when the lookup fails,
+named after the DIN/CIN and the stage it failed in
+
+    with sync_playwright() as p, FlightRecorder() as recorder:
+        ...
+        context = browser.new_context()
+        recorder.attach(context)
+        ...
+        recorder.mark_success()
+        return row
+"""
+
+import os
+import re
+import time
+from .config import PLAYWRIGHT_TRACE_CONFIG
+from .tracing import current_entity, current_stage, set_stage_hook, reset_stage_hook
+from .log import get_logger
+
+logger = get_logger('flight_recorder')
+
+
+class FlightRecorder:
+    """
+    Failure-only Playwright trace for one browser context.
+
+    Stages come from tracing.span(): every `stages_per_chunk` stages the
+    trace chunk is dropped and a new one started, so at most the last few
+    stages are ever held. Leaving the block without mark_success() (an
+    early return or an exception) saves the chunk as a trace zip.
+    """
+
+    def __init__(self, enabled=None):
+        self.enabled = PLAYWRIGHT_TRACE_CONFIG['enabled'] if enabled is None else enabled
+        self.context = None
+        self.succeeded = False
+        self.stage = None
+        self._stages_in_chunk = 0
+        self._hook_token = None
+
+    def __enter__(self):
+        if self.enabled:
+            self._hook_token = set_stage_hook(self._on_stage)
+        return self
+
+    def attach(self, context):
+        """Start tracing a freshly created browser context."""
+        if not self.enabled:
+            return
+        try:
+            context.tracing.start(
+                snapshots=PLAYWRIGHT_TRACE_CONFIG['snapshots'],
+                screenshots=PLAYWRIGHT_TRACE_CONFIG['screenshots']
+            )
+            context.tracing.start_chunk()
+            self.context = context
+        except Exception as e:
+            logger.warning(f"Could not start Playwright tracing: {e}")
+
+    def _on_stage(self, stage):
+        self.stage = stage
+        if self.context is None:
+            return
+        self._stages_in_chunk += 1
+        if self._stages_in_chunk > PLAYWRIGHT_TRACE_CONFIG['stages_per_chunk']:
+            try:
+                # Stopping a chunk without a path discards it
+                self.context.tracing.stop_chunk()
+                self.context.tracing.start_chunk()
+                self._stages_in_chunk = 1
+            except Exception as e:
+                logger.debug("Trace chunk rotation failed: %s", e)
+
+    def mark_success(self):
+        """Mark the lookup as successful; the trace will be discarded."""
+        self.succeeded = True
+
+    def save_failure(self):
+        """
+        Save the current chunk now and keep recording, for one failed item
+        of a session that goes on to look up more (several DINs on one page).
+        """
+        if self.context is None:
+            return
+        try:
+            path = self._trace_path()
+            self.context.tracing.stop_chunk(path=path)
+            self.context.tracing.start_chunk()
+            self._stages_in_chunk = 0
+            logger.warning(f"Saved failure trace to {path} (open with `playwright show-trace`)")
+        except Exception as e:
+            logger.warning(f"Could not save Playwright trace: {e}")
+
+    def _trace_path(self):
+        context = current_entity()
+        flow, entity = context if context else ('flow', 'unknown')
+        stage = self.stage or current_stage() or 'start'
+        name = re.sub(r'[^\w.-]', '_', f"{flow}_{entity}_{stage}_{time.strftime('%Y%m%d-%H%M%S')}")
+        directory = PLAYWRIGHT_TRACE_CONFIG['dir']
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        return os.path.join(directory, name + '.zip')
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._hook_token is not None:
+            reset_stage_hook(self._hook_token)
+        if self.context is None:
+            return False
+        try:
+            if self.succeeded and exc_type is None:
+                self.context.tracing.stop_chunk()
+            else:
+                path = self._trace_path()
+                self.context.tracing.stop_chunk(path=path)
+                logger.warning(f"Saved failure trace to {path} (open with `playwright show-trace`)")
+            self.context.tracing.stop()
+        except Exception as e:
+            logger.warning(f"Could not save Playwright trace: {e}")
+        return False
@@ -0,0 +1,317 @@
+"""
+Job Queue Module for MCA Automation
+Pluggable lookup job queues with leases and visibility timeouts, for
+worker processes on one or many machines:
+
+- SQLiteJobQueue: single host (a SQLite file, optionally on a shared disk)
+- RedisJobQueue: multi-node, works with any redis-py compatible client
+  (including an in-process stand-in such as fakeredis for testing)
+
+A leased job that is not completed or extended before its visibility
+timeout expires is delivered again, so jobs held by crashed workers are
+not lost.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from .config import QUEUE_CONFIG
+
+
+class SQLiteJobQueue:
+    """
+    Job queue stored in a SQLite database.
+    """
+
+    def __init__(self, path, max_attempts=None):
+        """
+        Args:
+            path: SQLite database file
+            max_attempts: Deliveries before a job is marked failed
+        """
+        self.path = path
+        self.max_attempts = max_attempts or QUEUE_CONFIG['max_attempts']
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        # Autocommit mode; transactions are opened explicitly where needed
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, command TEXT NOT NULL, identifier TEXT NOT NULL,"
+            " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " lease_until REAL, worker TEXT, result TEXT, error TEXT,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL,"
+            " UNIQUE (command, identifier))"
+        )
+
+    def put(self, command, identifier):
+        """
+        Enqueue a lookup. Re-enqueueing a known (command, identifier) resets
+        it to pending unless it is currently leased.
+
+        Returns:
+            Job id
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, command, identifier, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, 'pending', ?, ?)"
+                " ON CONFLICT (command, identifier) DO UPDATE SET"
+                " status = 'pending', attempts = 0, error = NULL, updated_at = excluded.updated_at"
+                " WHERE status != 'leased'",
+                (job_id, command, identifier, now, now)
+            )
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE command = ? AND identifier = ?", (command, identifier)
+            ).fetchone()
+        return row[0]
+
+    def lease(self, worker, visibility_timeout=None):
+        """
+        Take the oldest pending (or lease-expired) job.
+
+        Args:
+            worker: Worker id recorded on the lease
+            visibility_timeout: Seconds before the job is redelivered
+
+        Returns:
+            Dict with id, command, identifier and attempts, or None if idle
+        """
+        timeout = visibility_timeout or QUEUE_CONFIG['visibility_timeout']
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases that used up their attempts are failed for good
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'lease expired', updated_at = ?"
+                    " WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                row = self._conn.execute(
+                    "SELECT id, command, identifier, attempts FROM jobs"
+                    " WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?)"
+                    " ORDER BY created_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'leased', attempts = attempts + 1,"
+                    " lease_until = ?, worker = ?, updated_at = ? WHERE id = ?",
+                    (now + timeout, worker, now, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {'id': row[0], 'command': row[1], 'identifier': row[2], 'attempts': row[3] + 1}
+
+    def extend(self, job_id, worker, visibility_timeout=None):
+        """
+        Push a held lease's deadline forward (heartbeat).
+
+        Returns:
+            True if the worker still holds the lease
+        """
+        timeout = visibility_timeout or QUEUE_CONFIG['visibility_timeout']
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + timeout, job_id, worker)
+            )
+        return cur.rowcount == 1
+
+    def complete(self, job_id, worker, result):
+        """
+        Mark a job done and store its JSON-serialisable result.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_until = NULL,"
+                " updated_at = ? WHERE id = ? AND worker = ?",
+                (json.dumps(result), time.time(), job_id, worker)
+            )
+
+    def fail(self, job_id, worker, error):
+        """
+        Release a job after a failed attempt; it is retried until
+        max_attempts deliveries have been made.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+                " error = ?, lease_until = NULL, updated_at = ? WHERE id = ? AND worker = ?",
+                (self.max_attempts, str(error), time.time(), job_id, worker)
+            )
+
+    def stats(self):
+        """
+        Return a dict of job counts by status.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def results(self, command=None):
+        """
+        Return (command, identifier, status, result, error) for finished jobs.
+        """
+        query = "SELECT command, identifier, status, result, error FROM jobs WHERE status IN ('done', 'failed')"
+        params = ()
+        if command:
+            query += " AND command = ?"
+            params = (command,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at", params).fetchall()
+        return [(c, i, s, json.loads(r) if r else None, e) for c, i, s, r, e in rows]
+
+
+class RedisJobQueue:
+    """
+    Job queue on a Redis-compatible server.
+
+    Keys (under `prefix`): a 'pending' list of job ids, a 'leases' sorted
+    set scored by lease deadline, and one hash per job.
+    """
+
+    def __init__(self, client, prefix='mca', max_attempts=None):
+        """
+        Args:
+            client: redis.Redis (or compatible, e.g. fakeredis) client
+            prefix: Key prefix, so several sweeps can share a server
+            max_attempts: Deliveries before a job is marked failed
+        """
+        self.client = client
+        self.prefix = prefix
+        self.max_attempts = max_attempts or QUEUE_CONFIG['max_attempts']
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    def _decode(self, value):
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def put(self, command, identifier):
+        job_id = f"{command}:{identifier}"
+        job_key = self._key('job', job_id)
+        if self._decode(self.client.hget(job_key, 'status')) == 'leased':
+            return job_id
+        self.client.hset(job_key, mapping={
+            'command': command, 'identifier': identifier, 'status': 'pending',
+            'attempts': 0, 'error': '', 'created_at': time.time()
+        })
+        self.client.lrem(self._key('pending'), 0, job_id)
+        self.client.lpush(self._key('pending'), job_id)
+        return job_id
+
+    def _requeue_expired(self, now):
+        for job_id in self.client.zrangebyscore(self._key('leases'), '-inf', now):
+            job_id = self._decode(job_id)
+            # ZREM succeeds for exactly one worker, so a job is requeued once
+            if self.client.zrem(self._key('leases'), job_id):
+                attempts = int(self.client.hget(self._key('job', job_id), 'attempts') or 0)
+                if attempts >= self.max_attempts:
+                    self.client.hset(self._key('job', job_id), mapping={'status': 'failed', 'error': 'lease expired'})
+                else:
+                    self.client.hset(self._key('job', job_id), 'status', 'pending')
+                    self.client.rpush(self._key('pending'), job_id)
+
+    def lease(self, worker, visibility_timeout=None):
+        timeout = visibility_timeout or QUEUE_CONFIG['visibility_timeout']
+        now = time.time()
+        self._requeue_expired(now)
+        job_id = self.client.rpop(self._key('pending'))
+        if job_id is None:
+            return None
+        job_id = self._decode(job_id)
+        job_key = self._key('job', job_id)
+        self.client.zadd(self._key('leases'), {job_id: now + timeout})
+        attempts = self.client.hincrby(job_key, 'attempts', 1)
+        self.client.hset(job_key, mapping={'status': 'leased', 'worker': worker})
+        return {
+            'id': job_id,
+            'command': self._decode(self.client.hget(job_key, 'command')),
+            'identifier': self._decode(self.client.hget(job_key, 'identifier')),
+            'attempts': int(attempts)
+        }
+
+    def _holds(self, job_id, worker):
+        return self._decode(self.client.hget(self._key('job', job_id), 'worker')) == worker
+
+    def extend(self, job_id, worker, visibility_timeout=None):
+        timeout = visibility_timeout or QUEUE_CONFIG['visibility_timeout']
+        if not self._holds(job_id, worker) or self.client.zscore(self._key('leases'), job_id) is None:
+            return False
+        self.client.zadd(self._key('leases'), {job_id: time.time() + timeout})
+        return True
+
+    def complete(self, job_id, worker, result):
+        if not self._holds(job_id, worker):
+            return
+        self.client.zrem(self._key('leases'), job_id)
+        self.client.hset(self._key('job', job_id), mapping={
+            'status': 'done', 'result': json.dumps(result), 'error': ''
+        })
+
+    def fail(self, job_id, worker, error):
+        if not self._holds(job_id, worker):
+            return
+        self.client.zrem(self._key('leases'), job_id)
+        job_key = self._key('job', job_id)
+        attempts = int(self.client.hget(job_key, 'attempts') or 0)
+        if attempts >= self.max_attempts:
+            self.client.hset(job_key, mapping={'status': 'failed', 'error': str(error)})
+        else:
+            self.client.hset(job_key, mapping={'status': 'pending', 'error': str(error)})
+            self.client.rpush(self._key('pending'), job_id)
+
+    def _jobs(self):
+        for key in self.client.scan_iter(match=self._key('job', '*')):
+            job = {self._decode(k): self._decode(v) for k, v in self.client.hgetall(key).items()}
+            yield job
+
+    def stats(self):
+        counts = {}
+        for job in self._jobs():
+            counts[job.get('status')] = counts.get(job.get('status'), 0) + 1
+        return counts
+
+    def results(self, command=None):
+        rows = []
+        for job in sorted(self._jobs(), key=lambda j: float(j.get('created_at', 0))):
+            if job.get('status') not in ('done', 'failed'):
+                continue
+            if command and job.get('command') != command:
+                continue
+            result = json.loads(job['result']) if job.get('result') else None
+            rows.append((job['command'], job['identifier'], job['status'], result, job.get('error') or None))
+        return rows
+
+
+def open_queue(url=None):
+    """
+    Open a job queue from a URL.
+
+    Args:
+        url: 'sqlite:///path/to/jobs.sqlite3' or 'redis://host:port/db'
+            (default QUEUE_CONFIG['url'])
+
+    Returns:
+        SQLiteJobQueue or RedisJobQueue
+    """
+    url = url or QUEUE_CONFIG['url']
+    if url.startswith('sqlite:///'):
+        return SQLiteJobQueue(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        import redis
+        return RedisJobQueue(redis.Redis.from_url(url), prefix=QUEUE_CONFIG['redis_prefix'])
+    raise ValueError(f"Unsupported queue URL: {url}")
@@ -0,0 +1,157 @@
+"""
+Job Journal Module for MCA Automation
+Write-ahead journal of per-entity flow stages so batch runs can resume
+after a crash instead of starting over
+"""
+
+import json
+import os
+import threading
+import time
+from .config import JOURNAL_CONFIG
+
+
+# Stages in the order a flow passes through them
+STAGES = [
+    'searched',
+    'captcha_1_passed',
+    'company_opened',
+    'captcha_2_passed',
+    'table_scraped',
+    'challan_downloaded',
+    'challan_parsed',
+    'done',
+    'failed'
+]
+
+FINISHED_STAGES = ('done',)
+
+
+class JobJournal:
+    """
+    Append-only JSON-lines journal of (entity, stage, data) records.
+
+    Every record is flushed and fsync'd before record() returns, so a crash
+    loses at most the stage in progress. Opening an existing journal
+    replays it to rebuild the latest state of every entity.
+    """
+
+    def __init__(self, path=None, fsync=None):
+        """
+        Args:
+            path: Journal file (default JOURNAL_CONFIG['path'])
+            fsync: Force every record to disk (default JOURNAL_CONFIG['fsync'])
+        """
+        self.path = path or JOURNAL_CONFIG['path']
+        self.fsync = JOURNAL_CONFIG['fsync'] if fsync is None else fsync
+        self._lock = threading.Lock()
+        # entity -> {stage or (stage, key): data}
+        self._state = {}
+        # entity -> last stage recorded
+        self._last = {}
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._replay()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if self._file.tell() > 0 and not self._ends_with_newline():
+            # Terminate a torn final line so the next record starts cleanly
+            self._file.write('\n')
+            self._file.flush()
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _apply(self, record):
+        entity = record['entity']
+        stage = record['stage']
+        key = record.get('key')
+        self._state.setdefault(entity, {})[(stage, key) if key else stage] = record.get('data', {})
+        self._last[entity] = stage
+        if stage in FINISHED_STAGES:
+            # A finished entity no longer needs its intermediate stages
+            self._state[entity] = {stage: record.get('data', {})}
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    # Torn final write from a crash; everything before it is intact
+                    continue
+
+    def record(self, entity, stage, key=None, **data):
+        """
+        Durably record that an entity completed a stage.
+
+        Args:
+            entity: DIN or CIN
+            stage: One of STAGES
+            key: Optional sub-key for repeated stages (e.g. the SRN of a challan)
+            **data: JSON-serialisable stage output needed to resume
+        """
+        record = {'ts': time.time(), 'entity': entity, 'stage': stage, 'data': data}
+        if key:
+            record['key'] = key
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._apply(record)
+
+    def has(self, entity, stage, key=None):
+        with self._lock:
+            return ((stage, key) if key else stage) in self._state.get(entity, {})
+
+    def data(self, entity, stage, key=None):
+        """
+        Return the data recorded for a stage, or None if not reached.
+        """
+        with self._lock:
+            return self._state.get(entity, {}).get((stage, key) if key else stage)
+
+    def last_stage(self, entity):
+        with self._lock:
+            return self._last.get(entity)
+
+    def is_finished(self, entity):
+        return self.last_stage(entity) in FINISHED_STAGES
+
+    def pending(self, entities):
+        """
+        Filter a list of entities down to those not yet finished.
+        """
+        return [e for e in entities if not self.is_finished(e)]
+
+    def compact(self):
+        """
+        Rewrite the journal keeping only each entity's current state.
+        """
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entity, stages in self._state.items():
+                    for stage_key, data in stages.items():
+                        stage, key = stage_key if isinstance(stage_key, tuple) else (stage_key, None)
+                        record = {'ts': time.time(), 'entity': entity, 'stage': stage, 'data': data}
+                        if key:
+                            record['key'] = key
+                        f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
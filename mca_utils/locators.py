@@ -0,0 +1,243 @@
+"""
+Selector Registry Module for MCA Automation
+Resolves the portal selectors in SELECTORS by key ('din.input',
+'annual.captcha_error'...) instead of `.or_()` chains built inline, records
+which alternative matched and how long resolution took, and tries the
+historically winning alternative first:
+
+    search_input = find(page, 'annual.search_input')
+    error_text = locator(page, 'annual.captcha_error')
+    company_link = find(page, 'annual.company_link', cin=cin)
+
+A fallback alternative matching (the primary no longer does) is logged
+once per key, so a portal redesign shows up on the first lookup after it.
+Stats are viewable with `python -m mca_utils selector-stats`.
+"""
+
+import json
+import os
+import threading
+import time
+from .config import SELECTORS, SELECTOR_CONFIG
+from . import metrics
+from .log import get_logger
+
+logger = get_logger('locators')
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+class SelectorRegistry:
+    """
+    Per-key alternatives, hit counts and resolution times.
+    """
+
+    def __init__(self, selectors=None, stats_path=None):
+        self.selectors = selectors if selectors is not None else SELECTORS
+        self.stats_path = stats_path if stats_path is not None else SELECTOR_CONFIG['stats_path']
+        self._lock = threading.Lock()
+        self._saved = self._load()   # Stats as of the last load/save
+        self._delta = {}             # Stats since then, merged in on save
+        self._warned = set()
+        self._unsaved = 0
+
+    def _load(self):
+        if not self.stats_path or not os.path.exists(self.stats_path):
+            return {}
+        try:
+            with open(self.stats_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read selector stats {self.stats_path}: {e}")
+            return {}
+
+    def alternatives(self, key):
+        page, _, purpose = key.partition('.')
+        return self.selectors[page][purpose]
+
+    def _entry(self, stats, key, create=False):
+        entry = stats.get(key)
+        if entry is None and create:
+            entry = stats[key] = {'hits': {}, 'misses': 0, 'seconds': 0.0}
+        return entry
+
+    def _hits(self, key, selector):
+        total = 0
+        for stats in (self._saved, self._delta):
+            entry = self._entry(stats, key)
+            if entry:
+                total += entry['hits'].get(selector, 0)
+        return total
+
+    def order(self, key):
+        """
+        Returns:
+            Alternatives for key, historically most successful first
+            (declaration order breaks ties, so the primary leads until it stops matching)
+        """
+        alternatives = self.alternatives(key)
+        if not SELECTOR_CONFIG['adaptive']:
+            return list(alternatives)
+        with self._lock:
+            return sorted(alternatives, key=lambda s: -self._hits(key, s))
+
+    def record(self, key, selector, seconds):
+        """
+        Record a resolution of key; selector is the alternative that matched (None on a miss).
+        """
+        with self._lock:
+            entry = self._entry(self._delta, key, create=True)
+            entry['seconds'] += seconds
+            if selector is None:
+                entry['misses'] += 1
+            else:
+                entry['hits'][selector] = entry['hits'].get(selector, 0) + 1
+            self._unsaved += 1
+            save = self.stats_path and self._unsaved >= SELECTOR_CONFIG['save_every']
+        metrics.inc('mca_selector_resolutions_total', key=key, outcome='miss' if selector is None else 'hit')
+        metrics.observe('mca_selector_resolve_seconds', seconds, key=key)
+
+        alternatives = self.alternatives(key)
+        if selector is not None and selector != alternatives[0] and key not in self._warned:
+            self._warned.add(key)
+            logger.warning(f"Selector '{key}' matched fallback #{alternatives.index(selector)} ({selector!r}); "
+                           f"the primary {alternatives[0]!r} may be broken.")
+        if save:
+            self.save()
+
+    def locator(self, frame, key, **fields):
+        """
+        A locator matching any alternative for key (without telemetry; for
+        polling checks such as CAPTCHA error text).
+        """
+        union = None
+        for selector in self.order(key):
+            candidate = frame.locator(selector.format(**fields))
+            union = candidate if union is None else union.or_(candidate)
+        return union
+
+    def find(self, frame, key, timeout=5000, **fields):
+        """
+        Wait for key to match a visible element.
+
+        The usual winner is checked first without waiting; otherwise all
+        alternatives are awaited together and the one that matched is
+        identified afterwards.
+
+        Args:
+            frame: Playwright page, frame or locator to search in
+            key: 'page.purpose' key in SELECTORS
+            timeout: Maximum wait in milliseconds
+            **fields: Values for placeholders in the selectors
+
+        Returns:
+            Locator for the first matching element, or None
+        """
+        start = time.perf_counter()
+        ordered = self.order(key)
+        candidates = [(selector, frame.locator(selector.format(**fields)).first) for selector in ordered]
+
+        try:
+            # Fast path: the historically winning alternative is usually there already
+            selector, candidate = candidates[0]
+            if candidate.count() > 0 and candidate.is_visible():
+                self.record(key, selector, time.perf_counter() - start)
+                return candidate
+
+            union = self.locator(frame, key, **fields).first
+            union.wait_for(state="visible", timeout=timeout)
+            for selector, candidate in candidates:
+                if candidate.count() > 0 and candidate.is_visible():
+                    self.record(key, selector, time.perf_counter() - start)
+                    return candidate
+        except Exception as e:
+            logger.debug("Selector '%s' did not resolve: %s", key, e)
+        self.record(key, None, time.perf_counter() - start)
+        return None
+
+    def stats(self):
+        """
+        Returns:
+            Dict of key -> {'hits': {selector: n}, 'misses': n, 'seconds': total}
+            covering saved and unsaved resolutions
+        """
+        with self._lock:
+            merged = json.loads(json.dumps(self._saved))
+            for key, entry in self._delta.items():
+                target = self._entry(merged, key, create=True)
+                for selector, count in entry['hits'].items():
+                    target['hits'][selector] = target['hits'].get(selector, 0) + count
+                target['misses'] += entry['misses']
+                target['seconds'] += entry['seconds']
+        return merged
+
+    def save(self):
+        """Merge this process's counts into the stats file (other processes may share it)."""
+        if not self.stats_path:
+            return
+        with self._lock:
+            delta, self._delta, self._unsaved = self._delta, {}, 0
+        # Re-read so concurrent workers' counts are added to, not overwritten
+        current = self._load()
+        for key, entry in delta.items():
+            target = self._entry(current, key, create=True)
+            for selector, count in entry['hits'].items():
+                target['hits'][selector] = target['hits'].get(selector, 0) + count
+            target['misses'] += entry['misses']
+            target['seconds'] = round(target['seconds'] + entry['seconds'], 3)
+        directory = os.path.dirname(self.stats_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.stats_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.stats_path)
+        except OSError as e:
+            logger.warning(f"Could not write selector stats: {e}")
+            return
+        with self._lock:
+            self._saved = current
+
+
+def get_registry():
+    """Process-wide selector registry (stats are saved again at exit)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                import atexit
+                _registry = SelectorRegistry()
+                atexit.register(_registry.save)
+    return _registry
+
+
+def find(frame, key, timeout=5000, **fields):
+    """Shortcut for get_registry().find()."""
+    return get_registry().find(frame, key, timeout, **fields)
+
+
+def locator(frame, key, **fields):
+    """Shortcut for get_registry().locator()."""
+    return get_registry().locator(frame, key, **fields)
+
+
+def print_stats():
+    """Print per-key hit counts and mean resolution time."""
+    stats = get_registry().stats()
+    if not stats:
+        print("No selector stats recorded yet.")
+        return
+    print(f"{'key':<28}{'resolved':>9}{'misses':>8}{'mean ms':>9}  hits (primary first)")
+    for key in sorted(stats):
+        entry = stats[key]
+        resolved = sum(entry['hits'].values())
+        calls = resolved + entry['misses']
+        mean_ms = entry['seconds'] / calls * 1000 if calls else 0.0
+        try:
+            declared = get_registry().alternatives(key)
+        except KeyError:
+            declared = []
+        hits = ', '.join(f"{s}={entry['hits'].get(s, 0)}" for s in declared) or json.dumps(entry['hits'])
+        print(f"{key:<28}{resolved:>9}{entry['misses']:>8}{mean_ms:>9.1f}  {hits}")
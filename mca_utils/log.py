@@ -0,0 +1,140 @@
+"""
+Logging Module for MCA Automation
+Structured, non-blocking logging for the flows: records are queued by the
+calling thread and formatted/written by a single listener thread, tagged
+with the current flow, entity (DIN/CIN) and stage
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from .config import LOGGING_CONFIG
+from .tracing import current_entity, current_stage
+
+
+ROOT_LOGGER = 'mca'
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class ContextFilter(logging.Filter):
+    """
+    Attach flow, entity and stage from the tracing context to each record.
+    Runs in the calling thread, before the record is queued.
+    """
+
+    def filter(self, record):
+        context = current_entity()
+        record.flow, record.entity = context if context else (None, None)
+        record.stage = current_stage()
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        message = record.getMessage()
+        if record.exc_info:
+            message += '\n' + self.formatException(record.exc_info)
+        prefix = f"[{record.entity}] " if record.entity else ''
+        if record.levelno >= logging.WARNING:
+            prefix += f"{record.levelname}: "
+        return prefix + message
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+            'pid': record.process
+        }
+        for field in ('flow', 'entity', 'stage'):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Hand the record over unformatted; the listener thread formats it
+        return record
+
+
+def setup_logging(level=None, json_output=None, path=None):
+    """
+    Route the 'mca' loggers through a QueueHandler to a QueueListener.
+
+    Safe to call again (e.g. from the CLI) to change the level or output.
+
+    Args:
+        level: Level name or number (default LOGGING_CONFIG['level'])
+        json_output: Emit JSON lines (default LOGGING_CONFIG['json'])
+        path: Optional log file, written as UTF-8 (default LOGGING_CONFIG['path'])
+    """
+    global _listener
+    level = level or LOGGING_CONFIG['level']
+    json_output = LOGGING_CONFIG['json'] if json_output is None else json_output
+    path = path or LOGGING_CONFIG['path']
+
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+        formatter = JsonFormatter() if json_output else TextFormatter()
+        stream = sys.stdout
+        if hasattr(stream, 'reconfigure'):
+            # Avoid console-codepage/UTF-16 surprises when output is redirected
+            stream.reconfigure(encoding='utf-8', errors='replace')
+        handlers = [logging.StreamHandler(stream)]
+        if path:
+            handlers.append(logging.FileHandler(path, encoding='utf-8'))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        records = queue.SimpleQueue()
+        queue_handler = _DeferredQueueHandler(records)
+        queue_handler.addFilter(ContextFilter())
+
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.handlers[:] = [queue_handler]
+        logger.setLevel(level.upper() if isinstance(level, str) else level)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name):
+    """
+    Return a logger under 'mca', configuring logging on first use.
+
+    Args:
+        name: Module or flow name, e.g. 'verify_din'
+    """
+    if _listener is None:
+        setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -0,0 +1,238 @@
+"""
+Metrics Module for MCA Automation
+In-process counters, gauges and histograms served in Prometheus text format
+on a local port, for watching long-running batch and worker processes
+
+    python -m mca_utils annual-filing cins.xlsx --metrics-port 9108
+    curl localhost:9108/metrics
+
+Every update is a single flag check while metrics are disabled, so the
+calls stay in the production code paths.
+"""
+
+import os
+import threading
+import time
+from .config import METRICS_CONFIG
+from .log import get_logger
+
+logger = get_logger('metrics')
+
+
+_enabled = METRICS_CONFIG['enabled']
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> value
+_gauges = {}       # (name, labels) -> value
+_histograms = {}   # (name, labels) -> [bucket counts..., sum, count]
+_help = {
+    'mca_lookups_total': ('counter', 'Finished lookups by flow and outcome'),
+    'mca_lookup_seconds': ('histogram', 'Wall time of one lookup'),
+    'mca_captcha_in_flight': ('gauge', 'CAPTCHAs waiting for or being solved by 2Captcha'),
+    'mca_captcha_solves_total': ('counter', '2Captcha solve attempts by outcome'),
+    'mca_captcha_solve_seconds': ('histogram', 'Time for one 2Captcha solve call'),
+    'mca_browser_pages_open': ('gauge', 'Browser pages currently open'),
+    'mca_browser_rss_bytes': ('gauge', 'RSS of a warm browser process tree (driver and browser)'),
+    'mca_browser_recycles_total': ('counter', 'Warm browsers closed for recycling by reason'),
+    'mca_challan_download_bytes_total': ('counter', 'Challan PDF bytes downloaded'),
+    'mca_challan_parsed_total': ('counter', 'Challan PDFs parsed by outcome'),
+    'mca_challan_parse_seconds': ('histogram', 'Time to parse one Challan PDF'),
+    'mca_selector_resolutions_total': ('counter', 'Selector registry resolutions by key and outcome'),
+    'mca_selector_resolve_seconds': ('histogram', 'Time to resolve one registry selector'),
+    'mca_process_rss_bytes': ('gauge', 'Resident set size of this process'),
+}
+
+
+def enabled():
+    return _enabled
+
+
+def enable(flag=True):
+    """Turn metric collection on or off for this process."""
+    global _enabled
+    _enabled = flag
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items())) if labels else ()
+
+
+def inc(name, value=1, **labels):
+    """Add to a counter."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def gauge_add(name, value, **labels):
+    """Move a gauge up or down."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + value
+
+
+def gauge_set(name, value, **labels):
+    if not _enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    """Record one histogram sample (seconds)."""
+    if not _enabled:
+        return
+    buckets = METRICS_CONFIG['buckets']
+    key = _key(name, labels)
+    with _lock:
+        state = _histograms.get(key)
+        if state is None:
+            state = _histograms[key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                state[i] += 1
+        state[-2] += value
+        state[-1] += 1
+
+
+class timer:
+    """
+    Context manager observing a block's duration into a histogram.
+    """
+
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        if _enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.start is not None:
+            observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class in_flight:
+    """
+    Context manager holding a gauge up by one for the duration of a block.
+    """
+
+    __slots__ = ('name', 'labels', 'counted')
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.counted = False
+
+    def __enter__(self):
+        if _enabled:
+            self.counted = True
+            gauge_add(self.name, 1, **self.labels)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.counted:
+            gauge_add(self.name, -1, **self.labels)
+        return False
+
+
+def _rss_bytes():
+    """Current RSS from /proc on Linux, else peak RSS from getrusage."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, kilobytes elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (extra or [])
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+def render():
+    """
+    Return all metrics in the Prometheus text exposition format.
+    """
+    rss = _rss_bytes()
+    if rss is not None:
+        gauge_set('mca_process_rss_bytes', rss)
+
+    with _lock:
+        series = {}
+        for (name, labels), value in _counters.items():
+            series.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in _gauges.items():
+            series.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), state in _histograms.items():
+            lines = series.setdefault(name, [])
+            # Bucket counts are kept cumulative by observe()
+            for bound, count in zip(METRICS_CONFIG['buckets'], state):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {state[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {state[-2]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {state[-1]}")
+
+    out = []
+    for name in sorted(series):
+        kind, text = _help.get(name, ('untyped', name))
+        out.append(f"# HELP {name} {text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(series[name])
+    return '\n'.join(out) + '\n'
+
+
+def start_server(port=None, host=None):
+    """
+    Enable metrics and serve /metrics from a daemon thread.
+
+    Args:
+        port: TCP port (default METRICS_CONFIG['port'])
+        host: Bind address (default METRICS_CONFIG['host'])
+
+    Returns:
+        The running HTTPServer
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    enable()
+    port = METRICS_CONFIG['port'] if port is None else port
+    server = ThreadingHTTPServer((host or METRICS_CONFIG['host'], port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Metrics on http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,174 @@
+"""
+Director Audit Pipeline Module for MCA Automation
+Resolves each DIN to the companies the director is associated with and fans
+the CINs out to concurrent annual filing lookups, as one pipelined job:
+
+    python -m mca_utils audit dins.csv --workers 3 --headless --output audit.jsonl
+
+A DIN's companies are queued for checking as soon as that DIN resolves, a
+company shared by several directors in the batch is checked once, and each
+DIN's report is emitted as soon as all of its companies are done.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .config import AUDIT_CONFIG
+from .log import get_logger
+
+logger = get_logger('pipeline')
+
+
+class DirectorAudit:
+    """
+    DIN -> companies -> annual filing fan-out with per-company deduplication.
+
+    Args:
+        resolve: Callable(din) returning a list of {'CIN', 'Company Name'}
+            dicts, or None if the director could not be looked up
+        check: Callable(cin) returning annual filing rows, or None on failure
+        resolve_workers: Concurrent resolve calls (default AUDIT_CONFIG)
+        check_workers: Concurrent check calls (default AUDIT_CONFIG)
+    """
+
+    def __init__(self, resolve, check, resolve_workers=None, check_workers=None):
+        self.resolve = resolve
+        self.check = check
+        self.resolve_workers = max(1, resolve_workers or AUDIT_CONFIG['resolve_workers'])
+        self.check_workers = max(1, check_workers or AUDIT_CONFIG['check_workers'])
+        self.stats = {'dins': 0, 'links': 0, 'companies': 0}
+        self._lock = threading.Lock()
+
+    def run(self, dins):
+        """
+        Audit DINs, yielding one report per DIN in completion order.
+
+        Args:
+            dins: DINs to audit (duplicates are dropped)
+
+        Yields:
+            Dict with 'DIN', 'error' (None if resolved) and 'companies', a list
+            of {'CIN', 'Company Name', 'filings', 'error'} dicts
+        """
+        dins = list(dict.fromkeys(dins))
+        self.stats = {'dins': len(dins), 'links': 0, 'companies': 0}
+        reports = queue.Queue()
+        companies = {}     # DIN -> resolved company dicts
+        waiting = {}       # DIN -> CINs not checked yet
+        subscribers = {}   # CIN -> DINs waiting for it
+        checked = {}       # CIN -> (rows, error)
+        checks = {}        # CIN -> Future, one per company in the whole batch
+
+        def report(din):
+            reports.put({
+                'DIN': din,
+                'error': None,
+                'companies': [dict(company, filings=checked[company['CIN']][0], error=checked[company['CIN']][1])
+                              for company in companies.get(din, [])]
+            })
+
+        def on_checked(cin, future):
+            try:
+                rows, error = future.result(), None
+            except Exception as e:
+                rows, error = None, repr(e)
+            if rows is None and error is None:
+                error = 'no result'
+            with self._lock:
+                checked[cin] = (rows, error)
+                ready = []
+                for din in subscribers.pop(cin, []):
+                    waiting[din].discard(cin)
+                    if not waiting[din]:
+                        ready.append(din)
+                for din in ready:
+                    report(din)
+
+        def on_resolved(din, future):
+            try:
+                found, error = future.result(), None
+                found = None if found is None else list({c['CIN']: c for c in found}.values())
+            except Exception as e:
+                found, error = None, repr(e)
+            if found is None:
+                reports.put({'DIN': din, 'error': error or 'could not resolve companies', 'companies': []})
+                return
+            submitted = []
+            with self._lock:
+                companies[din] = found
+                waiting[din] = set()
+                for company in companies[din]:
+                    cin = company['CIN']
+                    self.stats['links'] += 1
+                    if cin in checked:
+                        continue
+                    waiting[din].add(cin)
+                    subscribers.setdefault(cin, []).append(din)
+                    if cin not in checks:
+                        self.stats['companies'] += 1
+                        checks[cin] = checkers.submit(self.check, cin)
+                        submitted.append(cin)
+                if not waiting[din]:
+                    report(din)
+            logger.info(f"{din}: {len(companies[din])} company(ies), {len(submitted)} new to check")
+            # Outside the lock: a callback on a finished future runs right away
+            for cin in submitted:
+                checks[cin].add_done_callback(lambda f, cin=cin: on_checked(cin, f))
+
+        with ThreadPoolExecutor(self.check_workers, thread_name_prefix='audit-check') as checkers, \
+                ThreadPoolExecutor(self.resolve_workers, thread_name_prefix='audit-resolve') as resolvers:
+            for din in dins:
+                resolvers.submit(self.resolve, din).add_done_callback(lambda f, din=din: on_resolved(din, f))
+            for _ in dins:
+                yield reports.get()
+
+
+def run_audit(dins, force_refresh=False, resolve_workers=None, check_workers=None, rate=None, on_report=None):
+    """
+    Audit the annual filings of every company associated with each DIN.
+
+    Args:
+        dins: List of DINs
+        force_refresh: Bypass the lookup cache
+        resolve_workers: Concurrent director lookups (default AUDIT_CONFIG)
+        check_workers: Concurrent annual filing lookups (default AUDIT_CONFIG)
+        rate: Max portal page loads per second (None keeps RATE_LIMITS)
+        on_report: Optional callback(report) per DIN as it completes
+
+    Returns:
+        Tuple of (flat result rows, list of DINs with a failed lookup)
+    """
+    from .cli import lookup_rows
+    from .scheduler import get_scheduler
+
+    if rate:
+        get_scheduler().configure('page_load', rate)
+    audit = DirectorAudit(
+        lambda din: lookup_rows('director-companies', din, force_refresh),
+        lambda cin: lookup_rows('annual-filing', cin, force_refresh),
+        resolve_workers, check_workers
+    )
+    results = []
+    failed = []
+    start = time.time()
+    dins = list(dict.fromkeys(dins))
+    for done, report in enumerate(audit.run(dins), 1):
+        din = report['DIN']
+        bad = [c['CIN'] for c in report['companies'] if c['error']]
+        if report['error'] or bad:
+            failed.append(din)
+        for company in report['companies']:
+            base = {'DIN': din, 'CIN': company['CIN'], 'Company Name': company['Company Name']}
+            if company['filings']:
+                results.extend(dict(base, **{k: v for k, v in row.items() if k != 'CIN'}) for row in company['filings'])
+            else:
+                results.append(dict(base, Error=company['error']))
+        status = f"FAIL  {report['error']}" if report['error'] else \
+            f"OK    {len(report['companies'])} company(ies)" + (f", {len(bad)} failed" if bad else "")
+        logger.info(f"[{done}/{len(dins)}] {din}: {status} ({time.time() - start:.0f}s elapsed)")
+        if on_report:
+            on_report(report)
+    logger.info(f"Audit: {audit.stats['links']} director-company link(s), "
+                f"{audit.stats['companies']} distinct company(ies) checked")
+    return results, failed
@@ -0,0 +1,185 @@
+"""
+Profiling Module for MCA Automation
+Profiles every Nth lookup (or a whole script run) with pyinstrument when it
+is installed, else cProfile, and writes a per-run profile plus a
+collapsed-stack file for flamegraph.pl / speedscope:
+
+    python -m mca_utils annual-filing cins.xlsx --profile --profile-every 50
+    flamegraph.pl profiles/annual_filing_U45400..._20261019-101500.collapsed > flame.svg
+"""
+
+import itertools
+import os
+import re
+import threading
+import time
+from .config import PROFILE_CONFIG
+from .tracing import current_entity
+from .log import get_logger
+
+logger = get_logger('profiling')
+
+_counter = itertools.count()
+# One profile at a time: cProfile and pyinstrument hooks are not
+# meant to be stacked, and concurrent entities would blur each other
+_active = threading.Lock()
+
+
+def enable_profiling(every=None, engine=None):
+    """
+    Turn profiling on for this process.
+
+    Args:
+        every: Profile every Nth entity (default PROFILE_CONFIG['every'])
+        engine: 'auto', 'cprofile' or 'pyinstrument'
+    """
+    PROFILE_CONFIG['enabled'] = True
+    if every:
+        PROFILE_CONFIG['every'] = every
+    if engine:
+        PROFILE_CONFIG['engine'] = engine
+
+
+def _engine():
+    engine = PROFILE_CONFIG['engine']
+    if engine in ('auto', 'pyinstrument'):
+        try:
+            import pyinstrument  # noqa: F401
+            return 'pyinstrument'
+        except ImportError:
+            if engine == 'pyinstrument':
+                logger.warning("pyinstrument is not installed; falling back to cProfile.")
+    return 'cprofile'
+
+
+def _output_base(name):
+    context = current_entity()
+    label = f"{context[0]}_{context[1]}" if context else name
+    directory = PROFILE_CONFIG['dir']
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    return os.path.join(directory, re.sub(r'[^\w.-]', '_', f"{label}_{time.strftime('%Y%m%d-%H%M%S')}"))
+
+
+def _frame_label(filename, lineno, funcname):
+    return f"{funcname} ({os.path.basename(filename)}:{lineno})".replace(';', ':')
+
+
+def collapse_pstats(stats):
+    """
+    Approximate collapsed stacks from a cProfile call graph.
+
+    cProfile keeps caller->callee edges rather than full stacks, so each
+    function's own time is spread over its callers in proportion to the
+    time spent under each edge (the approach taken by flameprof).
+
+    Args:
+        stats: pstats.Stats instance
+
+    Returns:
+        Dict of 'root;caller;func' -> microseconds
+    """
+    raw = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = {}
+
+    def walk(func, path, share, seen):
+        own = raw[func][2]
+        label = _frame_label(*func)
+        stack = f"{path};{label}" if path else label
+        weight = int(own * share * 1e6)
+        if weight:
+            stacks[stack] = stacks.get(stack, 0) + weight
+        for callee, edge_time in callees.get(func, ()):
+            if callee in seen or callee not in raw or not raw[callee][3]:
+                continue
+            callee_share = share * min(1.0, edge_time / raw[callee][3])
+            # Prune negligible paths; the call graph can have very many
+            if callee_share * raw[callee][3] >= 1e-5:
+                walk(callee, stack, callee_share, seen | {callee})
+
+    for func, (_, _, _, _, callers) in raw.items():
+        if not callers:
+            walk(func, '', 1.0, {func})
+    return stacks
+
+
+def _collapse_pyinstrument(frame, path='', stacks=None):
+    stacks = {} if stacks is None else stacks
+    label = f"{frame.function} ({os.path.basename(frame.file_path or '?')}:{frame.line_no})".replace(';', ':')
+    stack = f"{path};{label}" if path else label
+    weight = int(frame.total_self_time * 1e6)
+    if weight:
+        stacks[stack] = stacks.get(stack, 0) + weight
+    for child in frame.children:
+        _collapse_pyinstrument(child, stack, stacks)
+    return stacks
+
+
+def _write_collapsed(stacks, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, weight in sorted(stacks.items()):
+            f.write(f"{stack} {weight}\n")
+
+
+class profiled:
+    """
+    Context manager profiling the enclosed block when profiling is on and
+    this is a sampled entity. Nearly free otherwise.
+    """
+
+    def __init__(self, name='run'):
+        self.name = name
+        self.profiler = None
+        self.engine = None
+
+    def __enter__(self):
+        if not PROFILE_CONFIG['enabled']:
+            return self
+        if next(_counter) % max(1, PROFILE_CONFIG['every']):
+            return self
+        if not _active.acquire(blocking=False):
+            return self
+        self.engine = _engine()
+        try:
+            if self.engine == 'pyinstrument':
+                from pyinstrument import Profiler
+                self.profiler = Profiler()
+                self.profiler.start()
+            else:
+                import cProfile
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+        except Exception as e:
+            logger.warning(f"Could not start profiler: {e}")
+            self.profiler = None
+            _active.release()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler is None:
+            return False
+        try:
+            base = _output_base(self.name)
+            if self.engine == 'pyinstrument':
+                session = self.profiler.stop()
+                with open(base + '.html', 'w', encoding='utf-8') as f:
+                    f.write(self.profiler.output_html())
+                _write_collapsed(_collapse_pyinstrument(session.root_frame()), base + '.collapsed')
+                logger.info(f"Profile written to {base}.html / .collapsed")
+            else:
+                import pstats
+                self.profiler.disable()
+                self.profiler.dump_stats(base + '.prof')
+                _write_collapsed(collapse_pstats(pstats.Stats(self.profiler)), base + '.collapsed')
+                logger.info(f"Profile written to {base}.prof / .collapsed")
+        except Exception as e:
+            logger.warning(f"Could not write profile: {e}")
+        finally:
+            self.profiler = None
+            _active.release()
+        return False
@@ -0,0 +1,157 @@
+"""
+Filing Record Module for MCA Automation
+Compact typed rows for filing history and payment details. A FilingRecord
+has __slots__ instead of a per-row dict, interned form names and CINs, and
+parsed dates/amounts shared between rows with the same raw value, so large
+batches hold far less than the equivalent row dicts. The cache, journal,
+job queue and daemon keep exchanging plain dicts (to_dict / from_dict):
+
+    record = FilingRecord.from_dict(row, cin=cin)
+    record.set_payment(parse_challan_pdf(pdf_path))
+    df = records_frame(records)
+
+Footprint against plain dicts: `python benchmark_records.py`.
+"""
+
+import sys
+from functools import lru_cache
+from .export import parse_amount, parse_date
+
+MISSING = "N/A"
+
+# Row dict key -> attribute, in output column order
+FIELDS = (
+    ('SRN', 'srn'),
+    ('Form Name', 'form_name'),
+    ('Event Date', 'event_date'),
+    ('PDF Path', 'pdf_path'),
+    ('Date of Filing', 'filing_date'),
+    ('Amount Paid', 'amount_paid'),
+    ('Late Fee', 'late_fee')
+)
+PAYMENT_FIELDS = FIELDS[4:]
+
+
+# Rows repeat the same dates and fees, so equal raw values share one object
+@lru_cache(maxsize=8192)
+def _date(text):
+    return parse_date(text)
+
+
+@lru_cache(maxsize=8192)
+def _amount(text):
+    return parse_amount(text)
+
+
+def _typed(parse, value):
+    if value is None or not isinstance(value, str):
+        return value
+    return parse(value.strip())
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return None if value.upper() in ('', MISSING) else value
+
+
+class FilingRecord:
+    """
+    One filing history row with its challan payment details.
+
+    Args:
+        srn: Service request number
+        form_name: Form name (interned)
+        event_date: datetime.date or a dd/mm/yyyy string
+        pdf_path: Downloaded challan PDF, None if there is none
+        cin: Company the row belongs to (interned), if known
+        filing_date: datetime.date or a string containing dd/mm/yyyy
+        amount_paid: Decimal or an amount string such as "1,200.00"
+        late_fee: Decimal or an amount string
+    """
+
+    __slots__ = ('cin', 'srn', 'form_name', 'event_date', 'pdf_path', 'filing_date', 'amount_paid', 'late_fee')
+
+    def __init__(self, srn, form_name, event_date=None, pdf_path=None, cin=None,
+                 filing_date=None, amount_paid=None, late_fee=None):
+        self.cin = sys.intern(cin) if cin else None
+        self.srn = srn
+        self.form_name = sys.intern(form_name) if form_name else None
+        self.event_date = _typed(_date, event_date)
+        self.pdf_path = _text(pdf_path)
+        self.filing_date = _typed(_date, filing_date)
+        self.amount_paid = _typed(_amount, amount_paid)
+        self.late_fee = _typed(_amount, late_fee)
+
+    @classmethod
+    def from_dict(cls, row, cin=None):
+        """
+        Build a record from a scraped/cached row dict ("N/A" means missing).
+
+        Args:
+            row: Dict with the FIELDS keys (and optionally 'CIN')
+            cin: CIN to use when the row has none
+        """
+        return cls(
+            _text(row.get('SRN')), _text(row.get('Form Name')), row.get('Event Date'), row.get('PDF Path'),
+            cin=row.get('CIN') or cin, filing_date=row.get('Date of Filing'),
+            amount_paid=row.get('Amount Paid'), late_fee=row.get('Late Fee')
+        )
+
+    def set_payment(self, details):
+        """Apply challan payment details (a parse_challan_text dict)."""
+        self.filing_date = _typed(_date, details.get('Date of Filing'))
+        self.amount_paid = _typed(_amount, details.get('Amount Paid'))
+        self.late_fee = _typed(_amount, details.get('Late Fee'))
+
+    def clear_payment(self):
+        self.filing_date = self.amount_paid = self.late_fee = None
+
+    def to_dict(self):
+        """
+        Returns:
+            The row as the JSON-safe string dict the flows used to pass
+            around (dd/mm/yyyy dates, "N/A" for missing values)
+        """
+        row = {'CIN': self.cin} if self.cin else {}
+        for key, attr in FIELDS:
+            value = getattr(self, attr)
+            if value is None:
+                row[key] = MISSING
+            elif attr in ('event_date', 'filing_date'):
+                row[key] = value.strftime('%d/%m/%Y')
+            else:
+                row[key] = str(value)
+        return row
+
+    def __repr__(self):
+        return f"FilingRecord({self.srn!r}, {self.form_name!r}, {self.event_date!r})"
+
+
+def compact_rows(rows, cin=None):
+    """
+    Convert filing row dicts to FilingRecords; other rows (DIN results) are returned as they are.
+    """
+    if not rows or not isinstance(rows[0], dict) or 'SRN' not in rows[0]:
+        return rows
+    return [FilingRecord.from_dict(row, cin) for row in rows]
+
+
+def records_frame(records):
+    """
+    Build a typed DataFrame column by column, without intermediate row dicts.
+
+    Returns:
+        pandas DataFrame with Decimal amounts, datetime.date dates (None
+        where missing) and a categorical Form Name
+    """
+    import pandas as pd
+
+    columns = {}
+    if any(record.cin for record in records):
+        columns['CIN'] = [record.cin for record in records]
+    for key, attr in FIELDS:
+        columns[key] = [getattr(record, attr) for record in records]
+    columns['Form Name'] = pd.Categorical(columns['Form Name'])
+    return pd.DataFrame(columns)
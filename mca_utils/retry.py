@@ -0,0 +1,189 @@
+"""
+Retry Policy Module for MCA Automation
+Classifies failures, backs off exponentially with jitter per failure class,
+and trips circuit breakers that pause every worker while the portal or
+2Captcha is failing broadly
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from .config import RETRY_POLICY, CIRCUIT_BREAKER_CONFIG
+from .log import get_logger
+
+logger = get_logger('retry')
+
+
+# Failure classes
+SOLVER_ERROR = 'solver_error'        # 2Captcha API/network error or no code returned
+WRONG_CAPTCHA = 'wrong_captcha'      # Portal rejected the solved text
+PORTAL_TIMEOUT = 'portal_timeout'    # Navigation/locator wait timed out
+MISSING_ELEMENT = 'missing_element'  # Expected element not on the page
+
+
+def classify_error(error, default=MISSING_ELEMENT):
+    """
+    Map an exception to a failure class.
+
+    Args:
+        error: Exception raised by Playwright, 2Captcha or our own code
+        default: Class to use when nothing more specific matches
+
+    Returns:
+        One of the failure class constants
+    """
+    name = type(error).__name__
+    module = type(error).__module__ or ''
+    if 'Timeout' in name or 'Timeout' in str(error):
+        return PORTAL_TIMEOUT
+    if module.startswith('twocaptcha') or name in ('ApiException', 'NetworkException', 'ValidationException'):
+        return SOLVER_ERROR
+    return default
+
+
+class RetryPolicy:
+    """
+    Per-failure-class attempt limits and exponential backoff with full jitter.
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy if policy is not None else RETRY_POLICY
+
+    def _spec(self, failure):
+        return self.policy.get(failure, self.policy['default'])
+
+    def max_attempts(self, failure):
+        return self._spec(failure)['max_attempts']
+
+    def should_retry(self, failure, attempt):
+        """
+        Args:
+            failure: Failure class
+            attempt: Zero-based index of the attempt that just failed
+
+        Returns:
+            True if another attempt is allowed
+        """
+        return attempt + 1 < self.max_attempts(failure)
+
+    def delay(self, failure, attempt):
+        """
+        Backoff before the next attempt: uniform in [0, min(max_delay, base * 2^attempt)].
+        """
+        spec = self._spec(failure)
+        ceiling = min(spec['max_delay'], spec['base_delay'] * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def sleep(self, failure, attempt):
+        """
+        Sleep for the backoff delay and return how long was slept.
+        """
+        seconds = self.delay(failure, attempt)
+        if seconds > 0:
+            time.sleep(seconds)
+        return seconds
+
+
+class CircuitBreaker:
+    """
+    Process-wide circuit breaker for an external dependency.
+
+    Closed: calls proceed. When the failure ratio over the recent window
+    crosses the threshold the breaker opens and wait() blocks every caller
+    for the cooldown. Afterwards it is half-open: one caller probes, and
+    its outcome closes the breaker or reopens it.
+    """
+
+    def __init__(self, name, window=None, min_calls=None, failure_threshold=None, cooldown=None):
+        cfg = CIRCUIT_BREAKER_CONFIG
+        self.name = name
+        self.min_calls = min_calls or cfg['min_calls']
+        self.failure_threshold = failure_threshold or cfg['failure_threshold']
+        self.cooldown = cooldown or cfg['cooldown']
+        self._outcomes = deque(maxlen=window or cfg['window'])
+        self._opened_at = None
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return 'open'
+            return 'half-open'
+
+    def wait(self):
+        """
+        Block while the breaker is open; in half-open state let a single
+        probe through and hold the others until it reports.
+        """
+        announced = False
+        while True:
+            with self._lock:
+                if self._opened_at is None:
+                    return
+                now = time.monotonic()
+                remaining = self.cooldown - (now - self._opened_at)
+                # A probe that never reported back is replaced after a cooldown
+                probe_stale = now - self._probe_started > self.cooldown
+                if remaining <= 0 and (not self._probing or probe_stale):
+                    self._probing = True
+                    self._probe_started = now
+                    return
+            if not announced:
+                logger.warning(f"Circuit '{self.name}' open, pausing for up to {max(remaining, 0):.0f}s...")
+                announced = True
+            time.sleep(max(1.0, min(remaining, 5.0)))
+
+    def record_success(self):
+        with self._lock:
+            self._outcomes.append(True)
+            if self._opened_at is not None:
+                logger.info(f"Circuit '{self.name}' closed.")
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append(False)
+            if self._probing:
+                # Probe failed: reopen for another cooldown
+                self._opened_at = time.monotonic()
+                self._probing = False
+                return
+            if self._opened_at is not None or len(self._outcomes) < self.min_calls:
+                return
+            ratio = self._outcomes.count(False) / len(self._outcomes)
+            if ratio >= self.failure_threshold:
+                logger.warning(f"Circuit '{self.name}' tripped ({ratio:.0%} failures), pausing all workers.")
+                self._opened_at = time.monotonic()
+                self._outcomes.clear()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_policy = None
+
+
+def get_breaker(name):
+    """
+    Return the process-wide breaker for a dependency ('portal', 'captcha_service').
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def get_retry_policy():
+    """
+    Return the process-wide RetryPolicy built from RETRY_POLICY.
+    """
+    global _policy
+    if _policy is None:
+        _policy = RetryPolicy()
+    return _policy
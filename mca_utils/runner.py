@@ -0,0 +1,174 @@
+"""
+Sharded Runner Module for MCA Automation
+Splits a batch of DINs/CINs across worker processes, each with its own
+browser sessions, and aggregates results, progress and failures in the parent
+"""
+
+import multiprocessing
+import os
+import queue
+import zlib
+from .config import RATE_LIMITS, BROWSER_CONFIG
+from .records import compact_rows
+from .scheduler import get_scheduler, shared_buckets
+from .log import get_logger, setup_logging
+
+logger = get_logger('runner')
+
+
+def shard_of(identifier, processes):
+    """
+    Stable shard index for an identifier, so reruns (and per-shard
+    journals) map each identifier to the same process.
+    """
+    return zlib.crc32(identifier.encode('utf-8')) % processes
+
+
+def _shard_worker(index, command, identifiers, options, buckets, events):
+    """Process entry point: run one shard and stream outcomes to the parent."""
+    from .cli import run_batch
+
+    if options['log_options']:
+        setup_logging(*options['log_options'])
+    if options['profile_every']:
+        from .profiling import enable_profiling
+        enable_profiling(options['profile_every'])
+    scheduler = get_scheduler()
+    for kind, bucket in buckets.items():
+        scheduler.set_bucket(kind, bucket)
+    if options['headless']:
+        BROWSER_CONFIG['headless'] = True
+    if options['browser_profile']:
+        BROWSER_CONFIG['profile'] = options['browser_profile']
+        BROWSER_CONFIG['flow_profiles'] = {}
+    if options['metrics_port']:
+        from .metrics import start_server
+        start_server(options['metrics_port'] + 1 + index)
+
+    journal = None
+    if options['journal']:
+        from .journal import JobJournal
+        journal = JobJournal(f"{options['journal']}.shard{index}")
+
+    def on_result(identifier, rows, error, elapsed):
+        events.put(('result', index, identifier, rows, repr(error) if error else None, elapsed))
+
+    try:
+        run_batch(
+            command, identifiers,
+            workers=options['workers'], force_refresh=options['force_refresh'],
+            on_result=on_result, journal=journal, dins_per_page=options['dins_per_page']
+        )
+    finally:
+        if journal:
+            journal.close()
+        events.put(('shard_done', index))
+
+
+def run_sharded(command, identifiers, processes=None, workers=1, rate=None,
+                headless=False, force_refresh=False, journal_path=None, metrics_port=None,
+                log_options=None, profile_every=None, dins_per_page=None, browser_profile=None):
+    """
+    Run a batch across several worker processes.
+
+    All processes draw from shared token buckets, so RATE_LIMITS (including
+    the captcha budget) holds for the whole run rather than per process.
+
+    Args:
+        command: 'din' or 'annual-filing'
+        identifiers: List of DINs or CINs
+        processes: Number of worker processes (default: CPU count)
+        workers: Concurrent browser sessions per process
+        rate: Max portal page loads per second across all processes
+        headless: Run browsers without a window
+        force_refresh: Bypass the lookup cache
+        journal_path: Base path for per-shard journals (resumable runs)
+        metrics_port: Parent's metrics port; shard i serves on metrics_port + 1 + i
+        log_options: (level, json_output, path) passed to setup_logging in each shard
+        profile_every: Profile every Nth lookup in each shard (None disables)
+        dins_per_page: DINs looked up on one loaded page (default DIN_FLOW_CONFIG)
+        browser_profile: BROWSER_PROFILES entry for every flow (None keeps BROWSER_CONFIG)
+
+    Returns:
+        Tuple of (result rows, list of failed identifiers)
+    """
+    processes = max(1, min(processes or os.cpu_count() or 1, len(identifiers) or 1))
+    shards = [[] for _ in range(processes)]
+    for identifier in identifiers:
+        shards[shard_of(identifier, processes)].append(identifier)
+
+    limits = dict(RATE_LIMITS)
+    if rate:
+        limits['page_load'] = dict(limits.get('page_load', {}), rate=rate)
+
+    ctx = multiprocessing.get_context('spawn')
+    buckets = shared_buckets(limits, ctx)
+    events = ctx.Queue()
+    options = {
+        'workers': workers,
+        'headless': headless,
+        'force_refresh': force_refresh,
+        'journal': journal_path,
+        'metrics_port': metrics_port,
+        'log_options': log_options,
+        'profile_every': profile_every,
+        'dins_per_page': dins_per_page,
+        'browser_profile': browser_profile
+    }
+
+    procs = {}
+    for index, shard in enumerate(shards):
+        if not shard:
+            continue
+        proc = ctx.Process(target=_shard_worker, args=(index, command, shard, options, buckets, events))
+        proc.start()
+        procs[index] = proc
+        logger.info(f"Started shard {index} (pid {proc.pid}) with {len(shard)} identifier(s)")
+
+    results = []
+    failed = []
+    reported = set()
+
+    def handle_result(event):
+        _, index, identifier, rows, error, elapsed = event
+        reported.add(identifier)
+        if rows:
+            results.extend(compact_rows(rows))
+            status = f"OK    {len(rows)} row(s)"
+        else:
+            failed.append(identifier)
+            status = f"FAIL  {error}" if error else "FAIL  no result"
+        logger.info(f"[{len(reported)}/{len(identifiers)}] shard {index} {identifier}: {status} ({elapsed:.1f}s)")
+
+    running = set(procs)
+    while running:
+        try:
+            event = events.get(timeout=1)
+        except queue.Empty:
+            # Catch shards that died without reporting (e.g. killed or OOM)
+            for index in list(running):
+                if not procs[index].is_alive():
+                    logger.info(f"Shard {index} exited with code {procs[index].exitcode}")
+                    running.discard(index)
+            continue
+
+        if event[0] == 'shard_done':
+            running.discard(event[1])
+        else:
+            handle_result(event)
+
+    for proc in procs.values():
+        proc.join()
+
+    # Drain results queued by shards just before they exited
+    while True:
+        try:
+            event = events.get(timeout=0.1)
+        except queue.Empty:
+            break
+        if event[0] == 'result':
+            handle_result(event)
+
+    # Anything a crashed shard never reported counts as failed
+    failed.extend(i for i in identifiers if i not in reported)
+    return results, failed
@@ -0,0 +1,257 @@
+"""
+Request Scheduler Module for MCA Automation
+Token-bucket rate limiting for portal page loads, form submissions,
+challan downloads and captcha submissions, shared by all worker threads
+"""
+
+import threading
+import time
+from collections import deque
+from .config import RATE_LIMITS, ADAPTIVE_RATE_CONFIG
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with AIMD rate adaptation.
+
+    Tokens refill at `rate` per second up to `burst`. Callers report the
+    outcome of each rate-limited operation; when the error ratio over the
+    recent window crosses the threshold the rate is cut multiplicatively,
+    and it creeps back towards the configured rate on successes.
+    """
+
+    def __init__(self, rate, burst=1, adaptive=None):
+        """
+        Args:
+            rate: Tokens per second (None for unlimited)
+            burst: Bucket capacity
+            adaptive: Dict overriding ADAPTIVE_RATE_CONFIG values
+        """
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.adaptive = dict(ADAPTIVE_RATE_CONFIG, **(adaptive or {}))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._outcomes = deque(maxlen=self.adaptive['window'])
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Block until `tokens` are available.
+
+        Args:
+            tokens: Number of tokens to take
+            timeout: Max seconds to wait (None waits forever)
+
+        Returns:
+            True if acquired, False on timeout
+        """
+        if self.rate is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def report(self, success):
+        """
+        Record the outcome of a rate-limited operation and adapt the rate.
+        """
+        if self.base_rate is None:
+            return
+        cfg = self.adaptive
+        with self._lock:
+            self._refill(time.monotonic())
+            self._outcomes.append(bool(success))
+            if len(self._outcomes) < cfg['min_samples']:
+                return
+            error_ratio = self._outcomes.count(False) / len(self._outcomes)
+            floor = self.base_rate * cfg['min_rate_fraction']
+            if error_ratio >= cfg['error_threshold']:
+                self.rate = max(floor, self.rate * cfg['decrease_factor'])
+                # Judge the new rate on fresh outcomes only
+                self._outcomes.clear()
+            elif success and self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * cfg['recovery_step'])
+
+    def set_rate(self, rate, burst=None):
+        """
+        Change the configured rate (and optionally burst) at runtime.
+        """
+        with self._lock:
+            if self.rate is not None:
+                self._refill(time.monotonic())
+            self.base_rate = rate
+            self.rate = rate
+            if burst is not None:
+                self.burst = max(1, burst)
+            self._tokens = min(self._tokens, float(self.burst))
+            self._outcomes.clear()
+
+
+class SharedTokenBucket:
+    """
+    Token bucket whose state lives in shared memory so that several worker
+    processes draw from one budget.
+
+    Must be created in the parent and handed to child processes at start-up.
+    Rate adaptation works as in TokenBucket, with each process judging its
+    own recent outcomes and lowering/raising the shared rate.
+    """
+
+    def __init__(self, rate, burst=1, adaptive=None, ctx=None):
+        if ctx is None:
+            import multiprocessing
+            ctx = multiprocessing.get_context('spawn')
+        self.burst = max(1, burst)
+        self.adaptive = dict(ADAPTIVE_RATE_CONFIG, **(adaptive or {}))
+        self.base_rate = rate
+        # tokens, last refill (wall clock, comparable across processes), current rate
+        self._state = ctx.Array('d', [float(self.burst), time.time(), float(rate or 0)])
+        self._outcomes = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_outcomes'] = None
+        return state
+
+    @property
+    def rate(self):
+        return self._state[2] if self.base_rate is not None else None
+
+    def _refill(self, now):
+        tokens, updated, rate = self._state[0], self._state[1], self._state[2]
+        self._state[0] = min(self.burst, tokens + max(0.0, now - updated) * rate)
+        self._state[1] = now
+
+    def acquire(self, tokens=1, timeout=None):
+        if self.base_rate is None:
+            return True
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self._state.get_lock():
+                now = time.time()
+                self._refill(now)
+                if self._state[0] >= tokens:
+                    self._state[0] -= tokens
+                    return True
+                wait = (tokens - self._state[0]) / self._state[2]
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def report(self, success):
+        if self.base_rate is None:
+            return
+        cfg = self.adaptive
+        if self._outcomes is None:
+            self._outcomes = deque(maxlen=cfg['window'])
+        self._outcomes.append(bool(success))
+        if len(self._outcomes) < cfg['min_samples']:
+            return
+        error_ratio = self._outcomes.count(False) / len(self._outcomes)
+        floor = self.base_rate * cfg['min_rate_fraction']
+        with self._state.get_lock():
+            self._refill(time.time())
+            if error_ratio >= cfg['error_threshold']:
+                self._state[2] = max(floor, self._state[2] * cfg['decrease_factor'])
+                self._outcomes.clear()
+            elif success and self._state[2] < self.base_rate:
+                self._state[2] = min(self.base_rate, self._state[2] + self.base_rate * cfg['recovery_step'])
+
+
+def shared_buckets(limits=None, ctx=None):
+    """
+    Build a SharedTokenBucket for every configured kind of call.
+
+    Args:
+        limits: Dict like RATE_LIMITS (default RATE_LIMITS)
+        ctx: multiprocessing context the worker processes will use
+
+    Returns:
+        Dict of kind -> SharedTokenBucket, to pass to Scheduler.set_bucket
+        in each worker process
+    """
+    limits = limits if limits is not None else RATE_LIMITS
+    return {
+        kind: SharedTokenBucket(spec.get('rate'), spec.get('burst', 1), spec.get('adaptive'), ctx)
+        for kind, spec in limits.items()
+    }
+
+
+class Scheduler:
+    """
+    Named token buckets for each kind of external call.
+    """
+
+    def __init__(self, limits=None):
+        limits = limits if limits is not None else RATE_LIMITS
+        self._buckets = {
+            kind: TokenBucket(spec.get('rate'), spec.get('burst', 1), spec.get('adaptive'))
+            for kind, spec in limits.items()
+        }
+        self._lock = threading.Lock()
+
+    def bucket(self, kind):
+        with self._lock:
+            if kind not in self._buckets:
+                # Unknown kinds are unlimited rather than an error
+                self._buckets[kind] = TokenBucket(None)
+            return self._buckets[kind]
+
+    def acquire(self, kind, tokens=1, timeout=None):
+        return self.bucket(kind).acquire(tokens, timeout)
+
+    def report(self, kind, success):
+        self.bucket(kind).report(success)
+
+    def configure(self, kind, rate, burst=None):
+        self.bucket(kind).set_rate(rate, burst)
+
+    def set_bucket(self, kind, bucket):
+        """
+        Replace the bucket for a kind, e.g. with a SharedTokenBucket.
+        """
+        with self._lock:
+            self._buckets[kind] = bucket
+
+    def rates(self):
+        """
+        Return the current effective rate of every bucket.
+        """
+        with self._lock:
+            return {kind: bucket.rate for kind, bucket in self._buckets.items()}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Return the process-wide scheduler built from RATE_LIMITS.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
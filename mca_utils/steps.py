@@ -0,0 +1,127 @@
+"""
+Step Engine Module for MCA Automation
+Runs a browser flow as a sequence of named steps on one live page. A step
+that fails is retried in place (after its optional recover action, e.g.
+refreshing a CAPTCHA) instead of reloading the portal and starting over
+
+    engine = StepEngine(on_checkpoint=checkpoint)
+    ok = engine.run([
+        Step('search', flow.search, checkpoint='searched'),
+        Step('captcha_1', flow.captcha_1, recover=flow.refresh_captcha, failure=WRONG_CAPTCHA),
+        ...
+    ])
+"""
+
+from .retry import MISSING_ELEMENT, PORTAL_TIMEOUT, classify_error, get_breaker, get_retry_policy
+from .tracing import span
+from .log import get_logger
+
+logger = get_logger('steps')
+
+
+class StepFailed(Exception):
+    """
+    Raised by a step action to fail the current attempt.
+
+    Args:
+        message: What went wrong
+        failure: Failure class, used for the backoff delay
+        retryable: False if retrying on this page cannot help
+    """
+
+    def __init__(self, message, failure=MISSING_ELEMENT, retryable=True):
+        super().__init__(message)
+        self.failure = failure
+        self.retryable = retryable
+
+
+class Step:
+    """
+    One resumable step of a flow.
+
+    Args:
+        name: Step name (span and log label)
+        action: Callable doing the step; its return value is the step result
+        recover: Optional callable run before a retry to put the page back in
+            a state the action can start from
+        failure: Failure class whose max_attempts bounds this step
+        max_attempts: Explicit attempt limit (overrides the failure class)
+        checkpoint: Journal stage recorded when the step succeeds
+        required: If False, the flow continues when the step gives up
+    """
+
+    __slots__ = ('name', 'action', 'recover', 'failure', 'max_attempts', 'checkpoint', 'required')
+
+    def __init__(self, name, action, recover=None, failure=MISSING_ELEMENT, max_attempts=None,
+                 checkpoint=None, required=True):
+        self.name = name
+        self.action = action
+        self.recover = recover
+        self.failure = failure
+        self.max_attempts = max_attempts
+        self.checkpoint = checkpoint
+        self.required = required
+
+
+class StepEngine:
+    """
+    Runs steps in order, retrying each one in place.
+    """
+
+    def __init__(self, retry_policy=None, on_checkpoint=None):
+        self.policy = retry_policy or get_retry_policy()
+        self.on_checkpoint = on_checkpoint
+        self.failed_step = None
+        self.attempts = {}
+
+    def run_step(self, step):
+        """
+        Run one step until it succeeds or runs out of attempts.
+
+        Returns:
+            Tuple of (succeeded, action result)
+        """
+        max_attempts = step.max_attempts or self.policy.max_attempts(step.failure)
+        for attempt in range(max_attempts):
+            self.attempts[step.name] = attempt + 1
+            try:
+                with span(f"step.{step.name}", attempt=attempt):
+                    result = step.action()
+            except StepFailed as e:
+                failure, retryable, error = e.failure, e.retryable, e
+            except Exception as e:
+                # Unexpected errors are only worth retrying when the portal was slow
+                failure = classify_error(e)
+                retryable, error = failure == PORTAL_TIMEOUT, e
+                if failure == PORTAL_TIMEOUT:
+                    get_breaker('portal').record_failure()
+            else:
+                if step.checkpoint and self.on_checkpoint:
+                    self.on_checkpoint(step.checkpoint)
+                return True, result
+
+            logger.warning(f"Step '{step.name}' failed ({failure}, attempt {attempt + 1}/{max_attempts}): {error}")
+            if not retryable or attempt + 1 >= max_attempts:
+                break
+            self.policy.sleep(failure, attempt)
+            if step.recover:
+                try:
+                    step.recover()
+                except Exception as e:
+                    logger.warning(f"Could not recover step '{step.name}': {e}")
+        return False, None
+
+    def run(self, steps):
+        """
+        Run steps in order, stopping at the first required step that fails.
+
+        Returns:
+            True if every required step succeeded; failed_step names the one that did not
+        """
+        self.failed_step = None
+        for step in steps:
+            succeeded, _ = self.run_step(step)
+            if not succeeded and step.required:
+                self.failed_step = step.name
+                return False
+        return True
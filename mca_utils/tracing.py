@@ -0,0 +1,195 @@
+"""
+Tracing Module for MCA Automation
+Lightweight timed spans for each stage of the flows, written as JSON lines,
+plus a p50/p95 per-stage summary report
+
+    with entity_context('annual_filing', cin):
+        with span('navigate'):
+            navigate(page, url)
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from .config import TRACING_CONFIG
+
+
+_entity = contextvars.ContextVar('mca_trace_entity', default=None)
+_stage = contextvars.ContextVar('mca_trace_stage', default=None)
+_stage_hook = contextvars.ContextVar('mca_trace_stage_hook', default=None)
+_writer_lock = threading.Lock()
+_writer = None
+
+
+def _write(record):
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            path = TRACING_CONFIG['path']
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            _writer = open(path, 'a', encoding='utf-8', buffering=1)
+        _writer.write(json.dumps(record) + '\n')
+
+
+@contextmanager
+def entity_context(flow, entity):
+    """
+    Tag every span opened inside this block (in this thread) with a flow
+    name and entity id.
+    """
+    token = _entity.set((flow, entity))
+    try:
+        yield
+    finally:
+        _entity.reset(token)
+
+
+def current_entity():
+    """
+    Return the (flow, entity) set by the enclosing entity_context, or None.
+    """
+    return _entity.get()
+
+
+def current_stage():
+    """
+    Return the stage of the innermost open span() block, or None.
+    """
+    return _stage.get()
+
+
+def set_stage_hook(hook):
+    """
+    Call hook(stage) whenever a span() block starts in this context
+    (used by the Playwright flight recorder). Returns a token for reset.
+    """
+    return _stage_hook.set(hook)
+
+
+def reset_stage_hook(token):
+    _stage_hook.reset(token)
+
+
+class Span:
+    """
+    A timed stage. Use span() as a context manager, or start_span() and
+    end() where a block cannot easily be re-indented.
+    """
+
+    __slots__ = ('stage', 'attrs', 'start', 'context', 'ended')
+
+    def __init__(self, stage, attrs):
+        self.stage = stage
+        self.attrs = attrs
+        self.context = _entity.get()
+        self.start = time.time()
+        self.ended = False
+
+    def end(self, status='ok', **attrs):
+        """
+        Finish the span and write it out (later calls are ignored).
+        """
+        if self.ended:
+            return
+        self.ended = True
+        if not TRACING_CONFIG['enabled']:
+            return
+        record = {
+            'stage': self.stage,
+            'start': round(self.start, 3),
+            'duration_ms': round((time.time() - self.start) * 1000, 1),
+            'status': status,
+            'thread': threading.current_thread().name,
+            'pid': os.getpid()
+        }
+        if self.context:
+            record['flow'], record['entity'] = self.context
+        if self.attrs or attrs:
+            record['attrs'] = dict(self.attrs, **attrs)
+        _write(record)
+
+
+def start_span(stage, **attrs):
+    """
+    Start a span that is finished explicitly with .end().
+    """
+    return Span(stage, attrs)
+
+
+@contextmanager
+def span(stage, **attrs):
+    """
+    Time a block as one stage; exceptions mark the span 'error' and propagate.
+    """
+    s = Span(stage, attrs)
+    token = _stage.set(stage)
+    hook = _stage_hook.get()
+    if hook is not None:
+        hook(stage)
+    try:
+        yield s
+    except BaseException as e:
+        s.end('error', error=type(e).__name__)
+        raise
+    finally:
+        _stage.reset(token)
+    s.end()
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(path=None):
+    """
+    Aggregate a span file into per-stage statistics.
+
+    Args:
+        path: JSON-lines span file (default TRACING_CONFIG['path'])
+
+    Returns:
+        Dict of stage -> {'count', 'errors', 'p50_ms', 'p95_ms', 'total_ms'}
+    """
+    durations = {}
+    errors = {}
+    with open(path or TRACING_CONFIG['path'], encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            durations.setdefault(record['stage'], []).append(record['duration_ms'])
+            if record.get('status') != 'ok':
+                errors[record['stage']] = errors.get(record['stage'], 0) + 1
+
+    summary = {}
+    for stage, values in durations.items():
+        values.sort()
+        summary[stage] = {
+            'count': len(values),
+            'errors': errors.get(stage, 0),
+            'p50_ms': _percentile(values, 50),
+            'p95_ms': _percentile(values, 95),
+            'total_ms': round(sum(values), 1)
+        }
+    return summary
+
+
+def print_summary(path=None):
+    """
+    Print the per-stage summary, slowest total time first.
+    """
+    summary = summarize(path)
+    print(f"{'stage':<22}{'count':>8}{'errors':>8}{'p50 ms':>12}{'p95 ms':>12}{'total s':>12}")
+    for stage, stats in sorted(summary.items(), key=lambda item: -item[1]['total_ms']):
+        print(f"{stage:<22}{stats['count']:>8}{stats['errors']:>8}"
+              f"{stats['p50_ms']:>12.1f}{stats['p95_ms']:>12.1f}{stats['total_ms'] / 1000:>12.1f}")
+    return summary
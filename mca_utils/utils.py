@@ -3,6 +3,13 @@ Utility functions for MCA Automation Scripts
 Common helper functions used across multiple scripts
 """
 
+from .retry import PORTAL_TIMEOUT, classify_error, get_breaker, get_retry_policy
+from .scheduler import get_scheduler
+from .log import get_logger
+
+logger = get_logger('utils')
+
+
 def get_robust_locator(page_or_frame, selector_list, timeout=5000):
     """
     Find an element using multiple selectors with timeout.
@@ -76,7 +83,7 @@ def get_value_by_id(frame, element_id):
         val = frame.locator(f"#{element_id}").first.evaluate("el => el.value")
         return val if val and val.strip() != "" else "N/A"
     except Exception as e:
-        print(f"  Debug: Failed to get #{element_id}: {e}")
+        logger.debug("Failed to get #%s: %s", element_id, e)
         return "N/A"
 
 
@@ -97,3 +104,39 @@ def get_value_by_label(frame, label_text):
         return val if val and val.strip() != "" else "N/A"
     except:
         return "N/A"
+
+
+def navigate(page, url, wait_until='networkidle'):
+    """
+    Load a portal page with rate limiting, jittered retries on timeouts
+    and the shared 'portal' circuit breaker.
+    
+    Args:
+        page: Playwright page object
+        url: URL to load
+        wait_until: Playwright load state to wait for
+        
+    Raises:
+        Exception: The last navigation error once retries are exhausted
+    """
+    scheduler = get_scheduler()
+    policy = get_retry_policy()
+    breaker = get_breaker('portal')
+    attempt = 0
+    while True:
+        breaker.wait()
+        scheduler.acquire('page_load')
+        try:
+            page.goto(url, wait_until=wait_until)
+            scheduler.report('page_load', True)
+            breaker.record_success()
+            return
+        except Exception as e:
+            scheduler.report('page_load', False)
+            breaker.record_failure()
+            failure = classify_error(e, PORTAL_TIMEOUT)
+            if not policy.should_retry(failure, attempt):
+                raise
+            logger.warning(f"Navigation failed ({failure}): {e}. Retrying...")
+            policy.sleep(failure, attempt)
+            attempt += 1
@@ -0,0 +1,92 @@
+"""
+Queue Worker Module for MCA Automation
+Pulls lookup jobs from a job queue, runs them and writes results back, so
+sweeps can be spread over several machines
+"""
+
+import os
+import socket
+import threading
+import time
+from .config import QUEUE_CONFIG
+from .log import get_logger
+
+logger = get_logger('worker')
+
+
+def _heartbeat(job_queue, job, worker, stop):
+    """Keep extending a job's lease while it is being worked on."""
+    interval = QUEUE_CONFIG['visibility_timeout'] / 3
+    while not stop.wait(interval):
+        if not job_queue.extend(job['id'], worker):
+            logger.warning(f"Lost lease on {job['identifier']}")
+            return
+
+
+def run_worker(job_queue, workers=1, force_refresh=False, exit_when_empty=False, journal=None):
+    """
+    Process jobs from a queue until stopped (or until it is empty).
+
+    Args:
+        job_queue: SQLiteJobQueue or RedisJobQueue
+        workers: Concurrent lookup threads in this process
+        force_refresh: Bypass the lookup cache
+        exit_when_empty: Return once no job can be leased
+        journal: Optional JobJournal for in-flow checkpoints
+
+    Returns:
+        Tuple of (jobs completed, jobs failed) by this process
+    """
+    from .cli import lookup_rows
+
+    host_id = f"{socket.gethostname()}:{os.getpid()}"
+    counts = {'done': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+
+    def loop(thread_index):
+        worker = f"{host_id}:{thread_index}"
+        while True:
+            job = job_queue.lease(worker)
+            if job is None:
+                if exit_when_empty:
+                    return
+                time.sleep(QUEUE_CONFIG['poll_interval'])
+                continue
+
+            logger.info(f"[{worker}] {job['command']} {job['identifier']} (attempt {job['attempts']})")
+            stop = threading.Event()
+            beat = threading.Thread(target=_heartbeat, args=(job_queue, job, worker, stop), daemon=True)
+            beat.start()
+            start = time.time()
+            try:
+                rows = lookup_rows(job['command'], job['identifier'], force_refresh, journal)
+                error = None if rows else 'no result'
+            except Exception as e:
+                rows, error = None, repr(e)
+            finally:
+                stop.set()
+                beat.join()
+
+            elapsed = time.time() - start
+            if error is None:
+                job_queue.complete(job['id'], worker, rows)
+                outcome = 'done'
+                logger.info(f"[{worker}] OK    {job['identifier']}: {len(rows)} row(s) ({elapsed:.1f}s)")
+            else:
+                job_queue.fail(job['id'], worker, error)
+                outcome = 'failed'
+                logger.warning(f"[{worker}] FAIL  {job['identifier']}: {error} ({elapsed:.1f}s)")
+            with counts_lock:
+                counts[outcome] += 1
+
+    threads = [threading.Thread(target=loop, args=(i,), daemon=True) for i in range(max(1, workers))]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            t.join()
+    except KeyboardInterrupt:
+        # Leases held by interrupted jobs expire and are redelivered
+        logger.info("Worker interrupted; in-flight jobs will be redelivered after their lease expires.")
+
+    return counts['done'], counts['failed']
@@ -1,190 +1,322 @@
 import sys
 import time
 import os
-from playwright.sync_api import sync_playwright
-import pandas as pd
 
 # Import shared modules from mca_utils package
-from mca_utils.config import MCA_URLS, BROWSER_CONFIG, DEFAULT_DIN, SCREENSHOTS_DIR, MAX_VERIFICATION_ATTEMPTS
+from mca_utils.config import MCA_URLS, DEFAULT_DIN, SCREENSHOTS_DIR
 from mca_utils.captcha_solver import solve_captcha
-from mca_utils.utils import get_robust_locator, type_slowly, wait_for_result_panel, get_value_by_id
+from mca_utils.utils import type_slowly, navigate
+from mca_utils.retry import SOLVER_ERROR, WRONG_CAPTCHA
+from mca_utils.steps import Step, StepEngine, StepFailed
+from mca_utils.cache import cached_lookup, cached_lookups
+from mca_utils.scheduler import get_scheduler
+from mca_utils.tracing import entity_context, span, start_span
+from mca_utils import metrics
+from mca_utils.artifacts import capture
+from mca_utils.flight_recorder import FlightRecorder
+from mca_utils.browser import browser_session
+from mca_utils.extract import extract_async, snapshot
+from mca_utils.locators import find, locator
+from mca_utils.profiling import enable_profiling, profiled
+from mca_utils.log import get_logger
 
+logger = get_logger('verify_din')
 
+EXCEL_PATH = "din_status_results.xlsx"
+
+
+class DinStatusFlow:
+    """
+    DIN status lookups on one enquiry page as resumable steps: navigate (only
+    when the page is not loaded yet), search, captcha and result. After a
+    result is read the form is reused in place for the next DIN; the page is
+    reloaded only when a step cannot be recovered on the reused page.
+    """
+
+    def __init__(self, page, journal=None):
+        self.page = page
+        self.frame = page
+        self.journal = journal
+        self.scheduler = get_scheduler()
+        self.engine = None
+        self.din = None
+        self.loaded = False
+        self.last_result_din = None
+        self.pending = None
+
+        # Built once per page from the selector registry (SELECTORS['din'])
+        self.captcha_modal = locator(page, 'din.captcha_modal')
+        self.error_text = locator(page, 'din.captcha_error')
+        self.result_heading = locator(page, 'din.result_heading')
+        self.result_din = locator(page, 'din.result_din').first
+
+    def checkpoint(self, stage):
+        if self.journal:
+            self.journal.record(self.din, stage)
+
+    def steps(self):
+        steps = [] if self.loaded else [Step('navigate', self.load, max_attempts=1)]
+        return steps + [
+            Step('search', self.search, checkpoint='searched'),
+            Step('captcha', self.solve_captcha_gate, recover=self.refresh_captcha,
+                 failure=WRONG_CAPTCHA, checkpoint='captcha_1_passed'),
+            Step('result', self.read_result)
+        ]
+
+    def lookup(self, din):
+        """
+        Look up one DIN on this page.
+
+        Returns:
+            Future resolving to the extracted row, or None if the lookup failed
+        """
+        self.din = din
+        reused = self.loaded
+        if self._run():
+            return self.pending
+        if reused:
+            # Whatever the last DIN left behind could not be worked around; start clean
+            logger.warning(f"Step '{self.engine.failed_step}' failed on the reused page; reloading it.")
+            self.loaded = False
+            if self._run():
+                return self.pending
+        return None
+
+    def _run(self):
+        self.pending = None
+        self.engine = StepEngine(on_checkpoint=self.checkpoint)
+        if self.engine.run(self.steps()):
+            return True
+        capture(self.page, f"debug_din_{self.engine.failed_step}", failure=True, html=True)
+        return False
+
+    @staticmethod
+    def _visible(target):
+        return target.count() > 0 and target.first.is_visible()
+
+    def load(self):
+        url = MCA_URLS['enquire_din_status']
+        logger.info(f"Navigating to {url}...")
+        with span('navigate'):
+            navigate(self.page, url)
+            self.page.wait_for_timeout(3000)
+        self.loaded = True
+        self.last_result_din = None
+
+    def search(self):
+        logger.info("Looking for DIN/DPIN field...")
+        with span('locate_input'):
+            din_input = find(self.frame, 'din.input')
+        if not din_input:
+            raise StepFailed("Could not find DIN/DPIN input field.", retryable=False)
+        logger.info("Found DIN Input!")
+
+        # Type DIN slowly to trigger validation (this also clears the previous DIN)
+        type_slowly(din_input, self.din)
+        logger.info(f"Typed DIN: {self.din}")
+        self.page.wait_for_timeout(2000)
+
+        logger.info("Clicking Submit...")
+        submit_din_btn = find(self.frame, 'din.submit')
+        if submit_din_btn:
+            self.scheduler.acquire('form_submit')
+            with span('submit', step='din'):
+                submit_din_btn.click()
+            logger.info("Clicked Submit.")
+        else:
+            logger.warning("Submit button not visible/found.")
+        self.page.wait_for_timeout(2000)
+
+        logger.info("Waiting for CAPTCHA modal...")
+        self.captcha_modal.wait_for(state="visible", timeout=10000)
+        logger.info("CAPTCHA Modal appeared.")
+
+    def refresh_captcha(self):
+        refresh_btn = find(self.frame, 'din.captcha_refresh', timeout=1000)
+        if refresh_btn:
+            refresh_btn.click()
+            logger.info("Clicked Refresh Button.")
+            self.page.wait_for_timeout(2000)
+
+    def _shows_result(self):
+        """True once the result panel shows this DIN rather than the previous one."""
+        if self.result_din.count() > 0:
+            value = (self.result_din.input_value() or '').strip()
+            return bool(value) and (value == self.din or value != self.last_result_din)
+        # Without the DIN field a stale panel cannot be told apart, so only a fresh page counts
+        return self.last_result_din is None and self._visible(self.result_heading)
+
+    def solve_captcha_gate(self):
+        captcha_canvas = find(self.frame, 'din.captcha_canvas', timeout=3000)
+        if not captcha_canvas:
+            raise StepFailed("Could not find CAPTCHA canvas.", retryable=False)
+        logger.info("Found CAPTCHA Canvas. Waiting for render...")
+        self.page.wait_for_timeout(1000)
+
+        # Solve CAPTCHA using shared module
+        text = solve_captcha(self.frame, captcha_canvas, 'din')
+        if not text:
+            raise StepFailed("Failed to solve CAPTCHA.", SOLVER_ERROR)
+        time.sleep(2)
+
+        locator(self.frame, 'din.captcha_input').first.fill(text)
+        logger.info("Captcha filled.")
+        self.scheduler.acquire('form_submit')
+        with span('submit', step='captcha'):
+            locator(self.frame, 'din.captcha_validate').first.click()
+        logger.info("Clicked Validate Captcha.")
+
+        attempt = self.engine.attempts.get('captcha', 1)
+        result_wait = start_span('result_wait', attempt=attempt - 1)
+        status = "unknown"
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            if self._visible(self.error_text):
+                status = "rejected"
+                break
+            if self._shows_result():
+                status = "ok"
+                break
+            self.page.wait_for_timeout(500)
+        result_wait.end(status)
+
+        if status == "rejected":
+            logger.warning("FAILURE: Incorrect Captcha detected.")
+            self.scheduler.report('form_submit', False)
+            capture(self.page, f"failed_attempt_{attempt - 1}", failure=True)
+            raise StepFailed("Incorrect CAPTCHA.", WRONG_CAPTCHA)
+        if status == "unknown":
+            raise StepFailed("Status unclear after the CAPTCHA.", retryable=False)
+        logger.info("SUCCESS: Result page loaded!")
+        self.scheduler.report('form_submit', True)
+
+    def read_result(self):
+        # Data Extraction: one snapshot of the panel, parsed off the browser thread
+        logger.info("Extracting data for Excel...")
+        with span('result_panel_wait'):
+            panel = find(self.frame, 'din.result_panel', timeout=15000)
+            if not panel:
+                raise StepFailed("Result panel did not appear.")
+            has_din_field = self.result_din.count() > 0
+            if not has_din_field:
+                # Nothing to watch for the data arriving, so give it time to populate
+                self.page.wait_for_timeout(3000)
+        logger.info("Result Panel is now visible. Taking snapshot...")
+        with span('result_snapshot'):
+            self.pending = extract_async(snapshot(self.frame, panel), 'din_result')
+        self.last_result_din = self.result_din.input_value().strip() if has_din_field else self.din
+
+
+def lookup_dins(dins, journal=None):
+    """
+    Run the DIN status flow for several DINs on one loaded page.
+
+    Args:
+        dins: DINs to verify, in order
+        journal: Optional JobJournal; finished DINs return their recorded row
+
+    Returns:
+        Dict of DIN -> extracted row dict, or None where the lookup failed
+    """
+    results = {}
+    todo = []
+    for din in dins:
+        if journal and journal.is_finished(din):
+            logger.info(f"{din} already finished (journal), skipping.")
+            results[din] = journal.data(din, 'done')['row']
+        elif din not in todo:
+            todo.append(din)
+    if not todo:
+        return results
 
-def run():
-    print(f" Python Executable: {sys.executable}")
-    
-    # DIN to verify
-    DIN_NUMBER = DEFAULT_DIN
-    
     # Ensure screenshots directory exists
     if not os.path.exists(SCREENSHOTS_DIR):
         os.makedirs(SCREENSHOTS_DIR)
 
-    with sync_playwright() as p:
-        print(" Launching Firefox...")
-        browser = p.firefox.launch(headless=BROWSER_CONFIG['headless'])
-        context = browser.new_context(viewport=BROWSER_CONFIG['viewport'])
-        page = context.new_page()
-
-        url = MCA_URLS['enquire_din_status']
-        print(f" Navigating to {url}...")
-        page.goto(url, wait_until='networkidle')
-        page.wait_for_timeout(3000)
-
-        target_frame = page
-        
-        print(" Looking for DIN/DPIN field...")
-        # Robust locators for DIN input
-        din_input = target_frame.locator("input[placeholder='Enter Here']").or_(
-            target_frame.locator("#din")
-        ).or_(
-            target_frame.locator("xpath=//label[contains(text(),'DIN')]/following::input[1]")
-        ).first
-        
-        if din_input.count() > 0:
-            print(" Found DIN Input!")
-            try:
-                # Type DIN slowly to trigger validation
-                type_slowly(din_input, DIN_NUMBER)
-                print(f" Typed DIN: {DIN_NUMBER}")
-                
-                page.wait_for_timeout(2000)
-                
-                # Submit DIN
-                print(" Clicking Submit...")
-                submit_din_btn = target_frame.locator("button:has-text('Submit')").or_(
-                    target_frame.locator("#submitdin")
-                ).or_(
-                    target_frame.locator("input[value='Submit']")
-                ).or_(
-                    target_frame.locator("xpath=//button[normalize-space()='Submit']")
-                ).first
-                
-                if submit_din_btn.count() > 0:
-                    submit_din_btn.click()
-                    print(" Clicked Submit.")
-                else:
-                    print(" Submit button not visible/found.")
-                
-                page.wait_for_timeout(2000)
+    pending = {}
+    with metrics.in_flight('mca_browser_pages_open'):
+        # The recorder exits first, while the browser context is still open
+        with browser_session('din_status') as context, FlightRecorder() as recorder:
+            recorder.attach(context)
+            flow = DinStatusFlow(context.new_page(), journal)
+            for din in todo:
+                with entity_context('din_status', din):
+                    with profiled(), span('lookup'), metrics.timer('mca_lookup_seconds', flow='din_status'):
+                        pending[din] = flow.lookup(din)
+                    if pending[din] is None:
+                        recorder.save_failure()
+            recorder.mark_success()
 
-                # Wait for CAPTCHA Modal
-                print(" Waiting for CAPTCHA modal...")
-                captcha_modal = target_frame.locator('#newCaptchaModal')
+    # Snapshots were parsed while the session closed
+    for din in todo:
+        with entity_context('din_status', din):
+            row = None
+            if pending[din]:
                 try:
-                    captcha_modal.wait_for(state="visible", timeout=10000)
-                    print(" CAPTCHA Modal appeared.")
-                    
-                    # Verification loop
-                    for verify_attempt in range(MAX_VERIFICATION_ATTEMPTS):
-                        print(f"--- Verification Attempt {verify_attempt+1}/{MAX_VERIFICATION_ATTEMPTS} ---")
-                        
-                        captcha_canvas = target_frame.locator('#new-captcha-canvas')
-                        if captcha_canvas.count() > 0:
-                            print(" Found CAPTCHA Canvas. Waiting for render...")
-                            page.wait_for_timeout(1000)
-                            
-                            # Solve CAPTCHA using shared module
-                            text = solve_captcha(target_frame, '#new-captcha-canvas', 'din')
-                            time.sleep(2)
-                            
-                            if text:
-                                captcha_input = target_frame.locator('#captcha-input')
-                                captcha_input.fill(text)
-                                print(" Captcha filled.")
-                                
-                                # Validate CAPTCHA
-                                validate_btn = target_frame.locator('#validate-captcha')
-                                validate_btn.click()
-                                print(" Clicked Validate Captcha.")
-                                
-                                page.wait_for_timeout(5000)
-                                # page.screenshot(path=f"{SCREENSHOTS_DIR}/din_verification_check.png")
-                                
-                                # Check for success
-                                success_indicator = target_frame.get_by_text("DIN Details")
-                                if success_indicator.count() > 0:
-                                    print(" SUCCESS: Result page loaded!")
-                                    
-                                    # Data Extraction
-                                    print(" Extracting data for Excel...")
-                                    try:
-                                        # Wait for result panel
-                                        if wait_for_result_panel(target_frame, '#resultPanel'):
-                                            print(" Result Panel is now visible. Waiting for data population...")
-                                            
-                                            # Extract data using utility function
-                                            row = {
-                                                "DIN": get_value_by_id(target_frame, "DIN"),
-                                                "Director Name": get_value_by_id(target_frame, "directorName"),
-                                                "DIN Status": get_value_by_id(target_frame, "DINstatus"),
-                                                "Non-compliant status": get_value_by_id(target_frame, "DINactive"),
-                                                "Date of Approval": get_value_by_id(target_frame, "approvalDate")
-                                            }
-                                            
-                                            print(f" Final Extracted Data Row: {row}")
-                                            
-                                            # Save to Excel
-                                            df = pd.DataFrame([row])
-                                            excel_path = "din_status_results.xlsx"
-                                            df.to_excel(excel_path, index=False)
-                                            print(f" Data successfully saved to {excel_path}")
-                                        
-                                    except Exception as ex:
-                                        print(f" Error during data extraction: {ex}")
-                                        # page.screenshot(path=f"{SCREENSHOTS_DIR}/din_verification_result.png")
-
-                                    print("Execution finished.")
-                                    return
-                                
-                                # Check for errors
-                                error_text_locator = target_frame.locator(".errormsg").or_(
-                                    target_frame.locator(".alert-danger")
-                                ).or_(
-                                    target_frame.locator("text='Incorrect Captcha'")
-                                ).or_(
-                                    target_frame.locator("text='Enter valid text'")
-                                ).or_(
-                                    target_frame.locator("text='Captcha match failed'")
-                                )
-                                
-                                if error_text_locator.count() > 0 and error_text_locator.first.is_visible():
-                                     print(" FAILURE: Incorrect Captcha detected.")
-                                     page.screenshot(path=f"{SCREENSHOTS_DIR}/failed_attempt_{verify_attempt}.png")
-                                     refresh_btn = target_frame.locator('#captcha-refresh-img')
-                                     if refresh_btn.is_visible():
-                                         refresh_btn.click()
-                                         print(" Clicked Refresh Button.")
-                                         page.wait_for_timeout(2000)
-                                     continue
-                                
-                                print(" Status unclear, assuming success or taking final screenshot.")
-                                page.screenshot(path=f"{SCREENSHOTS_DIR}/din_verification_result.png")
-                                return
-
-                            else:
-                                print(" Failed to solve CAPTCHA logic.")
-                        else:
-                            print(" Could not find CAPTCHA canvas.")
-                            break
-                    
-                    print(" Failed to verify DIN after multiple attempts.")
+                    row = pending[din].result()
+                    logger.info(f"Final Extracted Data Row: {row}")
                 except Exception as e:
-                    print(f" Verification flow error: {e}")
-                    page.screenshot(path=f"{SCREENSHOTS_DIR}/debug_verification_error.png")
-                    with open(f"{SCREENSHOTS_DIR}/debug_no_modal.html", "w", encoding="utf-8") as f:
-                        f.write(page.content())
+                    logger.error(f"Error during data extraction: {e}")
+            metrics.inc('mca_lookups_total', flow='din_status', outcome='ok' if row else 'failed')
+            if journal:
+                if row:
+                    journal.record(din, 'done', row=row)
+                else:
+                    journal.record(din, 'failed')
+        results[din] = row
+    return results
 
-            except Exception as e:
-                print(f" Error during flow: {e}")
-                page.screenshot(path=f"{SCREENSHOTS_DIR}/debug_error.png")
 
-        else:
-            print(" Could not find DIN/DPIN input field.")
-            page.screenshot(path=f"{SCREENSHOTS_DIR}/debug_din_not_found.png")
-            with open(f"{SCREENSHOTS_DIR}/debug_din_page.html", "w", encoding="utf-8") as f:
-                f.write(page.content())
+def lookup_din(din, journal=None):
+    """
+    Run the DIN status flow in a fresh browser session.
+
+    Args:
+        din: DIN to verify
+        journal: Optional JobJournal; finished DINs return their recorded row
+
+    Returns:
+        Dict with the extracted DIN details, or None if the lookup failed
+    """
+    return lookup_dins([din], journal)[din]
+
+
+def run(din=None, force_refresh=False, dins=None):
+    """
+    Look up a DIN, or several on one page (cached), and save the results to Excel.
+
+    Args:
+        din: DIN to verify, defaults to DEFAULT_DIN
+        force_refresh: Bypass the lookup cache
+        dins: Several DINs to verify on one loaded page (instead of din)
+
+    Returns:
+        Dict with the extracted DIN details (None if the lookup failed), or
+        with dins a list of them in the same order
+    """
+    logger.info(f"Python Executable: {sys.executable}")
+    
+    if dins:
+        found = cached_lookups('din_status', list(dins), lookup_dins, force_refresh=force_refresh)
+        rows = [found.get(d) for d in dins]
+    else:
+        din = din or DEFAULT_DIN
+        rows = [cached_lookup('din_status', din, lambda: lookup_din(din), force_refresh=force_refresh)]
+    
+    saved = [row for row in rows if row]
+    if saved:
+        # Save to Excel
+        import pandas as pd
+        df = pd.DataFrame(saved)
+        df.to_excel(EXCEL_PATH, index=False)
+        logger.info(f"Data successfully saved to {EXCEL_PATH}")
+    
+    logger.info("Execution finished.")
+    return rows if dins else rows[0]
+
 
 if __name__ == "__main__":
-    run()
+    if '--profile' in sys.argv:
+        enable_profiling()
+    # python verify_din.py [DIN ...] [--refresh] [--profile]
+    run(force_refresh='--refresh' in sys.argv, dins=[a for a in sys.argv[1:] if not a.startswith('--')] or None)